@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# cli
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+
+# Command line interface for running analysis on project files without the program window
+#
+# Usage:
+#     python -m gelectrical.cli analyze sample.gepro other.gepro --sc --pf --report out/
+
+import os, sys, copy, time, logging, argparse, traceback, multiprocessing
+import concurrent.futures
+import appdirs
+
+# local files import
+from . import misc
+from .model import projectfile, export, analysisworker, exportjobs, resultsexport
+from .model.rulescheck import electrical_rules_check
+from .model.report import export_pdf_report
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Exit codes
+EXIT_OK = 0
+EXIT_RULES_FAILED = 1
+EXIT_ERROR = 2
+# Power flow methods selectable from command line
+CLI_PF_METHODS = {'normal': 'Power flow',
+                  'diversity': 'Power flow with diversity',
+                  'timeseries': 'Time series'}
+# Results export formats
+CLI_RESULTS_FORMATS = ('xlsx', 'csv', 'parquet')
+# Maximum number of projects analysed at a time
+CLI_MAX_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# Key of failed checks in rules check results
+CLI_RULES_FAILED = 'Electrical Rules Check - Failed'
+
+
+## Worker process
+
+def get_analysis_settings(sim_settings, options):
+    """Analysis settings in the format of AnalysisSettingsDialog
+
+        Studies not selected in options are taken from simulation settings of project.
+    """
+    studies = options['powerflow'] or options['sc_sym'] or options['sc_gf']
+    if studies:
+        powerflow, sc_sym, sc_gf = options['powerflow'], options['sc_sym'], options['sc_gf']
+    else:
+        powerflow = sim_settings['run_powerflow']['value']
+        sc_sym = sim_settings['run_sc_sym']['value']
+        sc_gf = sim_settings['run_sc_gf']['value']
+    return {'diagnostics': options['diagnostics'],
+            '3ph': sim_settings['power_flow_3ph']['value'],
+            'powerflow': powerflow,
+            'pf_method': options['pf_method'] or sim_settings['pf_method']['value'],
+            'sc_sym': sc_sym,
+            'sc_gf': sc_gf,
+            'export': False,
+            'folder': None}
+
+def get_messages(results, message_type):
+    """Return message text of diagnostic results of given type"""
+    messages = []
+    for caption, items in results.items():
+        for item in items:
+            message = item[0]
+            if isinstance(message, dict) and message.get('type') == message_type:
+                messages.append(message['message'])
+    return messages
+
+def add_node_elements(project, node_results):
+    """Add node display elements with results to drawing models for reports and results export"""
+    node_elements = project.networkmodel.setup_node_elements()
+    for (k1, gnode), node_element in node_elements.items():
+        if gnode in node_results:
+            node_element.res_fields = copy.deepcopy(node_results[gnode])
+        project.drawing_models[k1].elements.append(node_element)
+
+def analyse_file(filename, options):
+    """Run analysis on project file and write results and report
+
+        Runs in a worker process.
+
+        Arguments:
+            filename: Project filename
+            options: Dict of command line options, see get_parser
+        Returns:
+            Dict with keys 'filename', 'status' as misc.OK, misc.WARNING or misc.ERROR,
+            'messages' as list of errors, 'rules_failed' as list of failed rules
+            check messages or None if not run, 'outputs' as list of files written
+            and 'time' in seconds.
+    """
+    start = time.perf_counter()
+    summary = {'filename': filename, 'status': misc.OK, 'messages': [], 'rules_failed': None, 'outputs': [], 'time': 0}
+
+    def progress_callback(message, fraction):
+        log.info('{} - {}'.format(filename, message))
+
+    try:
+        project = export.get_snapshot_project(projectfile.read_snapshot(filename))
+        sim_settings = project.get_project_fields(page='Simulation')
+        settings = get_analysis_settings(sim_settings, options)
+        result = analysisworker.analyse_project(project, settings, progress_callback)
+        if result['diagnostics'] and result['diagnostics'][1] == misc.ERROR:
+            summary['status'] = misc.ERROR
+            summary['messages'] = get_messages(result['diagnostics'][0], 'error') or ['Diagnostics failed']
+            return summary
+        add_node_elements(project, result['node_results'])
+
+        if options['rules']:
+            progress_callback('Running Rules Check...', 0.6)
+            rules_settings = project.get_project_fields(page='Rules Check')
+            rules_results = electrical_rules_check(project.networkmodel, sim_settings, rules_settings)
+            summary['rules_failed'] = [message['message'] for message, element_list in rules_results[CLI_RULES_FAILED]]
+            if summary['rules_failed']:
+                summary['status'] = misc.WARNING
+
+        name = os.path.splitext(os.path.basename(filename))[0]
+        if options['results']:
+            progress_callback('Exporting Results...', 0.8)
+            os.makedirs(options['results'], exist_ok=True)
+            results_filename = misc.posix_path(options['results'], name + '.' + options['results_format'])
+            resultsexport.export_results(project, results_filename)
+            if options['results_format'] == 'xlsx':
+                summary['outputs'].append(results_filename)
+            else:
+                summary['outputs'] += resultsexport.get_table_filenames(results_filename)
+        if options['report']:
+            progress_callback('Exporting Report...', 0.9)
+            report_folder = misc.posix_path(options['report'], name)
+            os.makedirs(report_folder, exist_ok=True)
+            export_pdf_report(project, report_folder, settings)
+            summary['outputs'].append(misc.posix_path(report_folder, 'report.pdf'))
+    except Exception:
+        log.error('analyse_file - analysis failed - {}\n{}'.format(filename, traceback.format_exc()))
+        summary['status'] = misc.ERROR
+        summary['messages'] = [traceback.format_exc().strip().splitlines()[-1]]
+    finally:
+        summary['time'] = time.perf_counter() - start
+    return summary
+
+def init_worker(misc_settings, log_level):
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr, level=log_level)
+    exportjobs.set_misc_settings(misc_settings)
+
+
+## Main process
+
+def setup_directories():
+    """Set library and cache directories in misc as done by the program window"""
+    dirs = appdirs.AppDirs(misc.PROGRAM_NAME, misc.PROGRAM_AUTHOR, version=misc.PROGRAM_VER)
+    user_library_dir = misc.posix_path(dirs.user_data_dir, 'database')
+    if os.path.isdir(user_library_dir):
+        misc.USER_LIBRARY_DIR = user_library_dir
+    misc.GRAPH_CACHE_DIR = misc.posix_path(dirs.user_cache_dir, 'graphs')
+
+def get_exit_code(summaries):
+    codes = [EXIT_OK]
+    for summary in summaries:
+        if summary['status'] == misc.ERROR:
+            codes.append(EXIT_ERROR)
+        elif summary['rules_failed']:
+            codes.append(EXIT_RULES_FAILED)
+    return max(codes)
+
+def print_summary(summary):
+    fp = sys.stdout
+    status = {misc.OK: 'OK', misc.WARNING: 'RULES FAILED', misc.ERROR: 'ERROR'}[summary['status']]
+    fp.write('{}: {} ({:.1f} s)\n'.format(summary['filename'], status, summary['time']))
+    for message in summary['messages']:
+        fp.write('    error: {}\n'.format(message.replace('\n', ' ')))
+    for message in summary['rules_failed'] or []:
+        fp.write('    rules check failed: {}\n'.format(message.replace('\n', ' ')))
+    for output in summary['outputs']:
+        fp.write('    written: {}\n'.format(output))
+    fp.flush()
+
+def run_analyze(args):
+    options = {'powerflow': args.pf or args.rules,
+               'pf_method': CLI_PF_METHODS[args.pf_method] if args.pf_method else None,
+               'sc_sym': args.sc or args.rules,
+               'sc_gf': args.gf or args.rules,
+               'diagnostics': args.diagnostics,
+               'rules': args.rules,
+               'results': args.results,
+               'results_format': args.results_format,
+               'report': args.report}
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    setup_directories()
+    max_workers = max(1, min(args.jobs, len(args.files)))
+    summaries = []
+    # Spawned workers for consistent behaviour across platforms and with the program window
+    mp_context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                                initializer=init_worker,
+                                                initargs=(exportjobs.get_misc_settings(), log_level)) as executor:
+        futures = [executor.submit(analyse_file, filename, options) for filename in args.files]
+        for future in concurrent.futures.as_completed(futures):
+            summary = future.result()
+            print_summary(summary)
+            summaries.append(summary)
+    return get_exit_code(summaries)
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='gelectrical.cli',
+                                     description='Run analysis on ' + misc.PROGRAM_NAME + ' project files without the program window.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    analyze = subparsers.add_parser('analyze', help='Analyse project files',
+                                    description='Analyse project files. Studies not selected are taken from '
+                                                'the simulation settings of each project. Exits with code {} on '
+                                                'success, {} if rules check failed and {} on errors.'.format(
+                                                    EXIT_OK, EXIT_RULES_FAILED, EXIT_ERROR))
+    analyze.add_argument('files', nargs='+', metavar='FILE', help='Project files (.gepro)')
+    analyze.add_argument('--pf', action='store_true', help='Run power flow')
+    analyze.add_argument('--pf-method', choices=sorted(CLI_PF_METHODS), help='Power flow method')
+    analyze.add_argument('--sc', action='store_true', help='Run symmetric short circuit calculation')
+    analyze.add_argument('--gf', action='store_true', help='Run line to ground short circuit calculation')
+    analyze.add_argument('--rules', action='store_true', 
+                         help='Run electrical rules check, implies --pf, --sc and --gf')
+    analyze.add_argument('--no-diagnostics', dest='diagnostics', action='store_false', 
+                         help='Skip diagnostics before analysis')
+    analyze.add_argument('--results', metavar='DIR', help='Export results to DIR/<project name>.<format>')
+    analyze.add_argument('--results-format', choices=CLI_RESULTS_FORMATS, default='xlsx', help='Results export format')
+    analyze.add_argument('--report', metavar='DIR', help='Export reports to DIR/<project name>/')
+    analyze.add_argument('-j', '--jobs', type=int, default=CLI_MAX_WORKERS, 
+                         help='Number of projects analysed at a time (default: %(default)s)')
+    analyze.add_argument('-v', '--verbose', action='store_true', help='Log progress of analysis')
+    return parser
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr, level=logging.INFO if args.verbose else logging.WARNING)
+    if args.command == 'analyze':
+        if args.jobs < 1:
+            get_parser().error('--jobs should be at least 1')
+        return run_analyze(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -21,3 +21,41 @@
 #  
 
 from . import element, elementassembly, template, switch, busbar, grid, transformer, load, line, impedance, shunt, ward, generator, reference, displayelements
+
+
+def get_element_models():
+    """Return mapping of element code to element class"""
+    element_models = dict()
+    element_models[switch.Switch.code] = switch.Switch
+    element_models[switch.Fuse.code] = switch.Fuse
+    element_models[switch.CircuitBreaker.code] = switch.CircuitBreaker
+    element_models[switch.Contactor.code] = switch.Contactor
+    element_models[switch.ChangeOver.code] = switch.ChangeOver
+    element_models[busbar.BusBar.code] = busbar.BusBar
+    element_models[grid.Grid.code] = grid.Grid
+    element_models[reference.Reference.code] = reference.Reference
+    element_models[reference.ReferenceBox.code] = reference.ReferenceBox
+    element_models[transformer.Transformer.code] = transformer.Transformer
+    element_models[transformer.Transformer3w.code] = transformer.Transformer3w
+    element_models[load.Load.code] = load.Load
+    element_models[load.AsymmetricLoad.code] = load.AsymmetricLoad
+    element_models[load.SinglePhaseLoad.code] = load.SinglePhaseLoad
+    element_models[line.Line.code] = line.Line
+    element_models[line.LTCableIEC.code] = line.LTCableIEC
+    element_models[line.LTCableCustom.code] = line.LTCableCustom
+    element_models[line.BusTrunking.code] = line.BusTrunking
+    element_models[impedance.Impedance.code] = impedance.Impedance
+    element_models[impedance.Inductance.code] = impedance.Inductance
+    element_models[shunt.ShuntCapacitor.code] = shunt.ShuntCapacitor
+    element_models[generator.Generator.code] = generator.Generator
+        # self.program_state['element_models'][generator.Motor.code] = generator.Motor
+    element_models[load.Motor3ph.code] = load.Motor3ph
+    element_models[load.Motor1ph.code] = load.Motor1ph
+    element_models[displayelements.DisplayElementNode.code] = displayelements.DisplayElementNode
+    element_models[generator.StaticGenerator.code] = generator.StaticGenerator
+    element_models[generator.SinglePhaseStaticGenerator.code] = generator.SinglePhaseStaticGenerator
+    element_models[ward.Ward.code] = ward.Ward
+    element_models[ward.XWard.code] = ward.XWard
+    element_models[shunt.Shunt.code] = shunt.Shunt
+    element_models[displayelements.DisplayElementText.code] = displayelements.DisplayElementText
+    return element_models
@@ -23,7 +23,6 @@
 import logging, copy
 from math import sin, cos, acos, asin, exp, log, log10
 from mako.template import Template as ExprTemplate
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
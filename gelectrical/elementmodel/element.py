@@ -20,11 +20,10 @@
 #  
 # 
 
-import logging, copy
+import logging, copy, re
 from math import sin, cos, acos, asin, exp, log, log10
 import time
 from mako.template import Template as ExprTemplate
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
@@ -40,6 +39,7 @@ class ElementModel:
     tooltip = ''
     element_tooltips = tooltips
     timestamp = 0
+    expr_templates = dict()  # (class, expr) -> (compiled template, referenced identifiers)
     
     def __init__(self, cordinates=(0,0), **kwargs):
         # Data
@@ -64,14 +64,20 @@ class ElementModel:
         # State variables
         self.selected = False
         self.model_loading = False  # Flag set during model loading stage
+        self.defer_curves = False  # Flag set to defer protection curve evaluation
         self.selected_color = misc.COLOR_SELECTED
         self.draw_schem_color = misc.COLOR_NORMAL
         self.text_extends = []
         self.schem_extends = []
+        self.text_cache = dict()  # expr -> (referenced field values, rendered text)
+        self.layout_cache = dict()  # (text, font) -> Pango layout
     
     def set_text_field_value(self, code, value):
         if code in self.fields:
             self.fields[code]['value'] = value
+            # Field values are used in curve evaluation
+            if not self.model_loading:
+                self.invalidate_curves()
             
     def get_text_field(self, code):
         if code in self.fields:
@@ -169,6 +175,24 @@ class ElementModel:
                 ports_h.append([int(self.x + port[1]*misc.M), int(self.y - port[0]*misc.M)])
             return ports_h
         
+    def get_render_key(self, select=False, override_color=None):
+        """Get signature of state affecting rendering of element"""
+        values = []
+        for field in self.fields.values():
+            value = field['value']
+            if value is None or isinstance(value, (str, int, float, bool)):
+                values.append(value)
+            else:
+                # Non scalar values are replaced on modification
+                values.append(misc.RefKey(value))
+        return (type(self), self.x, self.y, self.orientation, repr(self.ports), tuple(values),
+                override_color if override_color else self.draw_schem_color,
+                bool(select and self.selected), self.selected_color)
+    
+    def get_state_key(self):
+        """Get signature of state stored in storage model"""
+        return self.get_render_key()
+    
     def get_model(self):
         """Get storage model"""
         # Get reference for child
@@ -188,6 +212,22 @@ class ElementModel:
         # Function called after model loading
         pass
 
+    def get_curve_model(self, protection_model, code):
+        """Get field value of protection model, deferring curve evaluation while loading"""
+        old_value = self.fields[code]['value']
+        if self.defer_curves and isinstance(old_value, dict):
+            return protection_model.get_deferred_model(self.fields, old_value.get('graph_model'), 
+                                                       old_value.get('curve_key'))
+        else:
+            return protection_model.get_evaluated_model(self.fields)
+
+    def invalidate_curves(self):
+        """Mark protection and damage curves for re-evaluation on next use"""
+        for attr in ('line_protection_model', 'ground_protection_model', 'damage_model'):
+            protection_model = getattr(self, attr, None)
+            if protection_model:
+                protection_model.invalidate()
+
     def set_model(self, model, gid=None):
         """Set storage model"""
         if model['code'] == self.code:
@@ -201,7 +241,12 @@ class ElementModel:
                     self.set_text_field_value(code, model['fields'][code]['value'])
             self.gid = gid
             self.model_loading = False
-            self.set_model_cleanup()
+            # Curves are evaluated lazily when needed for display, reports or rules check
+            self.defer_curves = True
+            try:
+                self.set_model_cleanup()
+            finally:
+                self.defer_curves = False
             
     def set_gid(self, gid):
         self.gid = gid
@@ -249,6 +294,25 @@ class ElementModel:
             values[code] = self.fields[code]['value']
         return values
     
+    def get_expr_template(self, expr):
+        """Get compiled template and referenced field codes for text expression"""
+        key = (type(self), expr)
+        if key not in ElementModel.expr_templates:
+            identifiers = set(re.findall(r'[A-Za-z_]\w*', expr))
+            ElementModel.expr_templates[key] = (ExprTemplate(expr), identifiers)
+        return ElementModel.expr_templates[key]
+    
+    def get_text(self, expr):
+        """Render text expression, reusing result if referenced fields are unchanged"""
+        template, identifiers = self.get_expr_template(expr)
+        values = tuple((code, self.fields[code]['value']) for code in identifiers if code in self.fields)
+        cached = self.text_cache.get(expr)
+        if cached and cached[0] == values:
+            return cached[1]
+        text = template.render(**self.get_field_value_dict())
+        self.text_cache[expr] = (values, text)
+        return text
+    
     def modify_extends(self):
         element_region = cairo.Region(cairo.RectangleInt(*self.get_dimensions()))
         rects = []
@@ -463,6 +527,9 @@ class ElementModel:
             matrix = cairo.Matrix(0, -1, 1, 0, 0, 0)
             context.transform (matrix)
         self.text_extends = []
+        # Limit layout cache to recently used layouts
+        if len(self.layout_cache) > 2*len(text_model):
+            self.layout_cache = dict()
         # Render
         model_width_start = self.model_width
         y_calc = 0
@@ -480,12 +547,12 @@ class ElementModel:
                 ((x,y), expr, display_value, size, weight, alignment) = model
             if display_value:
                 y_calc = misc.M*y if y is not None else y_calc + misc.SCHEM_FONT_SPACING  # calculate y_calc (set or auto increment)
-                template = ExprTemplate(expr)
-                text = template.render(**self.get_field_value_dict())
+                text = self.get_text(expr)
                 (x,y,w,h) = misc.draw_text(context, text, misc.M*x, y_calc, color=color, 
                                            fontname=misc.SCHEM_FONT_FACE, 
                                            fontsize=size, fontweight=weight,
-                                           alignment=alignment)
+                                           alignment=alignment,
+                                           layout_cache=self.layout_cache)
                 self.text_extends.append((x, y, w, h))
         # Cleanup
         context.restore()
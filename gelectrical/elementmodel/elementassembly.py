@@ -23,7 +23,6 @@
 import logging, copy
 from math import sin, cos, acos, asin, exp, log, log10
 from mako.template import Template as ExprTemplate
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
@@ -102,6 +101,13 @@ class ElementAssembly(ElementModel):
         else:
             return False
         
+    def get_render_key(self, select=False, override_color=None):
+        key = ElementModel.get_render_key(self, select, override_color)
+        return key + (self.element_rect_width, self.element_rect_height)
+        
+    def get_state_key(self):
+        return self.get_render_key() + (repr(self.children_codes),)
+        
     def get_model(self):
         """Get storage model"""
         # Get reference for child
@@ -19,7 +19,6 @@
 # 
 
 import os, cairo
-from gi.repository import PangoCairo
 
 # local files import
 from .. import misc
@@ -243,7 +243,7 @@ Use this element for MV/ HV cables and overhead lines if the parameters of the l
         curves = {'curve_u': curve_u, 'curve_l': curve_l}
         param = {}
         self.damage_model = ProtectionModel(title, param, curves, element_type='damage')
-        self.fields['dcurve']['value'] = self.damage_model.get_evaluated_model(self.fields)
+        self.fields['dcurve']['value'] = self.get_curve_model(self.damage_model, 'dcurve')
 
 
 class LTCableIEC(Line):
@@ -1345,7 +1345,7 @@ Creates a bus trunking element with known parameters.
         param = {}
         curves = {'curve_u': curve_u, 'curve_l': curve_l}
         self.damage_model = ProtectionModel(title, param, curves, element_type='damage')
-        self.fields['dcurve']['value'] = self.damage_model.get_evaluated_model(self.fields)
+        self.fields['dcurve']['value'] = self.get_curve_model(self.damage_model, 'dcurve')
 
 
     def render_element(self, context):
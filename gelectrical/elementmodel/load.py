@@ -19,7 +19,6 @@
 # 
 
 import os, cairo, math
-from gi.repository import PangoCairo
 
 # local files import
 from .. import misc
@@ -365,7 +364,7 @@ Creates a generic three phase motor element.
         # Use parameters from saved model if available
         if self.fields['dcurve']['value'] is not None:
             self.damage_model.update_parameters(self.fields['dcurve']['value']['parameters'])
-        self.fields['dcurve']['value'] = self.damage_model.get_evaluated_model(self.fields)
+        self.fields['dcurve']['value'] = self.get_curve_model(self.damage_model, 'dcurve')
 
     def render_element(self, context):
         """Render element to context"""
@@ -477,7 +476,7 @@ Creates a generic single phase motor element.
         self.damage_model = ProtectionModel(title, param, curves, element_type='damage')
         if self.fields['dcurve']['value']:
             self.damage_model.update_parameters(self.fields['dcurve']['value']['parameters'])
-        self.fields['dcurve']['value'] = self.damage_model.get_evaluated_model(self.fields)
+        self.fields['dcurve']['value'] = self.get_curve_model(self.damage_model, 'dcurve')
 
     def render_element(self, context):
         """Render element to context"""
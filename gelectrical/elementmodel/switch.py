@@ -312,11 +312,11 @@ class ProtectionDevice(Switch):
             # Update parameters if already set
             if self.fields['pcurve_l']['value'] is not None and init is False:
                 self.line_protection_model.update_parameters(self.fields['pcurve_l']['value']['parameters'])
-            self.fields['pcurve_l']['value'] = self.line_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_l']['value'] = self.get_curve_model(self.line_protection_model, 'pcurve_l')
         elif self.fields['custom']['value'] and self.fields['pcurve_l']['value']:
             self.line_protection_model = ProtectionModel(subtitle, self.fields['pcurve_l']['value']['parameters'], 
                                     self.fields['pcurve_l']['value']['data'])
-            self.fields['pcurve_l']['value'] = self.line_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_l']['value'] = self.get_curve_model(self.line_protection_model, 'pcurve_l')
         else:
             self.fields['pcurve_l']['value'] = None
             self.line_protection_model = None
@@ -329,11 +329,11 @@ class ProtectionDevice(Switch):
             # Update parameters if already set
             if self.fields['pcurve_g']['value'] is not None and init is False:
                 self.ground_protection_model.update_parameters(self.fields['pcurve_g']['value']['parameters'])
-            self.fields['pcurve_g']['value'] = self.ground_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_g']['value'] = self.get_curve_model(self.ground_protection_model, 'pcurve_g')
         elif self.fields['custom']['value'] and self.fields['pcurve_g']['value'] is not None:
             self.ground_protection_model = ProtectionModel(subtitle, self.fields['pcurve_g']['value']['parameters'], 
                                     self.fields['pcurve_g']['value']['data'])
-            self.fields['pcurve_g']['value'] = self.ground_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_g']['value'] = self.get_curve_model(self.ground_protection_model, 'pcurve_g')
         else:
             self.fields['pcurve_g']['value'] = None
             self.ground_protection_model = None
@@ -948,11 +948,11 @@ Adds a contactor element used for on-load switching of loads.
             # Use parameters from saved model if available
             if self.fields['pcurve_l']['value'] is not None:
                 self.line_protection_model.update_parameters(self.fields['pcurve_l']['value']['parameters'])
-            self.fields['pcurve_l']['value'] = self.line_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_l']['value'] = self.get_curve_model(self.line_protection_model, 'pcurve_l')
         elif self.fields['custom']['value'] and self.fields['pcurve_l']['value']:
             self.line_protection_model = ProtectionModel(subtitle, self.fields['pcurve_l']['value']['parameters'], 
                                     self.fields['pcurve_l']['value']['data'])
-            self.fields['pcurve_l']['value'] = self.line_protection_model.get_evaluated_model(self.fields)
+            self.fields['pcurve_l']['value'] = self.get_curve_model(self.line_protection_model, 'pcurve_l')
         else:
             self.fields['pcurve_l']['value'] = None
             self.line_protection_model = None
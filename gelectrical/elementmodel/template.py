@@ -23,7 +23,6 @@
 import logging, copy
 from math import sin, cos, acos, asin, exp, log, log10
 from mako.template import Template as ExprTemplate
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
@@ -55,6 +54,10 @@ class Template(ElementModel):
         self.border_width = 5/misc.POINT_TO_MM/misc.M
         self.set_dimensions(width, height)
         
+    def get_render_key(self, select=False, override_color=None):
+        key = ElementModel.get_render_key(self, select, override_color)
+        return key + (self.model_width, self.model_height)
+        
     def set_dimensions(self, width=misc.PAGE_WIDTH, height=misc.PAGE_HEIGHT):
         # Set page dimensions
         self.model_width = width/misc.POINT_TO_MM/misc.M
@@ -19,7 +19,6 @@
 # 
 
 import math
-from gi.repository import PangoCairo
 
 # local files import
 from .. import misc
@@ -171,7 +170,7 @@ Creates a two-winding transformer.
         # Use parameters from saved model if available
         if self.fields['dcurve']['value'] is not None:
             self.damage_model.update_parameters(self.fields['dcurve']['value']['parameters'])
-        self.fields['dcurve']['value'] = self.damage_model.get_evaluated_model(self.fields)
+        self.fields['dcurve']['value'] = self.get_curve_model(self.damage_model, 'dcurve')
 
 
 class Transformer3w(ElementModel):
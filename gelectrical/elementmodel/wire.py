@@ -23,7 +23,6 @@
 import logging, copy
 from math import sin, cos, acos, asin, exp, log, log10
 from mako.template import Template as ExprTemplate
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
@@ -118,6 +117,10 @@ class Wire(ElementModel):
             self.points[slno] = (point[0] + dx, point[1] + dy)
         self.update_points()
     
+    def get_render_key(self, select=False, override_color=None):
+        key = ElementModel.get_render_key(self, select, override_color)
+        return key + (repr(self.points),)
+    
     def get_model(self):
         """Get storage model"""
         # Get reference for child
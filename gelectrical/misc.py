@@ -22,8 +22,8 @@
 #  
 #  
 
-import subprocess, threading, os, posixpath, platform, logging, math, cairo, copy, time, pathlib
-import base64
+import subprocess, threading, queue, traceback, os, posixpath, platform, logging, math, cairo, copy, time, pathlib
+import base64, re
 from collections.abc import MutableMapping
 from uuid import uuid4 as uuid
 from urllib.parse import urlparse
@@ -32,9 +32,17 @@ import pandas as pd
 import numpy as np
 from scipy.interpolate import interp1d
 
-from gi.repository import Gtk, Gdk, GLib, Pango, PangoCairo, GdkPixbuf
 import openpyxl
 
+# Gtk is not required for using the model and analysis without the program window
+try:
+    import gi
+    gi.require_version('Gtk', '3.0')
+    gi.require_version('PangoCairo', '1.0')
+    from gi.repository import Gtk, Gdk, GLib, Pango, PangoCairo, GdkPixbuf
+except (ImportError, ValueError):
+    Gtk = Gdk = GLib = Pango = PangoCairo = GdkPixbuf = None
+
 # Setup logger object
 log = logging.getLogger(__name__)
 
@@ -48,6 +56,11 @@ PROGRAM_VER = '1'
 APPID = "com.kavilgroup.gelectrical"
 # Paths updated from __init__
 USER_LIBRARY_DIR = ''
+GRAPH_CACHE_DIR = ''
+# Icon data used in reports, icon path -> (modification signature, (base64 data, aspect ratio))
+ICON_DATA_CACHE = dict()
+# Width of icons in report tables in cm
+ICON_TABLE_WIDTH = 1.8
 # Error codes used for displaying info in main window
 ERROR = -1
 WARNING = -2
@@ -97,6 +110,9 @@ RECTANGLE_RADIUS = 5
 PROCESS_TIMEOUT = 300 # 5 minutes
 # Timeout of auto hiding message
 MESSAGE_TIMEOUT = 10
+# Number of worker threads running background jobs. Jobs act on the open
+# project, so they are run one at a time in submission order.
+JOB_MAX_WORKERS = 1
 # String used for checking file version
 PROJECT_FILE_VER = 'GELECTRICAL_FILE_REFERENCE_VER_0'
 # Default settings
@@ -104,10 +120,11 @@ PAGE_WIDTH = 420  # for A3
 PAGE_HEIGHT = 297  # for A3
 GRID_WIDTH = 16
 SELECT_PORT_RECT = 16
+GRID_PATTERN_MAX_CELLS = 25  # Maximum grid cells in a repeating grid pattern
 SCHEM_FONT_FACE = 'osifont'
 SCHEM_FONT_SIZE = 7  # Keep minimum of 7 point (x 0.3527 in mm)
-SCHEM_FONT_WEIGHT = Pango.Weight.MEDIUM
-SCHEM_FONT_WEIGHT_BOLD = Pango.Weight.HEAVY
+SCHEM_FONT_WEIGHT = Pango.Weight.MEDIUM if Pango else 500
+SCHEM_FONT_WEIGHT_BOLD = Pango.Weight.HEAVY if Pango else 900
 TITLE_FONT_SIZE_SMALL = 6
 TITLE_FONT_SIZE = 8
 SCHEM_FONT_SPACING = 10
@@ -803,14 +820,16 @@ class Spreadsheet:
 class ProgressRevealer:
     """Class for handling display of long running proccess"""
     
-    def __init__(self, parent=None, label=None, progress=None):
+    def __init__(self, parent=None, label=None, progress=None, cancel_button=None):
         
         self.parent = parent
         self.label = label
         self.progress = progress
+        self.cancel_button = cancel_button
         # Setup data
         self.step = 0
         self.fraction = 0
+        self.cancel_handler_id = None
         
     # Revealer functions
     
@@ -818,7 +837,21 @@ class ProgressRevealer:
         GLib.idle_add(self.parent.set_reveal_child, True)
     
     def close(self):
+        self.set_cancel(None)
         GLib.idle_add(self.parent.set_reveal_child, False)
+        
+    def set_cancel(self, callback):
+        """Show cancel button calling callback when clicked, or hide it if callback is None"""
+        def update():
+            if self.cancel_handler_id is not None:
+                self.cancel_button.disconnect(self.cancel_handler_id)
+                self.cancel_handler_id = None
+            if callback:
+                self.cancel_handler_id = self.cancel_button.connect('clicked', lambda button: callback())
+            self.cancel_button.set_visible(callback is not None)
+            return False
+        if self.cancel_button:
+            GLib.idle_add(update)
     
     # General functions
         
@@ -853,6 +886,183 @@ class ProgressRevealer:
         GLib.idle_add(self.label.set_markup, message)
             
             
+class JobCancelled(Exception):
+    """Raised inside a job when it is cancelled"""
+    pass
+    
+    
+class CancelToken:
+    """Cooperative cancellation flag shared between a job and the main window
+    
+        Jobs call check() between stages and stop at the next check once
+        cancel() is called. Callbacks added are called on cancel, for stopping
+        work that can be interrupted such as export processes.
+    """
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.callbacks = []
+        self.lock = threading.Lock()
+        
+    def cancel(self):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.event.set()
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            callback()
+        
+    def is_cancelled(self):
+        return self.event.is_set()
+        
+    def check(self):
+        """Raise JobCancelled if cancelled"""
+        if self.event.is_set():
+            raise JobCancelled()
+            
+    def add_callback(self, callback):
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+        
+    def remove_callback(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+                
+                
+class Job:
+    """Background job submitted to JobScheduler"""
+    
+    def __init__(self, name, func, args, on_done=None, on_error=None, on_cancel=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.token = CancelToken()
+        
+    def cancel(self):
+        self.token.cancel()
+        
+        
+class JobScheduler:
+    """Run jobs on a bounded pool of worker threads
+    
+        Jobs are run as func(token, *args) and should call token.check()
+        between stages to allow cancelling. Outcome of a job is handed to the 
+        GTK main loop as on_done(result), on_error(exception) or on_cancel().
+        Jobs are identified by name, a job submitted while a job of the same
+        name is queued or running is coalesced into the existing job.
+        
+        Worker threads are daemonic so that a running job does not hold up 
+        closing of the program.
+    """
+    
+    def __init__(self, max_workers=JOB_MAX_WORKERS, dispatch=None):
+        self.max_workers = max_workers
+        # Function used for calling handlers on main loop
+        self.dispatch = dispatch if dispatch else self.idle_add
+        self.queue = queue.Queue()
+        self.jobs = dict()  # name -> Job
+        self.workers = []
+        self.lock = threading.Lock()
+        
+    @staticmethod
+    def idle_add(func, *args):
+        def callback():
+            func(*args)
+            return False
+        GLib.idle_add(callback)
+        
+    def get_job(self, name):
+        """Return queued or running job with name if any"""
+        with self.lock:
+            return self.jobs.get(name)
+        
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_cancel=None):
+        """Queue job and return it, or return existing job of same name"""
+        with self.lock:
+            if name in self.jobs:
+                log.info('JobScheduler - submit - job coalesced - ' + name)
+                return self.jobs[name]
+            job = Job(name, func, args, on_done, on_error, on_cancel)
+            self.jobs[name] = job
+            if len(self.workers) < self.max_workers:
+                worker = threading.Thread(target=self.run_worker, name='JobScheduler-' + str(len(self.workers)))
+                worker.daemon = True
+                self.workers.append(worker)
+                worker.start()
+        self.queue.put(job)
+        log.info('JobScheduler - submit - job queued - ' + name)
+        return job
+        
+    def cancel(self, name=None):
+        """Cancel job with name, or all jobs if name is None"""
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if name is None or job.name == name]
+        for job in jobs:
+            job.cancel()
+            
+    def run_worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self.run_job(job)
+            finally:
+                with self.lock:
+                    if self.jobs.get(job.name) is job:
+                        del self.jobs[job.name]
+                self.queue.task_done()
+                
+    def run_job(self, job):
+        try:
+            job.token.check()
+            result = job.func(job.token, *job.args)
+        except JobCancelled:
+            log.info('JobScheduler - run_job - job cancelled - ' + job.name)
+            if job.on_cancel:
+                self.dispatch(job.on_cancel)
+        except Exception as e:
+            log.error('JobScheduler - run_job - ' + job.name + ' - ' + repr(e))
+            log.error(traceback.format_exc())
+            if job.on_error:
+                self.dispatch(job.on_error, e)
+        else:
+            log.info('JobScheduler - run_job - job finished - ' + job.name)
+            if job.on_done:
+                self.dispatch(job.on_done, result)
+                
+                
+def run_in_main(func, *args):
+    """Call func on GTK main loop and wait for its result
+    
+        Used by jobs for updating widgets. func is called directly if called
+        from the main thread.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return func(*args)
+    done = threading.Event()
+    outcome = dict()
+    def callback():
+        try:
+            outcome['result'] = func(*args)
+        except Exception as e:
+            outcome['exception'] = e
+        finally:
+            done.set()
+        return False
+    GLib.idle_add(callback)
+    done.wait()
+    if 'exception' in outcome:
+        raise outcome['exception']
+    return outcome.get('result')
+    
+    
 class SplashScreen:
     def __init__(self, callback, image_filename, min_splash_time=0 ):
         self.image = Gtk.Image.new_from_file(image_filename )
@@ -921,6 +1131,23 @@ class ReferenceCounter:
         else:
             return self.start
 
+class RefKey:
+    """Reference to an object compared by identity, for use in state signatures
+    
+        Holding the reference keeps the object alive, so that the identity can
+        not be reused by a new object.
+    """
+    __slots__ = ('obj',)
+    
+    def __init__(self, obj):
+        self.obj = obj
+        
+    def __eq__(self, other):
+        return isinstance(other, RefKey) and self.obj is other.obj
+    
+    def __hash__(self):
+        return id(self.obj)
+
 class FieldDict(MutableMapping):
     """Convinence class to read field dictionary attributes"""
 
@@ -1418,81 +1645,162 @@ ELEMENT_RESULT = 1
 ELEMENT_PLACEHOLDER = 2
 
 def elements_to_table(elements, col_codes, col_captions, code_sources, table_class=None, 
-                      show_slno=True, show_element_class=True, modifyfunc=None, sum_cols=None):
-    table = dict()
-    clean = lambda x: clean_markup(str(x)).replace('\n','</br>')
-    # Add unit line
+                      show_slno=True, show_element_class=True, modifyfunc=None, sum_cols=None, col_units=None):
+    """Return table of element fields for reports
+    
+        The table is returned as a dict with keys 'class', 'captions' and 'rows'
+        for rendering by the report table macro. Rows are generated lazily while
+        the report is rendered.
+        
+        modifyfunc: Called as modifyfunc(element, row) with row as dict of column
+                    caption -> value. Row may be modified in place.
+        sum_cols: Indices of columns to be summed in a final row
+        col_units: Units of columns overriding units of fields
+    """
+    captions = []
     if show_slno:
-        table['Sl.No.'] = ['']
-    for col_caption in col_captions:
-        table[col_caption] = ['']
+        captions.append('Sl.No.')
+    captions += col_captions
     if show_element_class:
-        table['Item Class'] = ['']
-    # Add elements
-    index = 1
-    for element in elements:
+        captions.append('Item Class')
+    return {'class': table_class,
+            'captions': captions,
+            'rows': elements_to_rows(elements, col_codes, col_captions, code_sources, show_slno, 
+                                     show_element_class, modifyfunc, sum_cols, col_units)}
+    
+def elements_to_rows(elements, col_codes, col_captions, code_sources, show_slno=True, 
+                     show_element_class=True, modifyfunc=None, sum_cols=None, col_units=None):
+    """Generate rows of elements_to_table"""
+    clean = lambda x: clean_markup(str(x)).replace('\n','</br>')
+    
+    def get_fields(element, code_source):
+        if code_source == ELEMENT_FIELD:
+            return element.fields
+        elif code_source == ELEMENT_RESULT:
+            return element.res_fields
+        return None
+    
+    def get_row(values):
+        row = []
+        slno = values.pop('Sl.No.')
         if show_slno:
-            table['Sl.No.'].append(index)
+            row.append(slno)
+        item_class = values.pop('Item Class', None)
+        row += list(values.values())
         if show_element_class:
-            table['Item Class'].append(element.name)
+            row.append(item_class)
+        return row
+    
+    def float_conv(value):
+        try:  # try evaluating float
+            return float(value)
+        except:
+            return 0
+    
+    # Elements are iterated for each column of the unit line and again for rows
+    elements = list(elements)
+    
+    # Unit line
+    units = {'Sl.No.': ''}
+    for slno, (col_code, col_caption, code_source) in enumerate(zip(col_codes, col_captions, code_sources)):
+        units[col_caption] = ''
+        if col_units and col_units[slno]:
+            units[col_caption] = col_units[slno]
+            continue
+        for element in elements:
+            fields = get_fields(element, code_source)
+            if fields is not None and col_code in fields:
+                units[col_caption] = fields[col_code]['unit']
+                break
+    units['Item Class'] = ''
+    yield get_row(units)
+    # Elements
+    sums = {index: 0 for index in sum_cols} if sum_cols else dict()
+    for index, element in enumerate(elements, 1):
+        values = {'Sl.No.': index}
         for col_code, col_caption, code_source in zip(col_codes, col_captions, code_sources):
-            # Select table
-            if code_source == ELEMENT_FIELD:
-                fields = element.fields
-            elif code_source == ELEMENT_RESULT:
-                fields = element.res_fields
-            else:
-                table[col_caption].append('')
-                continue
-            # Set value
-            if col_code in fields:
+            fields = get_fields(element, code_source)
+            if fields is not None and col_code in fields:
                 field = fields[col_code]
-                table[col_caption][0] = field['unit']
                 if field['type'] == 'graph':
                     if field['selection_list']:
-                        table[col_caption].append(field['selection_list'][field['value']][0])
+                        values[col_caption] = field['selection_list'][field['value']][0]
                     else:
-                        table[col_caption].append(field['value'][0].replace('\n','</br>'))
+                        values[col_caption] = field['value'][0].replace('\n','</br>')
                 elif field['type'] == 'float':
-                    table[col_caption].append(str(round(field['value'], field['decimal'])))
+                    values[col_caption] = str(round(field['value'], field['decimal']))
                 else:
-                    table[col_caption].append(clean(field['value']))
+                    values[col_caption] = clean(field['value'])
             else:
-                table[col_caption].append('')
-        index += 1
-    if modifyfunc:
-        modifyfunc(table)
-    if sum_cols:
-        for index in sum_cols:
-            # Get sum
-            def float_conv(value):
-                try:  # try evaluating float
-                    return float(value)
-                except:
-                    return 0
-                
-            sum_of_col = sum(map(float_conv, table[col_captions[index]][1:])) # Ignore unit row
-            # Add blank row
-            if show_slno:
-                table['Sl.No.'].append('&Sigma;')
-            for col_caption in col_captions:
-                table[col_caption].append('')
-            if show_element_class:
-                table['Item Class'].append('')
-            table[col_captions[index]][-1] = sum_of_col
-            
-    return pd.DataFrame(table).to_html(index=False, escape=False, classes=table_class)
+                values[col_caption] = ''
+        values['Item Class'] = element.name
+        if modifyfunc:
+            modifyfunc(element, values)
+        for col_index in sums:
+            sums[col_index] += float_conv(values[col_captions[col_index]])
+        yield get_row(values)
+    # Sum line
+    if sums:
+        values = {'Sl.No.': '&Sigma;'}
+        for col_caption in col_captions:
+            values[col_caption] = ''
+        for col_index, sum_of_col in sums.items():
+            values[col_captions[col_index]] = sum_of_col
+        values['Item Class'] = ''
+        yield get_row(values)
     
-def fields_to_table(fields, insert_image=True, insert_graph=True):
-    table = {'Sl.No.':[], 'Description': [], 'Value': [], 'Unit': []}
+def get_icon_data(image_path):
+    """Return (base64 data, aspect ratio) of icon, cached until the file is modified"""
+    image_file = abs_path('icons', image_path)
+    stat = os.stat(image_file)
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    cached = ICON_DATA_CACHE.get(image_file)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(image_file, 'rb') as fp:
+        data = fp.read()
+    # Aspect ratio from svg width and height attributes
+    aspect = 1
+    match = re.search(rb'<svg\b[^>]*>', data)
+    if match:
+        width = re.search(rb'\swidth="([0-9.]+)', match.group(0))
+        height = re.search(rb'\sheight="([0-9.]+)', match.group(0))
+        if width and height and float(width.group(1)) > 0:
+            aspect = float(height.group(1)) / float(width.group(1))
+    value = (base64.b64encode(data).decode('utf-8'), aspect)
+    ICON_DATA_CACHE[image_file] = (mtime, value)
+    return value
+
+def get_icon_css(icon_classes):
+    """Return CSS rules for icon classes collected by fields_to_table"""
+    rules = []
+    for class_name, (data_uri, aspect) in icon_classes.items():
+        rule = ".{0}{{ height: {1:.3f}cm; background-image: url('data:image/svg+xml;base64,{2}'); }}"
+        rules.append(rule.format(class_name, ICON_TABLE_WIDTH*aspect, data_uri))
+    return '\n'.join(rules)
+
+def fields_to_table(fields, insert_image=True, insert_graph=True, graph_renderer=None, icon_classes=None):
+    """Convert fields to table for reports
+    
+        The table is returned as a dict with keys 'class', 'captions' and 'rows'
+        for rendering by the report table macro. Rows are generated lazily while
+        the report is rendered.
+        If graph_renderer is passed, graphs are added to it and placeholders are
+        inserted in place of images.
+        If icon_classes dict is passed, icons are referenced through CSS classes
+        and the class data is added to it for use with get_icon_css.
+    """
+    return {'class': 'element_fields',
+            'captions': ['Sl.No.', 'Description', 'Value', 'Unit'],
+            'rows': fields_to_rows(fields, insert_image, insert_graph, graph_renderer, icon_classes)}
+    
+def fields_to_rows(fields, insert_image=True, insert_graph=True, graph_renderer=None, icon_classes=None):
+    """Generate rows of fields_to_table"""
     clean = lambda x: clean_markup(str(x)).replace('\n','</br>')
     index = 1
     for field in fields.values():
         if field['status_enable'] == True:
             if field['type'] not in ('graph', 'data', 'heading'):
-                table['Sl.No.'].append(index)
-                table['Description'].append(clean(field['caption']))
-                table['Unit'].append(field['unit'])
                 if field['type'] == 'float':
                     value = str(round(field['value'], field['decimal']))
                 else:
@@ -1501,35 +1809,33 @@ def fields_to_table(fields, insert_image=True, insert_graph=True):
                     sel_index = field['selection_list'].index(field['value'])
                     image_path = field['selection_image_list'][sel_index]
                     if image_path:
-                        image_file = abs_path('icons', image_path)
-                        data_uri = base64.b64encode(open(image_file, 'rb').read()).decode('utf-8')
-                        img_tag = "<div class='parent flex-parent'><div class='child flex-left'><img class='img_table' src='data:image/svg+xml;base64,{0}'></div><div class='child flex-right'>{1}</div></div>".format(data_uri, value)
-                        table['Value'].append(img_tag)
-                    else:
-                        table['Value'].append(value)
-                else:
-                    table['Value'].append(value)
+                        data_uri, aspect = get_icon_data(image_path)
+                        if icon_classes is None:
+                            image = "<img class='img_table' src='data:image/svg+xml;base64,{0}'>".format(data_uri)
+                        else:
+                            class_name = 'icon_' + re.sub(r'\W', '_', os.path.splitext(image_path)[0])
+                            icon_classes[class_name] = (data_uri, aspect)
+                            image = "<div class='img_table img_icon {0}'></div>".format(class_name)
+                        value = "<div class='parent flex-parent'><div class='child flex-left'>{0}</div><div class='child flex-right'>{1}</div></div>".format(image, value)
+                yield [index, clean(field['caption']), value, field['unit']]
                 index += 1
             elif field['type'] == 'heading':
-                table['Sl.No.'].append('')
-                table['Description'].append('<b>' + clean(field['caption']) + '</b>')
-                table['Unit'].append(field['unit'])
-                table['Value'].append(clean(field['value']))
+                yield ['', '<b>' + clean(field['caption']) + '</b>', clean(field['value']), field['unit']]
             elif field['type'] == 'data':
-                table['Sl.No.'].append(index)
-                table['Description'].append(clean(field['caption']))
-                table['Unit'].append(field['unit'])
                 img_tag = ''
                 graph_fields = ''
                 # Add graphimage
                 if insert_graph:
-                    from .view.graph import GraphImage
                     xlim, ylim, xlabel, ylabel, graph_params = field['graph_options']
                     title = field['value']['graph_model'][0]
                     graph_models = field['value']['graph_model'][1]
-                    graph_image = GraphImage(xlim, ylim, title, xlabel, ylabel, graph_params)
-                    graph_image.add_plots(graph_models)
-                    img_tag = graph_image.get_embedded_html_image(figsize=(200, 200))
+                    if graph_renderer:
+                        img_tag = graph_renderer.add(xlim, ylim, title, xlabel, ylabel, graph_params, graph_models)
+                    else:
+                        from .model.graphimage import GraphImage
+                        graph_image = GraphImage(xlim, ylim, title, xlabel, ylabel, graph_params=graph_params)
+                        graph_image.add_plots(graph_models)
+                        img_tag = graph_image.get_embedded_html_image(figsize=(200, 200))
                 # Add graph options
                 param_fields = get_fields_from_params(field['value']['parameters'])
                 for param_key, param_field in param_fields.items():
@@ -1543,28 +1849,27 @@ def fields_to_table(fields, insert_image=True, insert_graph=True):
                             graph_fields += '</br><b>' + clean(caption) + '</b>'
                         else:
                             graph_fields += '</br>' + clean(caption + ' : ' + str(value) + ' ' + unit)
-                table['Value'].append(img_tag + graph_fields.lstrip('</br>'))
+                yield [index, clean(field['caption']), img_tag + graph_fields.lstrip('</br>'), field['unit']]
                 index += 1
             else:
-                table['Sl.No.'].append(index)
-                table['Description'].append(clean(field['caption']))
-                table['Unit'].append(field['unit'])
                 if field['selection_list']:
-                    table['Value'].append(field['selection_list'][field['value']][0])
+                    value = field['selection_list'][field['value']][0]
                 else:
                     title = field['value'][0]
                     if insert_graph:
-                        from .view.graph import GraphImage
                         xlim, ylim, xlabel, ylabel, graph_params = field['graph_options']
                         graph_models = field['value'][1]
-                        graph_image = GraphImage(xlim, ylim, title, xlabel, ylabel, graph_params)
-                        graph_image.add_plots(graph_models)
-                        img_tag = graph_image.get_embedded_html_image(figsize=(200, 200))
-                        table['Value'].append(img_tag)
+                        if graph_renderer:
+                            value = graph_renderer.add(xlim, ylim, title, xlabel, ylabel, graph_params, graph_models)
+                        else:
+                            from .model.graphimage import GraphImage
+                            graph_image = GraphImage(xlim, ylim, title, xlabel, ylabel, graph_params=graph_params)
+                            graph_image.add_plots(graph_models)
+                            value = graph_image.get_embedded_html_image(figsize=(200, 200))
                     else:
-                        table['Value'].append(clean(title))
+                        value = clean(title)
+                yield [index, clean(field['caption']), value, field['unit']]
                 index += 1
-    return pd.DataFrame(table).to_html(index=False, escape=False, classes='element_fields')
     
 def params_to_table(fields_list, titles):
     """Return pandas table with comparison of field values"""
@@ -1733,31 +2038,43 @@ def draw_line(context, x0, y0, x1, y1, color=COLOR_NORMAL, dash_pattern=[], stro
     context.stroke()
     context.restore()
 
-def draw_text(context, text, x, y, color=COLOR_NORMAL, fontname='Sans', fontsize=12, fontweight=SCHEM_FONT_WEIGHT, alignment='left'):
-    """Draw text using Pango"""
+def draw_text(context, text, x, y, color=COLOR_NORMAL, fontname='Sans', fontsize=12, fontweight=SCHEM_FONT_WEIGHT, alignment='left', layout_cache=None):
+    """Draw text using Pango
+    
+        layout_cache: Optional dict for reusing Pango layouts of same text and font
+    """
     context.save()
     context.translate(x,y)
     (r,g,b,a) = hex2rgb(color)
     context.set_source_rgba(r, g, b, a)
-    layout = PangoCairo.create_layout(context)
-    font = Pango.FontDescription(fontname + " " + str(fontsize))
-    font.set_weight(fontweight)
-    layout.set_font_description(font)
-    layout.set_text(text)
-    # Modify coordinates for alignment
-    (width, height) = layout.get_size()
-    w = Pango.units_to_double(width)
-    h = Pango.units_to_double(height)
-    if alignment == 'center': 
-        layout.set_alignment(Pango.Alignment.CENTER)
-        dx = -w/2
-    elif alignment == 'right':
-        layout.set_alignment(Pango.Alignment.RIGHT)
-        dx = -w
+    key = (text, fontname, fontsize, fontweight, alignment)
+    if layout_cache is not None and key in layout_cache:
+        (layout, w, h, dx) = layout_cache[key]
     else:
-        layout.set_alignment(Pango.Alignment.LEFT)
-        dx = 0
+        layout = PangoCairo.create_layout(context)
+        font = Pango.FontDescription(fontname + " " + str(fontsize))
+        font.set_weight(fontweight)
+        layout.set_font_description(font)
+        layout.set_text(text)
+        # Modify coordinates for alignment
+        (width, height) = layout.get_size()
+        w = Pango.units_to_double(width)
+        h = Pango.units_to_double(height)
+        if alignment == 'center': 
+            layout.set_alignment(Pango.Alignment.CENTER)
+            dx = -w/2
+        elif alignment == 'right':
+            layout.set_alignment(Pango.Alignment.RIGHT)
+            dx = -w
+        else:
+            layout.set_alignment(Pango.Alignment.LEFT)
+            dx = 0
+        if layout_cache is not None:
+            layout_cache[key] = (layout, w, h, dx)
     context.translate(dx,0)
+    if layout_cache is not None:
+        # Match layout to current context
+        PangoCairo.update_layout(context, layout)
     PangoCairo.show_layout(context, layout)
     context.restore()
 
@@ -20,4 +20,5 @@
 #  
 #  
 
-from . import drawing, graph, networkmodel, pandapower, project, rulescheck, protection
+# project is left out since it depends on views, it is imported by the program window
+from . import drawing, graph, graphimage, networkmodel, pandapower, rulescheck, protection, library, spatialindex, export, projectfile, reportgraphs, reportpdf, report, resultsexport, exportjobs, analysisworker
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# analysisworker
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+
+import time, queue, logging, threading, traceback, multiprocessing
+
+# local files import
+from .. import misc
+from . import export
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Interval in seconds for polling worker messages and cancellation
+ANALYSIS_WORKER_POLL_INTERVAL = 0.1
+# Time in seconds given to worker for stopping at next stage once cancelled,
+# after which the worker is terminated and started afresh on next run
+ANALYSIS_WORKER_CANCEL_TIMEOUT = 3
+# Time in seconds given to worker for exiting on stop
+ANALYSIS_WORKER_STOP_TIMEOUT = 2
+
+
+## Worker process
+
+def warm_up():
+    """Import pandapower and solve a small network so that numba functions are compiled"""
+    import pandapower as pp
+    import pandapower.shortcircuit as sc
+    from .pandapower import PandaPowerModel
+    net = pp.create_empty_network()
+    bus1 = pp.create_bus(net, vn_kv=0.415)
+    bus2 = pp.create_bus(net, vn_kv=0.415)
+    pp.create_ext_grid(net, bus1, s_sc_max_mva=10, rx_max=0.1, s_sc_min_mva=10, rx_min=0.1)
+    pp.create_line_from_parameters(net, bus1, bus2, length_km=0.1, r_ohm_per_km=0.1, x_ohm_per_km=0.1,
+                                   c_nf_per_km=0, max_i_ka=0.1, endtemp_degree=160)
+    pp.create_load(net, bus2, p_mw=0.01, q_mvar=0.005)
+    pp.runpp(net)
+    sc.calc_sc(net, case='max')
+
+def analyse_project(project, settings, progress_callback, cancel_event=None):
+    """Run analysis on project built by export.get_snapshot_project
+    
+        Follows the analysis stages of the program, stopping after diagnostics
+        if they return errors. Results are set on elements of the project and
+        the network model is left set up on project.networkmodel.
+    
+        Arguments:
+            project: Project with drawing models and an empty network model
+            settings: Analysis settings from AnalysisSettingsDialog
+            progress_callback: Called as progress_callback(message, fraction) on start of stages
+            cancel_event: Event set when analysis is to be stopped at next stage
+        Returns:
+            Dict with keys 'diagnostics' as (diagnostic results, return code) or None,
+            'element_results' as {element code: res_fields}, 'node_results' as
+            {global node: res_fields} and 'power_model' as pandapower json if 
+            results are to be exported.
+    """
+    from .pandapower import PandaPowerModel
+
+    def check():
+        if cancel_event is not None and cancel_event.is_set():
+            raise misc.JobCancelled()
+
+    progress_callback('Building Base Model...', 0)
+    sim_settings = project.get_project_fields(page='Simulation')
+    networkmodel = project.networkmodel
+    networkmodel.setup_base_elements()
+    networkmodel.setup_global_nodes()
+    networkmodel.build_graph_model()
+
+    check()
+    progress_callback('Building Power Model...', 0.1)
+    powermodel = PandaPowerModel(networkmodel, project.loadprofiles, sim_settings['grid_frequency']['value'])
+    powermodel.build_power_model(mode=misc.POWER_MODEL_LINEFAULT)
+    powermodel.build_power_model(mode=misc.POWER_MODEL_GROUNDFAULT)
+    powermodel.build_power_model(mode=misc.POWER_MODEL_POWERFLOW)
+    result = {'diagnostics': None, 'element_results': dict(), 'node_results': dict(), 'power_model': None}
+
+    if settings['diagnostics']:
+        check()
+        progress_callback('Running Diagnostics...', 0.2)
+        result['diagnostics'] = powermodel.run_diagnostics()
+        if result['diagnostics'][1] == misc.ERROR:
+            return result
+
+    runpp_3ph = sim_settings['power_flow_3ph']['value']
+    sc_settings = {'lv_tol_percent': sim_settings['lv_tol_percent']['value'], 
+                   'r_fault_ohm': sim_settings['r_fault_ohm']['value'], 
+                   'x_fault_ohm': sim_settings['x_fault_ohm']['value'],
+                   'show_impedances': sim_settings['show_impedances']['value']}
+    if settings['powerflow']:
+        check()
+        if settings['pf_method'] in ('Power flow with diversity', 'Power flow'):
+            progress_callback('Running Power Flow...', 0.3)
+            powermodel.run_powerflow(settings['pf_method'], runpp_3ph=runpp_3ph)
+        elif settings['pf_method'] == 'Time series':
+            progress_callback('Running Time Series Power Flow...', 0.3)
+            powermodel.run_powerflow_timeseries(runpp_3ph=runpp_3ph)
+    if settings['sc_sym']:
+        check()
+        progress_callback('Running Symmetric Short Circuit Calculation...', 0.4)
+        powermodel.run_sym_sccalc(**sc_settings)
+    if settings['sc_gf']:
+        check()
+        progress_callback('Running Line to Ground Short Circuit Calculation...', 0.5)
+        powermodel.run_linetoground_sccalc(**sc_settings)
+
+    check()
+    powermodel.update_results()
+    result['element_results'] = powermodel.element_results
+    result['node_results'] = powermodel.node_results
+    if settings['folder'] and settings['export']:
+        result['power_model'] = powermodel.get_json()
+    return result
+
+def run_analysis(snapshot, settings, progress_callback, cancel_event):
+    """Run analysis on project snapshot from ProjectModel.get_analysis_snapshot
+    
+        Returns result of analyse_project.
+    """
+    project = export.get_snapshot_project(snapshot)
+    return analyse_project(project, settings, progress_callback, cancel_event)
+
+def run_worker(requests, messages, cancel_event):
+    """Serve analysis requests until None is received
+
+        Runs in the worker process. Replies are put on messages as
+        ('progress', request id, message, fraction), ('result', request id, result),
+        ('cancelled', request id) or ('error', request id, traceback).
+    """
+    try:
+        start = time.perf_counter()
+        warm_up()
+        log.info('run_worker - warmed up in {:.1f}s'.format(time.perf_counter() - start))
+    except Exception:
+        log.warning('run_worker - warm up failed - ' + traceback.format_exc())
+    messages.put(('ready', None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, snapshot, settings = request
+        def progress_callback(message, fraction):
+            messages.put(('progress', request_id, message, fraction))
+        try:
+            result = run_analysis(snapshot, settings, progress_callback, cancel_event)
+        except misc.JobCancelled:
+            messages.put(('cancelled', request_id))
+        except Exception:
+            messages.put(('error', request_id, traceback.format_exc()))
+        else:
+            messages.put(('result', request_id, result))
+
+
+## Main process
+
+class AnalysisWorker:
+    """Persistent process running analysis of project snapshots
+    
+        The worker process is started once and kept for the session, so that
+        pandapower imports and numba compilation are paid once. Solving in a
+        separate process keeps the main loop responsive. Results are sent back
+        for applying to elements of the project through WorkerPowerModel.
+    """
+
+    def __init__(self):
+        # Use spawned workers since forking a process running Gtk is unsafe
+        self.mp_context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.requests = None
+        self.messages = None
+        self.cancel_event = None
+        self.request_id = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start worker process if not running"""
+        with self.lock:
+            if self.process is None or not self.process.is_alive():
+                self.requests = self.mp_context.Queue()
+                self.messages = self.mp_context.Queue()
+                self.cancel_event = self.mp_context.Event()
+                self.process = self.mp_context.Process(target=run_worker, 
+                                                       args=(self.requests, self.messages, self.cancel_event),
+                                                       name='AnalysisWorker', daemon=True)
+                self.process.start()
+                log.info('AnalysisWorker - start - worker process started')
+
+    def stop(self):
+        """Stop worker process"""
+        with self.lock:
+            if self.process is not None:
+                if self.process.is_alive():
+                    self.requests.put(None)
+                    self.process.join(ANALYSIS_WORKER_STOP_TIMEOUT)
+                    if self.process.is_alive():
+                        self.process.terminate()
+                self.process = None
+                log.info('AnalysisWorker - stop - worker process stopped')
+
+    def terminate(self):
+        with self.lock:
+            if self.process is not None:
+                self.process.terminate()
+                self.process.join()
+                self.process = None
+                log.info('AnalysisWorker - terminate - worker process terminated')
+
+    def submit(self, snapshot, settings):
+        """Queue analysis of project snapshot and return request id"""
+        self.start()
+        self.request_id += 1
+        self.cancel_event.clear()
+        self.requests.put((self.request_id, snapshot, settings))
+        return self.request_id
+
+    def wait(self, request_id, token=None, progress_callback=None):
+        """Wait for results of request passing on progress
+        
+            Arguments:
+                request_id: Request id returned by submit
+                token: misc.CancelToken for cancelling analysis
+                progress_callback: Called as progress_callback(message, fraction)
+            Returns:
+                Result of run_analysis
+        """
+        cancel_time = None
+        while True:
+            if token and token.is_cancelled() and cancel_time is None:
+                self.cancel_event.set()
+                cancel_time = time.monotonic()
+            if cancel_time is not None and time.monotonic() - cancel_time > ANALYSIS_WORKER_CANCEL_TIMEOUT:
+                self.terminate()
+                raise misc.JobCancelled()
+            try:
+                message = self.messages.get(timeout=ANALYSIS_WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                if self.process is None or not self.process.is_alive():
+                    self.process = None
+                    raise RuntimeError('Analysis worker exited unexpectedly')
+                continue
+            code, message_id = message[0], message[1]
+            # Skip replies of earlier cancelled requests
+            if message_id != request_id:
+                continue
+            if code == 'progress':
+                if progress_callback:
+                    progress_callback(message[2], message[3])
+            elif code == 'result':
+                return message[2]
+            elif code == 'cancelled':
+                raise misc.JobCancelled()
+            elif code == 'error':
+                log.error('AnalysisWorker - wait - analysis failed\n' + message[2])
+                raise RuntimeError(message[2].strip().splitlines()[-1])
+
+
+class WorkerPowerModel:
+    """Results of analysis run in AnalysisWorker, used in place of PandaPowerModel
+    
+        Provides the result functions of PandaPowerModel used by ProjectModel.
+    """
+
+    def __init__(self, network_model, result):
+        self.base_elements = network_model.base_elements
+        self.element_results = result['element_results']
+        self.node_results = result['node_results']
+        self.diagnostics = result['diagnostics']
+        self.power_model_json = result['power_model']
+
+    def run_diagnostics(self):
+        """Return diagnostic results and return code of analysis run"""
+        if self.diagnostics is None:
+            raise RuntimeError('WorkerPowerModel - run_diagnostics - Diagnostics not run')
+        return self.diagnostics
+
+    def update_results(self):
+        for e_code, element_result in self.element_results.items():
+            if e_code in self.base_elements:
+                self.base_elements[e_code].res_fields = element_result
+        log.info('WorkerPowerModel - update_results - results updated')
+
+    def get_json(self):
+        if self.power_model_json is None:
+            raise RuntimeError('WorkerPowerModel - get_json - Power model not exported by analysis')
+        return self.power_model_json
+
+    def export_json(self, filename):
+        with open(filename, 'w') as fp:
+            fp.write(self.get_json())
+
+    def export_html_report(self, filename):
+        import pandapower as pp
+        import pandapower.plotting as pplot
+        pplot.to_html(pp.from_json_string(self.get_json()), filename)
@@ -24,7 +24,6 @@
 
 import logging, copy
 from math import sin, cos, acos, asin, exp, log, log10
-from gi.repository import Gtk, Gdk
 import cairo
 
 # local files import
@@ -35,12 +34,26 @@ from ..elementmodel.template import Template, TitleBlock
 from ..elementmodel.elementassembly import ElementAssembly
 from ..elementmodel.reference import Reference
 from ..elementmodel.wire import Wire
+from .spatialindex import SpatialIndex
+from . import projectfile
 
 
 # Get logger object
 log = logging.getLogger(__name__)
 
 
+class RenderCache:
+    """Cached recordings of rendered elements of a drawing view"""
+    
+    def __init__(self):
+        self.items = dict()  # id(element) -> (render key, element, recording surface, extents)
+        self.ports = None  # (selected ports key, extents)
+        
+    def clear(self):
+        self.items = dict()
+        self.ports = None
+
+
 class DrawingModel:
     """Class for modelling a drawing"""
     
@@ -59,7 +72,14 @@ class DrawingModel:
         self.assembly_dict = dict()
         self.element_gid_mapping = dict()  # Element slno -> gid mapping
         self.element_gid_mapping_inv = dict()  # Element gid -> slno mapping
+        self.element_slno_mapping = dict()  # id(element) -> slno mapping
+        self.spatial_index = SpatialIndex()  # Index of element bounds and ports for hit testing
+        self.grid_patterns = dict()  # (scale, grid_width) -> grid pattern
         self.gid = 0
+        self.pending_model = None  # Serialised page with elements yet to be created
+        self.source_key = None  # Signature of serialised page the model was loaded from
+        self.source_elements_key = None  # State key of elements as loaded from serialised page
+        self.pending_results = None  # Callable returning stored analysis results of lazily loaded page
         
         # Data
         self.fields = {'name':          misc.get_field_dict('str', 'Sheet Name', '', 'Sheet', status_inactivate=False),
@@ -87,6 +107,20 @@ class DrawingModel:
         
     ## Export/Import functions
     
+    @property
+    def elements(self):
+        # Create elements of lazily loaded page on first use
+        if self.pending_model is not None:
+            self.load_pending_model()
+        return self._elements
+    
+    @elements.setter
+    def elements(self, elements):
+        self._elements = elements
+        
+    def is_loaded(self):
+        return self.pending_model is None
+    
     def __getitem__(self, index):
         if len(self.elements) > index:
             return self.elements[index]
@@ -98,11 +132,28 @@ class DrawingModel:
     def export_drawing(self, context):
         self.draw_model(context, select=False)
     
-    def get_model(self):
+    def get_state_key(self):
+        """Get signature of state stored in storage model"""
+        fields = tuple((code, field['value']) for code, field in self.fields.items())
+        if self.pending_model is not None:
+            return (fields, self.source_key)
+        elements = tuple(element.get_state_key() for element in self.elements 
+                         if element.code not in misc.DISPLAY_ELEMENT_CODES)
+        if self.source_key is not None and elements == self.source_elements_key:
+            # Elements unmodified since loading
+            return (fields, self.source_key)
+        return (fields, elements)
+    
+    def get_model(self, display_elements=False):
         """Get storage model"""
+        if self.pending_model is not None:
+            # Page not loaded, use serialised elements
+            model = self.parse_pending_model()
+            model[1]['fields'] = misc.get_fields_trunc(self.fields)
+            return model
         element_models = []
         for element in self.elements:
-            if element.code not in misc.DISPLAY_ELEMENT_CODES:
+            if display_elements or element.code not in misc.DISPLAY_ELEMENT_CODES:
                 element_models.append(element.get_model())
         model = dict()
         model['fields'] = misc.get_fields_trunc(self.fields)
@@ -111,32 +162,16 @@ class DrawingModel:
             
     def set_model(self, model, copy_elements=True):
         """Set storage model"""
+        self.pending_model = None
+        self.pending_results = None
+        self.source_key = None
+        self.source_elements_key = None
         self.elements = []
         if model[0] == 'DrawingModel':
             if copy_elements:
-                # Load elements
-                for base_model in model[1]['elements']:
-                    code = base_model['code']
-                    if code == 'element_assembly':
-                        element = ElementAssembly()
-                    elif code == 'element_wire':
-                        element = Wire()
-                    else:
-                        element = self.program_state['element_models'][code](project_settings=self.program_state['project_settings'])
-                        if code in misc.LOADPROFILE_CODES:
-                            element.fields['load_profile']['selection_list'] = self.parent.loadprofiles
-                    element.set_model(base_model, self.get_gid())
-                    self.elements.append(element)
-                    
-                # Update gid_assembly for elements
-                for el_no, element in enumerate(self.elements):
-                    if element.code == 'element_assembly':
-                        children_codes = element.get_children()
-                        gid_assembly = element.get_gid()
-                        for page, child_el_no in children_codes:
-                            child_element = self.elements[child_el_no]
-                            child_element.set_gid_assembly(gid_assembly)
-                    
+                self.set_element_models(model[1]['elements'])
+            self.update_state_variables()
+            self.spatial_index.rebuild(self.elements)
             self.fields = misc.update_fields(self.fields, model[1]['fields'])
             if self.fields['page_size']['value'] != 'Custom':
                 (width, height) = misc.paper_sizes[self.fields['page_size']['value']]
@@ -153,6 +188,71 @@ class DrawingModel:
             self.selected_port_color = misc.COLOR_SELECTED
             self.models_drawn = False
             
+    def set_model_lazy(self, data, fields=None, results=None):
+        """Set storage model deferring creation of elements till first use
+        
+            Arguments:
+                data: Serialised storage model as projectfile.CachedPage, json text or 
+                    parsed storage model
+                fields: Truncated page fields, read from data if not passed
+                results: Callable returning stored analysis results of page as 
+                    {index of element among non display elements: res_fields}
+        """
+        if fields is None:
+            data = projectfile.parse_page(data)
+            fields = data[1]['fields']
+        self.set_model(['DrawingModel', {'fields': fields}], copy_elements=False)
+        self.pending_model = data
+        self.pending_results = results
+        self.source_key = misc.RefKey(data)
+        
+    def parse_pending_model(self):
+        return projectfile.parse_page(self.pending_model)
+        
+    def load_pending_model(self):
+        """Create elements of lazily loaded page"""
+        model = self.parse_pending_model()
+        self.pending_model = None
+        self.set_element_models(model[1]['elements'])
+        self.update_state_variables()
+        self.spatial_index.rebuild(self.elements)
+        self.models_drawn = False
+        self.source_elements_key = tuple(element.get_state_key() for element in self.elements 
+                                         if element.code not in misc.DISPLAY_ELEMENT_CODES)
+        if self.pending_results:
+            page_results = self.pending_results()
+            self.pending_results = None
+            for index, element in enumerate(self.elements):
+                if index in page_results:
+                    element.res_fields = page_results[index]
+        log.info('DrawingModel - load_pending_model - {} elements loaded for sheet {}'.format(
+                    len(self.elements), self.fields['name']['value']))
+        
+    def set_element_models(self, element_models):
+        """Create elements from element storage models"""
+        self.elements = []
+        for base_model in element_models:
+            code = base_model['code']
+            if code == 'element_assembly':
+                element = ElementAssembly()
+            elif code == 'element_wire':
+                element = Wire()
+            else:
+                element = self.program_state['element_models'][code](project_settings=self.program_state['project_settings'])
+                if code in misc.LOADPROFILE_CODES:
+                    element.fields['load_profile']['selection_list'] = self.parent.loadprofiles
+            element.set_model(base_model, self.get_gid())
+            self.elements.append(element)
+            
+        # Update gid_assembly for elements
+        for el_no, element in enumerate(self.elements):
+            if element.code == 'element_assembly':
+                children_codes = element.get_children()
+                gid_assembly = element.get_gid()
+                for page, child_el_no in children_codes:
+                    child_element = self.elements[child_el_no]
+                    child_element.set_gid_assembly(gid_assembly)
+            
     ## Update functions
             
     def update_state_variables(self):
@@ -160,6 +260,7 @@ class DrawingModel:
         self.assembly_dict = dict()
         self.element_gid_mapping = dict()
         self.element_gid_mapping_inv = dict()
+        self.element_slno_mapping = dict()
         
         # Populate state variables from elements
         for el_no, element in enumerate(self.elements):
@@ -174,6 +275,7 @@ class DrawingModel:
 
             self.element_gid_mapping[el_no] = gid
             self.element_gid_mapping_inv[gid] = el_no
+            self.element_slno_mapping[id(element)] = el_no
             
     def update_elements(self):
         """Update elements after elements are drawn"""
@@ -194,6 +296,7 @@ class DrawingModel:
                         children.append(child)
                 if self.models_drawn:
                     element.set_children(children_codes_new, children)
+                    self.spatial_index.update(element)
                 else:
                     element.set_children(children_codes_new)
         
@@ -289,6 +392,25 @@ class DrawingModel:
         y = round(y/self.grid_width, 0)*self.grid_width
         return x,y
     
+    def get_elements_in_rect(self, x, y, w, h, ports=False):
+        """Get candidate elements around rectangle from spatial index in drawing order"""
+        if ports:
+            elements = self.spatial_index.query_ports(x, y, w, h)
+        else:
+            elements = self.spatial_index.query(x, y, w, h)
+        candidates = []
+        for element in elements:
+            slno = self.element_slno_mapping.get(id(element))
+            # Refresh mapping if stale
+            if slno is None or slno >= len(self.elements) or self.elements[slno] is not element:
+                self.update_state_variables()
+                slno = self.element_slno_mapping.get(id(element))
+                if slno is None:
+                    continue
+            candidates.append((slno, element))
+        candidates.sort(key=lambda item: item[0])
+        return candidates
+    
     def get_port_around_coordinate(self, x, y, w=misc.SELECT_PORT_RECT, h=misc.SELECT_PORT_RECT, ignore_display_elements=False):
         """Get port around given coordinate"""
         w = int(w)
@@ -297,7 +419,7 @@ class DrawingModel:
         y = int(y-h/2)
         # Form selection rectangle
         rect = cairo.RectangleInt(x, y, w, h)
-        for element in self.elements:
+        for slno, element in self.get_elements_in_rect(x, y, w, h, ports=True):
             # Check for overlap
             port = element.check_overlap_ports(rect)
             if port:
@@ -315,7 +437,7 @@ class DrawingModel:
         y = int(y-h/2)
         # Form selection rectangle
         rect = cairo.RectangleInt(x, y, w, h)
-        for slno, element in enumerate(self.elements):
+        for slno, element in self.get_elements_in_rect(x, y, w, h):
             # Check for overlap
             if element.check_overlap(rect):
                 if ignore_display_elements:
@@ -348,6 +470,8 @@ class DrawingModel:
     def update_element_at_index(self, element, index):
         old_element = self.elements[index]
         self.elements[index] = element
+        self.spatial_index.remove(old_element)
+        self.spatial_index.add(element)
         self.update_elements()
             
         yield "Update draw element at '{}'".format(index)
@@ -360,6 +484,7 @@ class DrawingModel:
         element = self.elements[index]
         data_old = element.fields[code]['value']
         element.set_text_field_value(code, data)
+        self.spatial_index.update(element)
         self.update_elements()
             
         yield "Update draw element at '{}'".format(index)
@@ -375,6 +500,7 @@ class DrawingModel:
         else:
             self.elements.append(element)
             insert_index = len(self.elements) - 1
+        self.spatial_index.add(element)
         self.update_elements()
             
         yield "Add draw element at '{}'".format(insert_index)
@@ -388,6 +514,7 @@ class DrawingModel:
         rows.sort(reverse=True)
         for index in rows:
             old_element = self.elements.pop(index)
+            self.spatial_index.remove(old_element)
             old_rows.append((index, old_element))
         self.update_elements()
         
@@ -430,17 +557,21 @@ class DrawingModel:
         w = int(w)
         h = int(h)
         rect = cairo.RectangleInt(x, y, w, h)  # selection rectangle
-        for elno, element in enumerate(self.elements):
+        overlapping = set()
+        for elno, element in self.get_elements_in_rect(x, y, w, h):
             if (whitelist and (elno in whitelist)) or whitelist is None:
                 # Check for selection
                 if element.check_overlap(rect):
+                    overlapping.add(elno)
                     if element.get_selection() == True:
                         element.set_selection(False)
                         selected = True
                     else:
                         element.set_selection(True)
                         selected = True
-                elif retain_selection is False:
+        if retain_selection is False:
+            for elno, element in enumerate(self.elements):
+                if ((whitelist and (elno in whitelist)) or whitelist is None) and elno not in overlapping:
                     element.set_selection(False)
         return selected
     
@@ -600,33 +731,153 @@ class DrawingModel:
         (r,g,b,a) = misc.hex2rgb(misc.COLOR_GRID)
         context.set_source_rgba(r, g, b, a)
         context.set_line_width(0.2)
+        # Draw horizontal lines
+        for y in range(0, int(page_height), int(grid_width)):
+            context.move_to(0, y)
+            context.line_to(page_width, y)
+        # Draw vertical lines
         for x in range(0, int(page_width), int(grid_width)):
-            for y in range(0, int(page_height), int(grid_width)):
-                # Draw horizontal lines
-                context.move_to(0, y)
-                context.line_to(page_width, y)
-            # Draw vertical ines
             context.move_to(x, 0)
             context.line_to(x, page_height)
         context.stroke()
         context.restore()
         
+    def get_grid_pattern(self, scale):
+        """Get repeating grid pattern for scale or None if grid does not align to pixels"""
+        key = (round(scale, 3), self.grid_width)
+        if key in self.grid_patterns:
+            return self.grid_patterns[key]
+        # Find number of grid cells spanning whole pixels
+        grid_width = self.grid_width
+        pattern = None
+        for cells in range(1, misc.GRID_PATTERN_MAX_CELLS + 1):
+            size = cells*grid_width*scale
+            if abs(size - round(size)) < 1e-6:
+                size = int(round(size))
+                period = cells*grid_width
+                surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+                context = cairo.Context(surface)
+                context.scale(scale, scale)
+                (r,g,b,a) = misc.hex2rgb(misc.COLOR_GRID)
+                context.set_source_rgba(r, g, b, a)
+                context.set_line_width(0.2)
+                # Lines on both edges of period to account for line width
+                for i in range(0, cells + 1):
+                    context.move_to(0, i*grid_width)
+                    context.line_to(period, i*grid_width)
+                    context.move_to(i*grid_width, 0)
+                    context.line_to(i*grid_width, period)
+                context.stroke()
+                pattern = cairo.SurfacePattern(surface)
+                pattern.set_extend(cairo.Extend.REPEAT)
+                pattern.set_matrix(cairo.Matrix(xx=scale, yy=scale))
+                break
+        self.grid_patterns[key] = pattern
+        return pattern
+        
+    def draw_grid(self, context, scale):
+        """Draw grid using cached pattern for scale"""
+        pattern = self.get_grid_pattern(scale)
+        if pattern is None:
+            self.draw_gridlines(context)
+        else:
+            context.save()
+            context.set_source(pattern)
+            context.rectangle(0, 0, self.fields['page_width']['value'], self.fields['page_height']['value'])
+            context.fill()
+            context.restore()
+        
+    def get_draw_color(self, elno, element, whitelist=None):
+        """Get override color for drawing element"""
+        # Draw considering whitelist
+        if whitelist is not None and (elno not in whitelist):
+            return misc.COLOR_INACTIVE
+        # If reference not linked display error
+        elif element.code in misc.REFERENCE_CODES and element.fields['ref']['value'] in ('', '?', 'CR?'):
+            return misc.COLOR_SELECTED_WARNING
+        else:
+            return misc.COLOR_NORMAL
+        
     def draw_model(self, context, select=False, whitelist=None):
         """Draw the schematic model"""
         self.title_block.draw(context, override_color=misc.COLOR_NORMAL)
         self.template.draw(context, override_color=misc.COLOR_NORMAL)
         for elno, element in enumerate(self.elements):
-            # Draw considering whitelist
-            if whitelist is not None and (elno not in whitelist):
-                element.draw(context, select, override_color=misc.COLOR_INACTIVE)
-            else:
-                # If reference not linked display error
-                if element.code in misc.REFERENCE_CODES and element.fields['ref']['value'] in ('', '?', 'CR?'):
-                    element.draw(context, select, override_color=misc.COLOR_SELECTED_WARNING)
-                else:
-                    element.draw(context, select, override_color=misc.COLOR_NORMAL)
+            element.draw(context, select, override_color=self.get_draw_color(elno, element, whitelist))
+            # Element extents are updated on render
+            self.spatial_index.update(element)
         self.draw_selected_ports(context)
         self.models_drawn = True
+        
+    def record_element(self, element, select=False, override_color=None):
+        """Render element into a recording surface"""
+        surface = cairo.RecordingSurface(cairo.Content.COLOR_ALPHA, None)
+        context = cairo.Context(surface)
+        element.draw(context, select, override_color=override_color)
+        (x, y, width, height) = surface.ink_extents()
+        # Pad extents for antialiasing
+        extents = (x-1, y-1, width+2, height+2)
+        return surface, extents
+        
+    def update_render_cache(self, render_cache, select=False, whitelist=None):
+        """Update cached renders of modified elements and return list of modified rectangles"""
+        items = [(self.title_block, misc.COLOR_NORMAL), (self.template, misc.COLOR_NORMAL)]
+        for elno, element in enumerate(self.elements):
+            items.append((element, self.get_draw_color(elno, element, whitelist)))
+        items_cache = dict()
+        rects = []
+        for item, color in items:
+            key = item.get_render_key(select, color)
+            cached = render_cache.items.get(id(item))
+            if cached and cached[0] == key and cached[1] is item:
+                items_cache[id(item)] = cached
+            else:
+                surface, extents = self.record_element(item, select, color)
+                items_cache[id(item)] = (key, item, surface, extents)
+                if cached:
+                    rects.append(cached[3])
+                rects.append(extents)
+                # Element extents are updated on render
+                if item in self.spatial_index:
+                    self.spatial_index.update(item)
+        # Removed elements
+        for item_id, cached in render_cache.items.items():
+            if item_id not in items_cache:
+                rects.append(cached[3])
+        render_cache.items = items_cache
+        # Selected ports
+        key = (tuple(tuple(port) for port in self.selected_ports), self.selected_port_color)
+        if render_cache.ports is None or render_cache.ports[0] != key:
+            extents = None
+            if self.selected_ports:
+                size = misc.SELECT_PORT_RECT + 2*misc.STROKE_WIDTH_SELECTED
+                extents = misc.rect_from_points(*[(port[0] + dx*size/2, port[1] + dy*size/2) 
+                                                  for port in self.selected_ports for dx in (-1,1) for dy in (-1,1)])
+                rects.append(extents)
+            if render_cache.ports and render_cache.ports[1]:
+                rects.append(render_cache.ports[1])
+            render_cache.ports = (key, extents)
+        self.models_drawn = True
+        return rects
+        
+    def draw_model_cached(self, context, render_cache, rects=None):
+        """Draw the schematic model from render cache limited to passed rectangles"""
+        if rects is not None:
+            if not rects:
+                return
+            # Bounding box of modified rectangles
+            x0 = min(rect[0] for rect in rects)
+            y0 = min(rect[1] for rect in rects)
+            x1 = max(rect[0] + rect[2] for rect in rects)
+            y1 = max(rect[1] + rect[3] for rect in rects)
+        for item in [self.title_block, self.template] + self.elements:
+            cached = render_cache.items.get(id(item))
+            if cached:
+                (x, y, width, height) = cached[3]
+                if rects is None or (x <= x1 and y <= y1 and x + width >= x0 and y + height >= y0):
+                    context.set_source_surface(cached[2], 0, 0)
+                    context.paint()
+        self.draw_selected_ports(context)
             
     def draw_selected_ports(self, context):
         for port in self.selected_ports:
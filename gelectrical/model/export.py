@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# export
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, logging, tempfile, shutil, datetime, multiprocessing
+import concurrent.futures
+import cairo
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+# local files import
+from .. import misc
+from ..elementmodel import get_element_models
+from .drawing import DrawingModel
+from .networkmodel import NetworkModel
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Minimum number of pages for exporting drawing in parallel
+EXPORT_PARALLEL_MIN_PAGES = 4
+# Maximum number of worker processes used for export
+EXPORT_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Settings in misc set from program settings, passed on to worker processes
+EXPORT_MISC_SETTINGS = ('SCHEM_FONT_FACE', 'SCHEM_FONT_SIZE', 'SCHEM_FONT_SPACING',
+                        'TITLE_FONT_SIZE', 'TITLE_FONT_SIZE_SMALL',
+                        'GRAPH_FONT_FACE', 'GRAPH_FONT_SIZE',
+                        'REPORT_FONT_FACE', 'REPORT_FONT_SIZE',
+                        'REPORT_GRAPH_FONT_FACE', 'REPORT_GRAPH_FONT_SIZE',
+                        'USER_LIBRARY_DIR', 'GRAPH_CACHE_DIR')
+
+
+def get_misc_settings():
+    return {name: getattr(misc, name) for name in EXPORT_MISC_SETTINGS}
+
+def set_misc_settings(settings):
+    for name, value in settings.items():
+        setattr(misc, name, value)
+
+
+class ExportProject:
+    """Minimal stand in for ProjectModel used by DrawingModel and reports in worker processes"""
+
+    def __init__(self, loadprofiles, fields=None):
+        self.loadprofiles = loadprofiles
+        self.fields = fields
+        self.drawing_models = []
+        self.networkmodel = None
+
+    def get_project_fields(self, page='Information', full=False):
+        if full:
+            return self.fields
+        else:
+            return self.fields[page]
+
+    def get_drawing_model_index(self, model):
+        return self.drawing_models.index(model)
+
+    def update_tabs(self, slno=None):
+        pass
+
+
+def get_pdf_date(date):
+    """Format datetime as PDF date string"""
+    text = date.strftime('D:%Y%m%d%H%M%S')
+    offset = date.strftime('%z')
+    if offset:
+        text += offset[0:3] + "'" + offset[3:5] + "'"
+    return text
+
+def get_drawing_metadata(project_fields):
+    """Document metadata for exported drawing"""
+    date = datetime.datetime.now().astimezone().replace(microsecond=0)
+    return {'title': project_fields['Information']['project_name']['value'],
+            'author': project_fields['Information']['drawing_field_approved']['value'],
+            'subject': 'Electrical Schematic Drawing',
+            'creator': misc.PROGRAM_NAME + ' v' + misc.PROGRAM_VER,
+            'date': date}
+
+def set_surface_metadata(surface, metadata):
+    surface.set_metadata(cairo.PDFMetadata.TITLE, metadata['title'])
+    surface.set_metadata(cairo.PDFMetadata.AUTHOR, metadata['author'])
+    surface.set_metadata(cairo.PDFMetadata.SUBJECT, metadata['subject'])
+    surface.set_metadata(cairo.PDFMetadata.CREATOR, metadata['creator'])
+    surface.set_metadata(cairo.PDFMetadata.CREATE_DATE, metadata['date'].isoformat())
+    surface.set_metadata(cairo.PDFMetadata.MOD_DATE, metadata['date'].isoformat())
+
+def get_program_state(fields):
+    """Program state for models created in worker processes"""
+    return {'element_models': get_element_models(),
+            'stack': None,
+            'project_settings': fields,
+            'project_settings_main': fields['Information']}
+
+def get_snapshot_project(snapshot):
+    """Build project with drawing models and results from project snapshot"""
+    fields = misc.update_fields_dict(misc.default_project_settings, snapshot['fields'])
+    program_state = get_program_state(fields)
+    project = ExportProject(snapshot['loadprofiles'], fields)
+    program_state['project'] = project
+    for page_model in snapshot['pages']:
+        drawing_model = DrawingModel(project, program_state)
+        project.drawing_models.append(drawing_model)
+        drawing_model.set_model(page_model)
+    for (k1, k2), res_fields in snapshot.get('res_fields', dict()).items():
+        project.drawing_models[k1].elements[k2].res_fields = res_fields
+    project.networkmodel = NetworkModel(program_state)
+    return project
+
+def render_drawing_pages(filename, page_models, project_fields, loadprofiles, metadata=None):
+    """Render serialised drawing pages to a PDF file
+
+        Runs in a worker process.
+
+        Arguments:
+            filename: Output PDF filename
+            page_models: List of DrawingModel storage models
+            project_fields: Truncated project fields
+            loadprofiles: Project load profiles
+            metadata: Document metadata set on PDF if passed
+    """
+    fields = misc.update_fields_dict(misc.default_project_settings, project_fields)
+    program_state = get_program_state(fields)
+    parent = ExportProject(loadprofiles)
+    surface = cairo.PDFSurface(filename, 0, 0)
+    if metadata:
+        set_surface_metadata(surface, metadata)
+    context = cairo.Context(surface)
+    for page_model in page_models:
+        drawing_model = DrawingModel(parent, program_state)
+        parent.drawing_models.append(drawing_model)
+        drawing_model.set_model(page_model)
+        surface.set_size(drawing_model.fields['page_width']['value'], drawing_model.fields['page_height']['value'])
+        drawing_model.export_drawing(context)
+        surface.show_page()
+    surface.finish()
+    return len(page_models)
+
+def merge_pdf(filenames, filename, metadata):
+    """Merge PDF files in order and set document metadata"""
+    writer = pypdf.PdfWriter()
+    for part_filename in filenames:
+        writer.append(part_filename)
+    writer.add_metadata({'/Title': metadata['title'],
+                         '/Author': metadata['author'],
+                         '/Subject': metadata['subject'],
+                         '/Creator': metadata['creator'],
+                         '/CreationDate': get_pdf_date(metadata['date']),
+                         '/ModDate': get_pdf_date(metadata['date'])})
+    with open(filename, 'wb') as fp:
+        writer.write(fp)
+
+def export_drawing_parallel(filename, page_models, project_fields, loadprofiles, progress_callback=None, batch_size=1):
+    """Export drawing pages in worker processes and merge them into a single PDF
+
+        Arguments:
+            filename: Output PDF filename
+            page_models: List of DrawingModel storage models in page order
+            project_fields: Truncated project fields
+            loadprofiles: Project load profiles
+            progress_callback: Called as progress_callback(pages_done, pages_total) per finished batch
+            batch_size: Number of pages rendered per worker task
+    """
+    metadata = get_drawing_metadata(project_fields)
+    batches = [page_models[i:i+batch_size] for i in range(0, len(page_models), batch_size)]
+    temp_dir = tempfile.mkdtemp(prefix='gelectrical_export_')
+    try:
+        filenames = [misc.posix_path(temp_dir, 'page_{}.pdf'.format(slno)) for slno in range(len(batches))]
+        # Use spawned workers since forking a process running Gtk is unsafe
+        mp_context = multiprocessing.get_context('spawn')
+        # Workers import misc afresh, so fonts and paths set from program settings are passed on
+        with concurrent.futures.ProcessPoolExecutor(max_workers=EXPORT_MAX_WORKERS, mp_context=mp_context,
+                                                    initializer=set_misc_settings,
+                                                    initargs=(get_misc_settings(),)) as executor:
+            futures = [executor.submit(render_drawing_pages, part_filename, batch, project_fields, loadprofiles)
+                       for part_filename, batch in zip(filenames, batches)]
+            pages_done = 0
+            for future in concurrent.futures.as_completed(futures):
+                pages_done += future.result()
+                if progress_callback:
+                    progress_callback(pages_done, len(page_models))
+        merge_pdf(filenames, filename, metadata)
+        log.info('export_drawing_parallel - {} pages exported to {}'.format(len(page_models), filename))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# exportjobs
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import time, pickle, queue, logging, threading, traceback, multiprocessing
+
+# local files import
+from . import export
+from .export import get_misc_settings, set_misc_settings
+from .networkmodel import write_element_graph_html
+from .report import export_pdf_report
+from . import resultsexport
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Maximum number of export jobs run at a time
+EXPORT_JOB_MAX_WORKERS = 4
+# Interval in seconds for polling job messages and cancellation
+EXPORT_JOB_POLL_INTERVAL = 0.1
+
+
+class ExportCancelled(Exception):
+    """Raised when export jobs are cancelled"""
+    pass
+
+
+def run_job(name, func, data, misc_settings, messages):
+    """Run export job and report progress through messages queue
+
+        Runs in a worker process.
+    """
+    set_misc_settings(misc_settings)
+    start = time.perf_counter()
+    try:
+        args = pickle.loads(data)
+        func(*args, progress_callback=lambda fraction: messages.put(('progress', name, fraction)))
+    except Exception:
+        messages.put(('error', name, traceback.format_exc()))
+    else:
+        messages.put(('done', name, time.perf_counter() - start))
+
+# Export jobs, run in worker processes
+
+def export_html_report(filename, power_model_json, progress_callback=None):
+    """Export pandapower html report of power model"""
+    import pandapower as pp
+    import pandapower.plotting as pplot
+    power_model = pp.from_json_string(power_model_json)
+    pplot.to_html(power_model, filename)
+
+def export_json(filename, power_model_json, progress_callback=None):
+    """Export power model as pandapower json"""
+    with open(filename, 'w') as fp:
+        fp.write(power_model_json)
+
+def export_element_graph(filename, element_graph, progress_callback=None):
+    nodes, edges = element_graph
+    write_element_graph_html(filename, nodes, edges)
+
+def export_report(foldername, settings, snapshot, progress_callback=None):
+    """Export HTML and PDF reports from project snapshot"""
+    export_pdf_report(export.get_snapshot_project(snapshot), foldername, settings)
+
+def export_results(filename, snapshot, progress_callback=None):
+    """Export fields and results of project snapshot as table"""
+    resultsexport.export_results(export.get_snapshot_project(snapshot), filename, progress_callback)
+
+def export_drawing(filename, snapshot, progress_callback=None):
+    """Export drawing from project snapshot"""
+    page_models = snapshot['pages']
+    if export.pypdf and len(page_models) >= export.EXPORT_PARALLEL_MIN_PAGES:
+        def callback(pages_done, pages_total):
+            if progress_callback:
+                progress_callback(pages_done/pages_total)
+        export.export_drawing_parallel(filename, page_models, snapshot['fields'], snapshot['loadprofiles'], callback)
+    else:
+        metadata = export.get_drawing_metadata(snapshot['fields'])
+        export.render_drawing_pages(filename, page_models, snapshot['fields'], snapshot['loadprofiles'], metadata)
+
+
+class ExportPipeline:
+    """Run export jobs in worker processes
+
+        Arguments of jobs are serialised when added, so jobs work on a snapshot
+        of the project independent of later changes in the application. Start,
+        progress, completion and errors of jobs are passed back through a queue.
+        Jobs are cancelled by terminating their processes.
+    """
+
+    def __init__(self, max_workers=EXPORT_JOB_MAX_WORKERS):
+        self.max_workers = max_workers
+        # Use spawned workers since forking a process running Gtk is unsafe
+        self.mp_context = multiprocessing.get_context('spawn')
+        self.messages = self.mp_context.Queue()
+        self.jobs = []  # [(name, caption, weight, func, data), ...]
+        self.cancel_event = threading.Event()
+
+    def add(self, name, caption, func, *args, weight=1):
+        """Add job run as func(*args, progress_callback)"""
+        self.jobs.append((name, caption, weight, func, pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def cancel(self):
+        """Cancel running jobs, may be called from any thread"""
+        self.cancel_event.set()
+
+    def run(self, progress_callback=None, message_callback=None):
+        """Run jobs and wait till all of them finish
+
+            Arguments:
+                progress_callback: Called as progress_callback(fraction) with weighted progress of all jobs
+                message_callback: Called as message_callback(message) when a job finishes
+            Returns:
+                Dict of job name -> time taken in seconds
+            Raises:
+                ExportCancelled if cancelled, RuntimeError if any job failed
+        """
+        pending = list(self.jobs)
+        captions = {name: caption for name, caption, weight, func, data in self.jobs}
+        weights = {name: weight for name, caption, weight, func, data in self.jobs}
+        total_weight = sum(weights.values()) or 1
+        fractions = {name: 0 for name in weights}
+        running = dict()
+        times = dict()
+        errors = []
+        misc_settings = get_misc_settings()
+        try:
+            while pending or running:
+                if self.cancel_event.is_set():
+                    raise ExportCancelled('Export cancelled by user')
+                # Start jobs
+                while pending and len(running) < self.max_workers:
+                    name, caption, weight, func, data = pending.pop(0)
+                    # Not daemonic since jobs may render in worker processes of their own,
+                    # running processes are terminated on exit below
+                    process = self.mp_context.Process(target=run_job, args=(name, func, data, misc_settings, self.messages),
+                                                      name='export-' + name, daemon=False)
+                    process.start()
+                    running[name] = process
+                    log.info('ExportPipeline - job started - ' + name)
+                # Process messages
+                try:
+                    kind, name, value = self.messages.get(timeout=EXPORT_JOB_POLL_INTERVAL)
+                except queue.Empty:
+                    for name, process in list(running.items()):
+                        if process.exitcode is not None:
+                            running.pop(name)
+                            errors.append((name, 'Process exited with code {}'.format(process.exitcode)))
+                            log.error('ExportPipeline - job terminated - ' + name)
+                    continue
+                if kind == 'progress':
+                    fractions[name] = min(max(value, 0), 1)
+                elif kind == 'done':
+                    running.pop(name).join()
+                    fractions[name] = 1
+                    times[name] = value
+                    log.info('ExportPipeline - job finished - {} in {:.2f}s'.format(name, value))
+                    if message_callback:
+                        message_callback('{} ({:.1f} s)'.format(captions[name], value))
+                elif kind == 'error':
+                    running.pop(name).join()
+                    fractions[name] = 1
+                    errors.append((name, value))
+                    log.error('ExportPipeline - job failed - ' + name + '\n' + value)
+                if progress_callback:
+                    progress_callback(sum(fractions[key]*weights[key] for key in fractions) / total_weight)
+        finally:
+            for name, process in running.items():
+                process.terminate()
+                process.join()
+                log.warning('ExportPipeline - job terminated - ' + name)
+        if errors:
+            raise RuntimeError('Export failed for ' + ', '.join(captions[name] for name, error in errors))
+        return times
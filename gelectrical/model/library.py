@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# library
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, csv, json, pickle, hashlib, logging, copy, ast
+import numpy as np
+
+# local files import
+from .. import misc
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Version of cache file format
+LIBRARY_CACHE_VER = 2
+# Field codes holding protection data structures
+LIBRARY_DATA_CODES = ('pcurve_l', 'pcurve_g', 'dcurve')
+
+
+def get_mtime(path):
+    """Return modification signature of file or None if not existing"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def read_library(path):
+    """Read library csv file into dict of category -> item_name -> row"""
+    data = dict()
+    with open(path) as csv_file:
+        csv_reader = csv.DictReader(csv_file, delimiter=';')
+        for row in csv_reader:
+            item_name = row['item_name']
+            item_category = row['item_category']
+            if item_category in data:
+                category_dict = data[item_category]
+            else:
+                category_dict = dict()
+                data[item_category] = category_dict
+            row.pop('item_category')
+            row.pop('item_name')
+            category_dict[item_name] = row
+    return data
+
+def read_data_struct(dirname, subdir, data_filename, params_filename):
+    """Read protection data structure referenced from library"""
+    valuepath_params = misc.posix_path(dirname, subdir, params_filename)
+    with open(valuepath_params, 'r') as fp:
+        data_struct = json.load(fp)
+    if data_filename:
+        valuepath = misc.posix_path(dirname, subdir, data_filename)
+        data = np.loadtxt(valuepath, delimiter=',')
+        curve_u = []
+        curve_l = []
+        for row in data:
+            curve_u.append(('point', str(row[0])+'*f.In', str(row[1])))
+            curve_l.append(('point', str(row[2])+'*f.In', str(row[3])))
+        data_struct['data']['curve_u'] = curve_u
+        data_struct['data']['curve_l'] = curve_l
+    return data_struct
+
+def parse_data_reference(value):
+    """Parse library data reference of form (subdir, data_filename, params_filename)"""
+    if isinstance(value, str) and value.startswith('(') and value.endswith(')'):
+        try:
+            reference = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+        if isinstance(reference, tuple) and len(reference) == 3 and all(isinstance(x, str) for x in reference):
+            return reference
+    return None
+
+
+class LibraryCache:
+    """Pre-parsed element libraries and protection device data
+
+        Library csv files and the protection data structures referenced by them are
+        parsed once and stored in a single binary cache file. The cache file is
+        invalidated when any file in the library directories is modified.
+    """
+
+    def __init__(self):
+        self.cache_filename = None
+        self.signature = None
+        self.libraries = dict()  # path -> (mtime, {category: {item_name: row}})
+        self.data = dict()  # (dirname, subdir, data_filename, params_filename) -> (mtimes, data_struct)
+        self.files = dict()  # path -> (mtime, parsed json) of json files in library directories
+
+    def get_library_dirs(self):
+        dirs = [misc.abs_path('database')]
+        if misc.USER_LIBRARY_DIR:
+            dirs.append(misc.USER_LIBRARY_DIR)
+        return [dirname for dirname in dirs if os.path.isdir(dirname)]
+
+    def get_signature(self):
+        """Hash of paths and modification times of all library files"""
+        entries = []
+        for dirname in self.get_library_dirs():
+            for root, dirs, files in os.walk(dirname):
+                dirs.sort()
+                for filename in sorted(files):
+                    path = os.path.join(root, filename)
+                    entries.append((path, get_mtime(path)))
+        return hashlib.sha1(repr(entries).encode()).hexdigest()
+
+    def load(self, cache_filename):
+        """Load cache from file, rebuilding it if library files are modified"""
+        self.cache_filename = cache_filename
+        signature = self.get_signature()
+        try:
+            if os.path.exists(cache_filename):
+                with open(cache_filename, 'rb') as fp:
+                    cache = pickle.load(fp)
+                if cache['version'] == LIBRARY_CACHE_VER and cache['signature'] == signature:
+                    self.signature = signature
+                    self.libraries = cache['libraries']
+                    self.data = cache['data']
+                    log.info('LibraryCache - Cache loaded from ' + str(cache_filename))
+                    return
+        except:
+            log.exception('LibraryCache - Error loading cache, rebuilding')
+        self.build(signature)
+        self.save()
+
+    def save(self):
+        if self.cache_filename:
+            try:
+                cache = {'version': LIBRARY_CACHE_VER,
+                         'signature': self.signature,
+                         'libraries': self.libraries,
+                         'data': self.data}
+                with open(self.cache_filename, 'wb') as fp:
+                    pickle.dump(cache, fp, protocol=pickle.HIGHEST_PROTOCOL)
+                log.info('LibraryCache - Cache saved to ' + str(self.cache_filename))
+            except:
+                log.exception('LibraryCache - Error saving cache')
+
+    def build(self, signature=None):
+        """Scan library directories and parse all libraries"""
+        self.libraries = dict()
+        self.data = dict()
+        for dirname in self.get_library_dirs():
+            for filename in sorted(os.listdir(dirname)):
+                path = misc.posix_path(dirname, filename)
+                if filename.lower().endswith('.csv') and os.path.isfile(path):
+                    try:
+                        self.add_library(path)
+                    except:
+                        log.warning('LibraryCache - Error reading library ' + str(path))
+        self.signature = signature if signature else self.get_signature()
+        log.info('LibraryCache - Cache built with {} libraries'.format(len(self.libraries)))
+
+    def add_library(self, path):
+        data = read_library(path)
+        self.libraries[path] = (get_mtime(path), data)
+        dirname = misc.dir_from_path(path)
+        for category, items in data.items():
+            for item_name, row in items.items():
+                # Pre-parse protection data
+                for code in LIBRARY_DATA_CODES:
+                    reference = parse_data_reference(row.get(code))
+                    if reference:
+                        data_struct = self.read_data(dirname, reference)
+                        if not misc.validate_protection_data_struct(data_struct, code):
+                            log.warning('LibraryCache - Invalid data in library ' + str(path) +
+                                        ' for item ' + item_name)
+        return data
+
+    def read_data(self, dirname, reference):
+        subdir, data_filename, params_filename = reference
+        key = (dirname, subdir, data_filename, params_filename)
+        paths = [misc.posix_path(dirname, subdir, params_filename)]
+        if data_filename:
+            paths.append(misc.posix_path(dirname, subdir, data_filename))
+        mtimes = [get_mtime(path) for path in paths]
+        if key in self.data and self.data[key][0] == mtimes:
+            return self.data[key][1]
+        data_struct = read_data_struct(dirname, subdir, data_filename, params_filename)
+        self.data[key] = (mtimes, data_struct)
+        return data_struct
+
+    # Lookup functions
+
+    def is_library_path(self, path):
+        """Return True if path is inside one of the library directories"""
+        path = os.path.realpath(path)
+        for dirname in self.get_library_dirs():
+            dirname = os.path.realpath(dirname)
+            try:
+                if os.path.commonpath([path, dirname]) == dirname:
+                    return True
+            except ValueError:  # Paths on different drives
+                pass
+        return False
+
+    def get_library(self, path):
+        """Return copy of library items as {category: {item_name: row}}"""
+        if path not in self.libraries or self.libraries[path][0] != get_mtime(path):
+            self.add_library(path)
+        return copy.deepcopy(self.libraries[path][1])
+
+    def get_data_struct(self, library_path, value):
+        """Return copy of protection data structure referenced by library value"""
+        reference = parse_data_reference(value)
+        if reference is None:
+            reference = tuple(eval(value))
+        dirname = misc.dir_from_path(library_path)
+        return copy.deepcopy(self.read_data(dirname, reference))
+
+    def get_json(self, path):
+        """Return copy of parsed json file
+
+            Only files in the library directories are cached, other files are
+            read on each call.
+        """
+        if not self.is_library_path(path):
+            with open(path, 'r') as fp:
+                return json.load(fp)
+        mtime = get_mtime(path)
+        if path not in self.files or self.files[path][0] != mtime:
+            with open(path, 'r') as fp:
+                self.files[path] = (mtime, json.load(fp))
+        return copy.deepcopy(self.files[path][1])
+
+
+# Library cache shared by all views
+library_cache = LibraryCache()
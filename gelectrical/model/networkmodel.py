@@ -48,6 +48,29 @@ class Tag(object):
         return Raw('<%s%s>%s</%s>' % (self.name, attr.rstrip(), contents, self.name))
 
 
+def write_element_graph_html(filename, nodes, edges):
+    """Write element graph as html page using vis.js"""
+    HTML, HEAD, STYLE, BODY, DIV = Tag('html'), Tag('head'), Tag('style'), Tag('body'), Tag('div')
+    TABLE, TR, TH, TD, SCRIPT = Tag('table'), Tag('tr'), Tag('th'), Tag('td'), Tag('script')
+    H2 = Tag('h2')
+    # Style and headers
+    style = 'tr:first {background:#e1e1e1;} th,td {text-align:center; border:1px solid #e1e1e1;}'
+    nodes_json = json.dumps(nodes)
+    edges_json = json.dumps(edges)
+    script = "var data = {nodes: new vis.DataSet(%s), edges: new vis.DataSet(%s)};" % (nodes_json, edges_json)
+    script += "var container = document.getElementById('net');"
+    script += "var network = new vis.Network(container, data);"
+    script += "network.setOptions({interaction: {zoomView: true}});"
+    page = HTML(
+        HEAD(STYLE(style)),
+        BODY(DIV(id='net', style="border:1px solid #f1f1f1;max-width:90%")),
+        SCRIPT(src="https://cdnjs.cloudflare.com/ajax/libs/vis/4.18.1/vis.min.js"),
+        SCRIPT(Raw(script))
+        )
+    with open(filename, 'w') as fp:
+        fp.write(page.html)
+
+
 class NetworkModel:
     """Class for modelling a Network"""
 
@@ -548,28 +571,15 @@ class NetworkModel:
         nx.draw_networkx_edge_labels(self.graph, pos, edge_labels=edge_labels, ax=ax)
         figure.savefig(filename)
 
-    def export_element_graph_html(self, filename):
-        HTML, HEAD, STYLE, BODY, DIV = Tag('html'), Tag('head'), Tag('style'), Tag('body'), Tag('div')
-        TABLE, TR, TH, TD, SCRIPT = Tag('table'), Tag('tr'), Tag('th'), Tag('td'), Tag('script')
-        H2 = Tag('h2')
-        # Style and headers
-        style = 'tr:first {background:#e1e1e1;} th,td {text-align:center; border:1px solid #e1e1e1;}'
+    def get_element_graph_data(self):
+        """Return nodes and edges of element graph for export"""
         nodes = [{'id': int(x), 'label': str(x)} for x in self.graph.nodes]
         edges = [{'from':  int(x), 'to':  int(y), 'label': d['ref']} for (x,y,d) in self.graph.edges(data=True)]
-        nodes_json = json.dumps(nodes)
-        edges_json = json.dumps(edges)
-        script = "var data = {nodes: new vis.DataSet(%s), edges: new vis.DataSet(%s)};" % (nodes_json, edges_json)
-        script += "var container = document.getElementById('net');"
-        script += "var network = new vis.Network(container, data);"
-        script += "network.setOptions({interaction: {zoomView: true}});"
-        page = HTML(
-            HEAD(STYLE(style)),
-            BODY(DIV(id='net', style="border:1px solid #f1f1f1;max-width:90%")),
-            SCRIPT(src="https://cdnjs.cloudflare.com/ajax/libs/vis/4.18.1/vis.min.js"),
-            SCRIPT(Raw(script))
-            )
-        with open(filename, 'w') as fp:
-            fp.write(page.html)
+        return nodes, edges
+
+    def export_element_graph_html(self, filename):
+        nodes, edges = self.get_element_graph_data()
+        write_element_graph_html(filename, nodes, edges)
 
     # Private functions
 
@@ -587,7 +597,10 @@ class NetworkModel:
 
         G = nx.Graph()
         for part in duplicate_ports_list:
-            # each sublist is a bunch of nodes
+            # each sublist is a bunch of nodes, sorted so that node numbering
+            # does not depend on hash order of reference ports, which differs
+            # between processes
+            part = sorted(part, key=repr)
             G.add_nodes_from(part)
             # it also imlies a number of edges:
             G.add_edges_from(to_edges(part))
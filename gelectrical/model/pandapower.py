@@ -1775,3 +1775,7 @@ class PandaPowerModel:
 
     def export_json(self, filename):
         pp.to_json(self.power_model, filename)
+
+    def get_json(self):
+        """Return power model serialised as json"""
+        return pp.to_json(self.power_model)
@@ -22,18 +22,17 @@
 #  
 # 
 
-import logging, copy, datetime, io, math
+import logging, copy, datetime
 from gi.repository import Gtk, Gdk, GLib
 import cairo
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
 
 # local files import
 from .. import misc
 from ..misc import undoable, group
 from .drawing import DrawingModel
+from . import export, projectfile, report, resultsexport, analysisworker
 from ..view.drawing import DrawingView
-from ..view.graph import GraphViewDialog, GraphImage
+from ..view.graph import GraphViewDialog
 from ..view.protection import ProtectionViewDialog
 from .networkmodel import NetworkModel
 from .pandapower import PandaPowerModel
@@ -80,6 +79,9 @@ class ProjectModel:
         self.clear_status()
         self.networkmodel = None
         self.powermodel = None
+        self.prefetch_id = None  # Idle source loading pages in background
+        self.results = None  # Results of last analysis as projectfile.AnalysisResults
+        self.results_key = None  # State of project for which results are valid
         # Initialise tab
         self.add_page_vanilla()
         self.tab_handler_id = self.drawing_notebook.connect("switch-page", self.on_switch_tab)
@@ -251,6 +253,10 @@ class ProjectModel:
             self.reg_refs_sheets()
             
     def clear_all(self):
+        # Stop loading pages in background
+        if self.prefetch_id is not None:
+            GLib.source_remove(self.prefetch_id)
+            self.prefetch_id = None
         # Delete all pages except first
         self.drawing_notebook.disconnect(self.tab_handler_id)
         for slno in range(0,self.get_page_nos()):
@@ -269,9 +275,31 @@ class ProjectModel:
         
     def get_page_nos(self):
         return len(self.drawing_models)
+    
+    def load_page(self, slno):
+        """Create elements of page if not already loaded"""
+        drawing_model = self.drawing_models[slno]
+        if not drawing_model.is_loaded():
+            drawing_model.load_pending_model()
+            
+    def load_pages(self):
+        """Create elements of all pages not already loaded"""
+        for slno in range(self.get_page_nos()):
+            self.load_page(slno)
+            
+    def prefetch_pages(self):
+        """Load one pending page per call, for use as idle callback"""
+        for slno, drawing_model in enumerate(self.drawing_models):
+            if not drawing_model.is_loaded():
+                self.load_page(slno)
+                return True
+        self.prefetch_id = None
+        log.info('ProjectModel - prefetch_pages - all pages loaded')
+        return False
         
     def set_page(self, slno, switch_tab=True):
         if slno < self.get_page_nos():
+            self.load_page(slno)
             self.drawing_model = self.drawing_models[slno]
             self.drawing_view = self.drawing_views[slno]
             if switch_tab:
@@ -373,6 +401,7 @@ class ProjectModel:
     ## Analysis functions
     
     def setup_base_model(self, build_ana_model=True, add_node_elements=True):
+        self.load_pages()
         self.clear_status()
         self.networkmodel = NetworkModel(self.program_state)
         # Setup base elements
@@ -388,8 +417,13 @@ class ProjectModel:
             if add_node_elements:
                 node_elements = self.networkmodel.setup_node_elements()
                 self.clear_results(clear_elements=False)
+                # Results stored with project for unmodified model
+                results = self.get_valid_results()
+                node_results = results.get_node_results() if results else dict()
                 with group(self, "Add node elements"):
                     for (k1, gnode), node_element in node_elements.items():
+                        if gnode in node_results:
+                            node_element.res_fields = copy.deepcopy(node_results[gnode])
                         drawing_model = self.drawing_models[k1]
                         drawing_model.insert_element_at_index(node_element)
                     self.status['node_elements'] = True
@@ -414,12 +448,25 @@ class ProjectModel:
         else:
             raise RuntimeError('ProjectModel - build_power_model - Network model not built')
         
+    def set_worker_results(self, result):
+        """Set results of analysis run in analysis worker as power model
+        
+            Results are applied to elements and diagnostics view by update_results
+            and run_diagnostics.
+        """
+        if self.status['net_model']:
+            self.powermodel = analysisworker.WorkerPowerModel(self.networkmodel, result)
+            self.status['power_model'] = True
+            log.info('ProjectModel - set_worker_results - results set')
+        else:
+            raise RuntimeError('ProjectModel - set_worker_results - Network model not built')
+        
     def run_diagnostics(self):
         """Run Diagnostics"""
         if self.status['power_model']:
             log.info('ProjectModel - run_diagnostics - running diagnostic...')
             diagnostic_results, ret_code = self.powermodel.run_diagnostics()
-            self.diagnostics_view.update(diagnostic_results, self.select_networkmodel)
+            misc.run_in_main(self.diagnostics_view.update, diagnostic_results, self.select_networkmodel)
             self.status['power_analysis'] = True
             log.info('ProjectModel - run_diagnostics - diagnostic run')
             return ret_code
@@ -501,17 +548,47 @@ class ProjectModel:
                 for (k1, gnode), node_element in self.networkmodel.node_elements.items():
                     if gnode in self.powermodel.node_results:
                         node_element.res_fields = copy.deepcopy(self.powermodel.node_results[gnode])
+            self.capture_results()
             self.status['power_results'] = True
             log.info('ProjectModel - update_results - results updated')
-            self.drawing_view.refresh()
+            misc.run_in_main(self.drawing_view.refresh)
         else:
             log.info('ProjectModel - update_results - no results to update')
 
     def clear_results(self, clear_elements=True):
         """ Clear analysis results"""
+        if clear_elements:
+            self.results = None
+            self.results_key = None
         with group(self, "Clear analysis results"):
             for drawing_model in self.drawing_models:
                 drawing_model.clear_results(clear_elements)
+                
+    def get_results_key(self):
+        """Get signature of project state on which analysis results depend"""
+        return (self.get_state_keys(), misc.RefKey(self.fields))
+        
+    def capture_results(self):
+        """Take snapshot of analysis results for storing in project file"""
+        element_results = dict()
+        for k1, drawing_model in enumerate(self.drawing_models):
+            page_results = dict()
+            index = 0
+            for element in drawing_model.elements:
+                if element.code not in misc.DISPLAY_ELEMENT_CODES:
+                    if element.res_fields:
+                        page_results[index] = copy.deepcopy(element.res_fields)
+                    index += 1
+            if page_results:
+                element_results[k1] = page_results
+        node_results = copy.deepcopy(self.powermodel.node_results)
+        self.results = projectfile.AnalysisResults(element_results, node_results)
+        self.results_key = self.get_results_key()
+        
+    def get_valid_results(self):
+        """Return analysis results if project is unmodified since analysis"""
+        if self.results is not None and self.results_key == self.get_results_key():
+            return self.results
         
     ## Model functions
     
@@ -753,6 +830,30 @@ class ProjectModel:
     
     ## Export/Import functions
     
+    def get_analysis_snapshot(self):
+        """Get serialisable snapshot of project for analysis in worker process
+        
+            Elements of pages are in the order used by setup_base_model, so element
+            codes of results match base elements of the network model.
+        """
+        self.load_pages()
+        return {'fields': misc.get_fields_dict_trunc(self.fields),
+                'loadprofiles': self.loadprofiles,
+                'pages': [drawing_model.get_model(display_elements=True) for drawing_model in self.drawing_models]}
+    
+    def get_export_snapshot(self):
+        """Get serialisable snapshot of project and analysis results for exporting in worker processes"""
+        res_fields = dict()
+        for k1, drawing_model in enumerate(self.drawing_models):
+            for k2, element in enumerate(drawing_model.elements):
+                if element.res_fields:
+                    res_fields[(k1, k2)] = element.res_fields
+        snapshot = self.get_analysis_snapshot()
+        snapshot.update({'res_fields': res_fields,
+                         'power_model': self.powermodel.get_json(),
+                         'element_graph': self.networkmodel.get_element_graph_data()})
+        return snapshot
+    
     def export_html_report(self, filename, call_at_exit=None):
         self.powermodel.export_html_report(filename)
         if call_at_exit:
@@ -769,272 +870,44 @@ class ProjectModel:
             call_at_exit()
         
     def export_pdf_report(self, foldername, settings, call_at_exit=None):
-        template_path = misc.abs_path("templates")
-        env = Environment(loader=FileSystemLoader(template_path))
-        
-        # General variables
-        project_settings = self.get_project_fields()
-        report_settings = self.get_project_fields(page='Reports')
-        export_graphs_flag = report_settings['export_graphs']['value']
-        export_elements_flag = report_settings['export_elements']['value']
-        export_boq_flag = report_settings['export_boq']['value']
-        export_loadprofiles_flag = report_settings['export_loadprofiles']['value']
-        export_ana_flag = report_settings['export_analysis']['value']
-        gen_variables = {'program_version'        : 'v' + misc.PROGRAM_VER,
-                         'project_name'           : project_settings['project_name']['value'],
-                         'drawing_field_approved' : project_settings['drawing_field_approved']['value'],
-                         'drawing_field_dept'     : project_settings['drawing_field_dept']['value'],
-                         'drawing_field_address'  : project_settings['drawing_field_address']['value'].replace('\n','</br>'),
-                         'doc_title': project_settings['project_name']['value'],
-                         'doc_author': project_settings['drawing_field_approved']['value'],
-                         'doc_subject': "Project Report",
-                         'doc_lang': project_settings['drawing_field_lang']['value'],
-                         'doc_creator':misc.PROGRAM_NAME + ' v' + misc.PROGRAM_VER,
-                         'doc_create_date': datetime.datetime.now().astimezone().replace(microsecond=0).isoformat(),
-                         'doc_mod_date': datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()}
-        
-        # Elements
-        element_captions = dict()
-        element_refs = dict()
-        element_tables = dict()
-        element_lines = []
-        element_loads = []
-        element_switches = []
-        element_nodes = dict()
-        loadprofile_captions_used = set()
-        self.networkmodel.setup_base_elements()
-        base_elements = self.networkmodel.base_elements
-        # First pass add all required elements
-        for key, model in base_elements.items():
-            if 'ref' in model.fields and model.code not in misc.NON_ELEMENT_CODES:
-                element_captions[key] = model.fields['ref']['value'] + ' - ' + model.name
-                element_refs[key] = model.fields['ref']['value']
-                if export_elements_flag:
-                    element_tables[key] = misc.fields_to_table(model.fields, insert_graph=export_graphs_flag)
-            # Lines
-            if model.code in misc.LINE_ELEMENT_CODES:
-                element_lines.append(model)
-            # Loads
-            if model.code in misc.LOAD_ELEMENT_CODES:
-                element_loads.append(model)
-            # Switches
-            if model.code in misc.SWITCH_ELEMENT_CODES:
-                element_switches.append(model)
-            # Nodes
-            if model.code in misc.DISPLAY_ELEMENT_CODES:
-                element_nodes[int(model.fields['ref']['value'])] = model
-            # Loads
-            if model.code in misc.LOADPROFILE_CODES and model.fields['load_profile']['value'] in self.loadprofiles:
-                loadprofile_captions_used.add(model.fields['load_profile']['value'])
-
-        # Second pass for adding assmebly details
-        for key, model in base_elements.items():
-            if model.code == 'element_assembly':
-                assembly_fields = copy.deepcopy(model.fields)
-                children_codes = model.children_codes
-                children_list = []
-                for child_code in children_codes:
-                    if child_code in element_refs:
-                        child_ref = element_refs[child_code]
-                        children_list.append(child_ref)
-                children_str = ''
-                for s in children_list:
-                    children_str = children_str + ', ' + s
-                children_str = children_str[2:]
-                assembly_fields['children'] = misc.get_field_dict('str', 'Sub-elements', '', children_str, status_inactivate=False)
-                # Add element
-                element_captions[key] = model.fields['ref']['value'] + ' - ' + model.name
-                element_refs[key] = model.fields['ref']['value']
-                if export_elements_flag:
-                    element_tables[key] = misc.fields_to_table(assembly_fields, insert_graph=export_graphs_flag)
-        # Sort by reference
-        element_captions = dict(sorted(element_captions.items(), key=lambda item:item[1]))
-        if export_elements_flag:
-            element_tables = {key:element_tables[key] for key in element_captions}
-                                 
-        # BOQ
-        boq_tables = dict()
-        boq_captions = dict()
-        E = misc.ELEMENT_FIELD
-        R = misc.ELEMENT_RESULT
-        P = misc.ELEMENT_PLACEHOLDER
-        if export_boq_flag:
-            # Lines
-            if element_lines:
-                col_codes = ['ref', 'name', 'designation', 'type', 'parallel', 'length_km', 'max_i_ka', 'df', 'in_service', 'loading_percent_max', 'pl_mw_max', 'pl_perc_max']
-                col_captions = ['Reference', 'Name', 'Designation', 'Type', '# Parallel Lines',  'Length', 'Imax', 'Derating Factor', 'In Service ?', '% Loading', 'P loss', '% P loss']
-                code_sources = [E,E,E,E,E,E,E,E,E,R,R,R]
-                table = misc.elements_to_table(element_lines, col_codes, col_captions, code_sources, 'boq_lines',
-                                            show_element_class=True, sum_cols=[10])
-                boq_tables['boq_lines'] = table
-                boq_captions['boq_lines'] = 'Lines'
-            # Loads
-            if element_loads:
-
-                def modifyfunc_load(table):
-                    table['Rated power'][0] = 'kVA'
-                    table['Sa'][0] = 'kVA'
-                    table['Sb'][0] = 'kVA'
-                    table['Sc'][0] = 'kVA'
-                    for slno, element in enumerate(element_loads):
-                        scaling = element.fields['scaling']['value']
-                        if element.code in ('element_load','element_async_motor_3ph'):
-                            s_kva = round(element.fields['sn_kva']['value']*scaling, 4)
-                            pf = str(round(element.fields['cos_phi']['value'], 2)) + (' lag' if element.fields['mode']['value'] else ' lead')
-                        else:
-                            fields = element.get_power_model('')[0][2]
-                            p_a_kw = round(fields['p_a_mw']*1000*scaling, 4)
-                            p_b_kw = round(fields['p_b_mw']*1000*scaling, 4)
-                            p_c_kw = round(fields['p_c_mw']*1000*scaling, 4)
-                            q_a_kvar = round(fields['q_a_mvar']*1000*scaling, 4)
-                            q_b_kvar = round(fields['q_b_mvar']*1000*scaling, 4)
-                            q_c_kvar = round(fields['q_c_mvar']*1000*scaling, 4)
-                            p_kw = p_a_kw + p_b_kw + p_c_kw
-                            q_kvar = q_a_kvar + q_b_kvar + q_c_kvar
-                            table['Sa'][slno+1] = str(p_a_kw) + '+j' + str(q_a_kvar)
-                            table['Sb'][slno+1] = str(p_b_kw) + '+j' + str(q_b_kvar)
-                            table['Sc'][slno+1] = str(p_c_kw) + '+j' + str(q_c_kvar)
-                            s_kva = round(math.sqrt(p_kw**2 + q_kvar**2), 4)
-                            pf = str(round((p_kw/s_kva),2)) + (' lag' if q_kvar > 0 else ' lead')
-                        table['Rated power'][slno+1] = str(s_kva)
-                        table['PF'][slno+1] = pf
-                        
-                col_codes = ['ref', 'name', 'sn_kva', 'cos_phi', 'sa', 'sb', 'sc', 'in_service', 'load_profile']
-                col_captions = ['Reference', 'Name', 'Rated power', 'PF', 'Sa', 'Sb', 'Sc', 'In Service ?', 'Load Profile']
-                code_sources = [E,E,P,P,P,P,P,E,E]
-                table = misc.elements_to_table(element_loads, col_codes, col_captions, code_sources, 'boq_loads',
-                                            show_element_class=True, modifyfunc=modifyfunc_load, sum_cols=[2])
-                boq_tables['element_loads'] = table
-                boq_captions['element_loads'] = 'Loads'
-            # Switches
-            if element_switches:
-
-                def modifyfunc_switch(table):
-                    for slno, element in enumerate(element_switches):
-                        if table['Line protection curve'][slno+1] == 'None':
-                            table['Line protection curve'][slno+1] = ''
-                        if table['Ground protection curve'][slno+1] == 'None':
-                            table['Ground protection curve'][slno+1] = ''
-
-                col_codes = ['ref', 'name', 'type', 'subtype', 'poles', 'Un', 'In', 
-                            'prot_curve_type', 'prot_0_curve_type', 'closed']
-                col_captions = ['Reference', 'Name', 'Type', 'Sub type', 'Poles', 'Un', 'In',
-                                'Line protection curve', 'Ground protection curve', 'Closed']
-                code_sources = [E,E,E,E,E,E,E,E,E,E]
-                table = misc.elements_to_table(element_switches, col_codes, col_captions, code_sources, 'boq_switches',
-                                            show_element_class=False, modifyfunc=modifyfunc_switch)
-                boq_tables['element_switches'] = table
-                boq_captions['element_switches'] = 'Switches'
-            # Nodes
-            if element_nodes:
-                nodes_sorted_by_name = [element_nodes[x] for x in sorted(element_nodes.keys())]
-                col_codes = ['ref', 'vn_kv', 'delv_perc_max', 'ikss_ka_3ph_max', 'ikss_ka_3ph_min', 'ipss_ka_3ph_max', 'ikss_ka_1ph_max', 'ikss_ka_1ph_min']
-                col_captions = ['Node ID', 'Vn', 'ΔV', 'Isc (sym, max)', 'Isc (sym, min)', 'Isc (pk, max)', 'Isc (L-G, max)', 'Isc (L-G, min)']
-                code_sources = [E,R,R,R,R,R,R,R]
-                table = misc.elements_to_table(nodes_sorted_by_name, col_codes, col_captions, code_sources, 'boq_nodes',
-                                            show_slno=False, show_element_class=False)
-                boq_tables['element_nodes'] = table
-                boq_captions['element_nodes'] = 'Nodes'
-            
-        # Load profiles
-        loadprofile_captions = dict()
-        loadprofile_images = dict()
-        if export_loadprofiles_flag:
-            loadprofile_captions = {key:self.loadprofiles[key][0] for key in loadprofile_captions_used}
-            # Sort
-            loadprofile_captions = dict(sorted(loadprofile_captions.items(), key=lambda item:item[1]))
-            # Add images
-            xlim = misc.GRAPH_LOAD_TIME_LIMITS
-            ylim = misc.GRAPH_LOAD_CURRENT_LIMITS
-            xlabel = 'Time (Hr)'
-            ylabel = 'Diversity Factor'
-            params = {}
-            for loadprofile_caption in loadprofile_captions:
-                title, graph_model = self.loadprofiles[loadprofile_caption]
-                graph_image = GraphImage(xlim, ylim, '', xlabel, ylabel, graph_params=params)
-                graph_image.add_plots(graph_model)
-                emb_image = graph_image.get_embedded_html_image(figsize=(500, 175))
-                loadprofile_images[loadprofile_caption] = emb_image
-            
-        # Analysis options
-        if (settings['powerflow'] or settings['sc_sym'] or settings['sc_gf']) and export_ana_flag:
-            analysis_flag = True
-        else: 
-            analysis_flag = False
-        ana_opt_table = misc.fields_to_table(self.get_project_fields(page='Simulation'))
-        
-        # Analysis results
-        ana_res_captions = dict()
-        ana_res_tables = dict()
-        if analysis_flag: 
-            base_elements = self.networkmodel.base_elements
-            # First pass add all required elements
-            for key, model in base_elements.items():
-                if 'ref' in model.fields and (model.code not in misc.REFERENCE_CODES) and (model.code != 'element_assembly'):
-                    if model.res_fields:
-                        table = misc.fields_to_table(model.res_fields, insert_graph=export_graphs_flag)
-                        ana_res_captions[str(key)+'_res'] = model.fields['ref']['value'] + ' - ' + model.name
-                        ana_res_tables[str(key)+'_res'] = table
-            # Sort by reference
-            ana_res_captions = dict(sorted(ana_res_captions.items(), key=lambda item:item[1]))
-            ana_res_tables = {key:ana_res_tables[key] for key in ana_res_captions}
-        
-        # Load HTML file    
-        template = env.get_template("report.html")
-        template_vars = {'gen_variables': gen_variables,
-                         'element_captions': element_captions,
-                         'element_tables': element_tables,
-                         'boq_tables': boq_tables,
-                         'boq_captions': boq_captions,
-                         'loadprofile_captions': loadprofile_captions,
-                         'loadprofile_images': loadprofile_images,
-                         'analysis_flag': analysis_flag,
-                         'export_elements_flag': export_elements_flag,
-                         'export_boq_flag': export_boq_flag,
-                         'export_loadprofiles_flag': export_loadprofiles_flag,
-                         'ana_opt_table': ana_opt_table,
-                         'ana_res_tables': ana_res_tables,
-                         'ana_res_captions': ana_res_captions
-                        }
-        html_out = template.render(template_vars)
-        
-        # Load CSS file
-        template_css = env.get_template("report.css")
-        template_vars_css = {'report_font': misc.REPORT_FONT_FACE,
-                             'report_font_size': misc.REPORT_FONT_SIZE}
-        css_out = template_css.render(template_vars_css)
-        css_obj = io.BytesIO(bytes(css_out, 'utf-8'))
-        
-        # Render HTML, PDF
-        filename_pdf = misc.posix_path(foldername, 'report.pdf')
-        filename_html = misc.posix_path(foldername, 'report.html')
-        filename_css = misc.posix_path(foldername, 'report.css')
-        with open(filename_html, 'w') as fp:
-            fp.write(html_out)
-        with open(filename_css, 'w') as fp:
-            fp.write(css_out)
-        HTML(string=html_out, base_url=foldername).write_pdf(filename_pdf, stylesheets=[css_obj])
+        report.export_pdf_report(self, foldername, settings, call_at_exit)
         
+    def export_results(self, filename, call_at_exit=None, progress_callback=None):
+        """Export element fields, node results and time series as XLSX, CSV or Parquet"""
+        resultsexport.export_results(self, filename, progress_callback)
         if call_at_exit:
             call_at_exit()
         
-    def export_drawing(self, filename, call_at_exit=None):
+    def export_drawing(self, filename, call_at_exit=None, progress_callback=None):
+        """Export drawing to PDF
+        
+            Pages are rendered in worker processes when possible.
+            progress_callback is called as progress_callback(pages_done, pages_total).
+        """
+        num_pages = len(self.drawing_models)
+        if export.pypdf and num_pages >= export.EXPORT_PARALLEL_MIN_PAGES:
+            page_models = [drawing_model.get_model(display_elements=True) for drawing_model in self.drawing_models]
+            try:
+                export.export_drawing_parallel(filename, page_models, misc.get_fields_dict_trunc(self.fields), 
+                                               self.loadprofiles, progress_callback)
+                if call_at_exit:
+                    call_at_exit()
+                return
+            except:
+                log.exception('ProjectModel - export_drawing - Parallel export failed, falling back to serial export')
+        
         surface = cairo.PDFSurface(filename, 0, 0)
-        proj_fields = self.get_project_fields()
-        surface.set_metadata(cairo.PDFMetadata.TITLE, proj_fields['project_name']['value'])
-        surface.set_metadata(cairo.PDFMetadata.AUTHOR, proj_fields['drawing_field_approved']['value'])
-        surface.set_metadata(cairo.PDFMetadata.SUBJECT, 'Electrical Schematic Drawing')
-        surface.set_metadata(cairo.PDFMetadata.CREATOR, misc.PROGRAM_NAME + ' v' + misc.PROGRAM_VER)
-        surface.set_metadata(cairo.PDFMetadata.CREATE_DATE, datetime.datetime.now().astimezone().replace(microsecond=0).isoformat())
-        surface.set_metadata(cairo.PDFMetadata.MOD_DATE, datetime.datetime.now().astimezone().replace(microsecond=0).isoformat())
+        export.set_surface_metadata(surface, export.get_drawing_metadata(self.fields))
         context = cairo.Context(surface)
         # If dark mode, load correct values while drawing
         if self.program_state['dark_mode']:
             misc.reset_dark_mode_drawing_values()
-        for drawing_model in self.drawing_models:
+        for slno, drawing_model in enumerate(self.drawing_models):
             surface.set_size(drawing_model.fields['page_width']['value'], drawing_model.fields['page_height']['value'])
             drawing_model.export_drawing(context)
             surface.show_page()
+            if progress_callback:
+                progress_callback(slno + 1, num_pages)
         # If dark mode, restore original values
         if self.program_state['dark_mode']:
             misc.set_dark_mode_drawing_values()  
@@ -1051,17 +924,71 @@ class ProjectModel:
         """Get storage model"""
         proj_pages = []
         drawing_names = []
+        drawing_fields = []
         for slno, drawing_model in enumerate(self.drawing_models):
             page_name = 'proj_drawing_page_' + str(slno)+'.json'
             proj_pages.append((page_name, drawing_model.get_model()))
             drawing_names.append(page_name)
+            drawing_fields.append(misc.get_fields_trunc(drawing_model.fields))
         proj_pages.append(('proj_loadprofiles.json', self.loadprofiles))
         proj_settings = {'proj_drawing_names'  : drawing_names,
+                         'proj_drawing_fields' : drawing_fields,
+                         'proj_fields'         : misc.get_fields_dict_trunc(self.fields)}
+        return [proj_settings, proj_pages]
+    
+    def get_state_keys(self):
+        """Get state keys of storage model pages"""
+        keys = dict()
+        for slno, drawing_model in enumerate(self.drawing_models):
+            page_name = 'proj_drawing_page_' + str(slno)+'.json'
+            keys[page_name] = drawing_model.get_state_key()
+        keys['proj_loadprofiles.json'] = projectfile.get_json_hash(projectfile.dump_json(self.loadprofiles))
+        return keys
+    
+    def get_model_incremental(self, is_current):
+        """Get storage model skipping unmodified pages
+        
+            Arguments:
+                is_current: Called as is_current(page_name, state_key) to check if 
+                    page is unmodified since last save
+            Returns:
+                [proj_settings, [(page_name, state_key, page or None if unmodified), ...]]
+        """
+        proj_pages = []
+        drawing_names = []
+        drawing_fields = []
+        for slno, drawing_model in enumerate(self.drawing_models):
+            page_name = 'proj_drawing_page_' + str(slno)+'.json'
+            key = drawing_model.get_state_key()
+            page = None if is_current(page_name, key) else drawing_model.get_model()
+            proj_pages.append((page_name, key, page))
+            drawing_names.append(page_name)
+            drawing_fields.append(misc.get_fields_trunc(drawing_model.fields))
+        # Load profiles serialised here since they can be modified while saving
+        loadprofiles_text = projectfile.dump_json(self.loadprofiles)
+        key = projectfile.get_json_hash(loadprofiles_text)
+        page = None if is_current('proj_loadprofiles.json', key) else loadprofiles_text
+        proj_pages.append(('proj_loadprofiles.json', key, page))
+        proj_settings = {'proj_drawing_names'  : drawing_names,
+                         'proj_drawing_fields' : drawing_fields,
                          'proj_fields'         : misc.get_fields_dict_trunc(self.fields)}
+        # Analysis results, encoded while saving
+        results = self.get_valid_results()
+        if results:
+            key = misc.RefKey(results)
+            page = None if is_current(projectfile.RESULTS_NAME, key) else results.encode
+            proj_pages.append((projectfile.RESULTS_NAME, key, page))
+            proj_settings['proj_results'] = {'file': projectfile.RESULTS_NAME,
+                                             'version': projectfile.RESULTS_VER}
         return [proj_settings, proj_pages]
             
-    def set_model(self, document, pages):
-        """Set storage model"""
+    def set_model(self, document, pages, results=None):
+        """Set storage model
+        
+            Drawing pages may be passed as serialised json. Elements of pages other
+            than the first are created on first use or loaded in background when idle.
+            Analysis results passed are applied to elements as pages are loaded.
+        """
         self.clear_all()
         self.drawing_notebook.disconnect(self.tab_handler_id)
         if ('proj_drawing_names' in document and 
@@ -1071,19 +998,30 @@ class ProjectModel:
             self.program_state['project_settings_main'] = self.fields['Information']
             self.program_state['project_settings'] = self.fields
             self.loadprofiles = pages['proj_loadprofiles.json']
+            # Page fields stored in document index, used to set up pages without parsing them
+            drawing_fields = document.get('proj_drawing_fields', [])
             slno = 0
             for page_name, page in pages.items():
                 if page_name.startswith('proj_drawing_page_'):
                     if slno > 0:
-                        self.append_page()
-                    self.drawing_models[slno].set_model(page)
+                        self.add_page_vanilla()
+                    fields = drawing_fields[slno] if slno < len(drawing_fields) else None
+                    page_results = (lambda slno=slno: results.get_element_results(slno)) if results else None
+                    self.drawing_models[slno].set_model_lazy(page, fields, page_results)
                     slno += 1
         else:
             return False
         # Switch to first page
+        self.load_page(0)
         self.update_tabs()
         self.set_page(0)
+        if results:
+            self.results = results
+            self.results_key = self.get_results_key()
         self.tab_handler_id = self.drawing_notebook.connect("switch-page", self.on_switch_tab)
+        # Load remaining pages in background
+        if self.get_page_nos() > 1:
+            self.prefetch_id = GLib.idle_add(self.prefetch_pages, priority=GLib.PRIORITY_LOW)
         
     ## Callbacks
     
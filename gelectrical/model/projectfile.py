@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# projectfile
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, io, json, copy, hashlib, logging
+import concurrent.futures
+from zipfile import ZipFile
+import numpy as np
+
+# local files import
+from .. import misc
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Version of drawing page cache format
+PAGE_CACHE_VER = 1
+# Keys of evaluated curve data in graph models
+PAGE_CACHE_CURVE_KEYS = ('xval', 'yval')
+# Archive member holding analysis results and version of its format
+RESULTS_NAME = 'proj_results.npz'
+RESULTS_VER = 1
+# Minimum length of numeric lists stored as arrays in results
+RESULTS_ARRAY_MIN = 16
+
+
+def dump_json(obj):
+    """Serialise object to compact json"""
+    return json.dumps(obj, separators=(',', ':'))
+
+def get_json_hash(text):
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+def get_content_hash(document, member_hashes):
+    """Hash of project content given hashes of json members in document order"""
+    return get_json_hash(dump_json([document['proj_fields'], member_hashes]))
+
+def get_file_signature(filename):
+    """Return modification signature of file or None if not existing"""
+    try:
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def get_cache_name(name):
+    """Name of archive member holding binary cache of drawing page"""
+    return name + '.cache'
+
+def is_drawing_page(data):
+    return isinstance(data, list) and len(data) == 2 and data[0] == 'DrawingModel'
+
+def pack_curves(value, curves):
+    """Move float lists of graph model to curves, replacing them by {'curve': [offset, length]}"""
+    if isinstance(value, dict) and isinstance(value.get('graph_model'), list) and len(value['graph_model']) == 2:
+        for graph in value['graph_model'][1]:
+            if isinstance(graph, dict):
+                for key in PAGE_CACHE_CURVE_KEYS:
+                    vals = graph.get(key)
+                    if isinstance(vals, list) and all(type(val) is float for val in vals):
+                        graph[key] = {'curve': [len(curves), len(vals)]}
+                        curves.extend(vals)
+    return value
+
+def unpack_curves(value, curves):
+    if isinstance(value, dict) and isinstance(value.get('graph_model'), list) and len(value['graph_model']) == 2:
+        for graph in value['graph_model'][1]:
+            if isinstance(graph, dict):
+                for key in PAGE_CACHE_CURVE_KEYS:
+                    vals = graph.get(key)
+                    if isinstance(vals, dict):
+                        offset, length = vals['curve']
+                        graph[key] = curves[offset:offset+length].tolist()
+    return value
+
+def encode_page_cache(text):
+    """Encode serialised drawing page as binary cache
+
+        Elements are stored as rows of field values, with field codes and types stored
+        once per element class. Evaluated curves of protection and damage models are
+        stored as a single float array. The cache is keyed by the hash of the json text.
+
+        Returns:
+            Cache data as npz file contents, or None if page can not be cached
+    """
+    model = json.loads(text)
+    if not is_drawing_page(model) or set(model[1].keys()) != {'fields', 'elements'}:
+        return None
+    schemas = []
+    schema_nos = dict()
+    rows = []
+    curves = []
+    for element in model[1]['elements']:
+        fields = element['fields']
+        if any(set(field.keys()) != {'value', 'type'} for field in fields.values()):
+            return None
+        keys = tuple(key for key in element if key not in ('code', 'fields'))
+        columns = tuple((code, field['type']) for code, field in fields.items())
+        schema = (element['code'], keys, columns)
+        if schema not in schema_nos:
+            schema_nos[schema] = len(schemas)
+            schemas.append(schema)
+        values = [pack_curves(field['value'], curves) for field in fields.values()]
+        rows.append([schema_nos[schema], [element[key] for key in keys], values])
+    header = {'version': PAGE_CACHE_VER,
+              'hash': get_json_hash(text),
+              'fields': model[1]['fields'],
+              'schemas': schemas,
+              'rows': rows}
+    buffer = io.BytesIO()
+    np.savez(buffer, 
+             header=np.frombuffer(dump_json(header).encode('utf-8'), dtype=np.uint8),
+             curves=np.array(curves, dtype=np.float64))
+    return buffer.getvalue()
+
+def decode_page_cache(data, json_hash):
+    """Decode binary cache of drawing page
+
+        Returns:
+            Storage model of drawing page, or None if cache is not valid for json hash
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        header = json.loads(npz['header'].tobytes())
+        if header.get('version') != PAGE_CACHE_VER or header.get('hash') != json_hash:
+            return None
+        curves = npz['curves']
+    schemas = header['schemas']
+    elements = []
+    for schema_no, items, values in header['rows']:
+        code, keys, columns = schemas[schema_no]
+        element = {'code': code}
+        element.update(zip(keys, items))
+        element['fields'] = {field_code: {'value': unpack_curves(value, curves), 'type': field_type}
+                             for (field_code, field_type), value in zip(columns, values)}
+        elements.append(element)
+    return ['DrawingModel', {'fields': header['fields'], 'elements': elements}]
+
+
+class CachedPage:
+    """Serialised drawing page read from project file along with its binary cache"""
+
+    def __init__(self, json_data, cache_data=None):
+        self.json_data = json_data
+        self.cache_data = cache_data
+
+    def parse(self):
+        """Return storage model, read from cache if valid for json data"""
+        if self.cache_data is not None:
+            try:
+                model = decode_page_cache(self.cache_data, get_json_hash(self.json_data))
+                if model is not None:
+                    return model
+                log.info('CachedPage - parse - cache out of date, reading json')
+            except:
+                log.exception('CachedPage - parse - error reading cache, reading json')
+        return json.loads(self.json_data)
+
+def parse_page(data):
+    """Return storage model of drawing page passed as CachedPage, json text or storage model"""
+    if isinstance(data, CachedPage):
+        return data.parse()
+    elif isinstance(data, (str, bytes)):
+        return json.loads(data)
+    else:
+        return copy.deepcopy(data)
+
+def read_page(projzip, name, json_data=None):
+    """Read serialised drawing page and its binary cache from project archive"""
+    if json_data is None:
+        json_data = projzip.read(name)
+    cache_name = get_cache_name(name)
+    try:
+        cache_data = projzip.read(cache_name)
+    except KeyError:
+        cache_data = None
+    return CachedPage(json_data, cache_data)
+
+
+def pack_arrays(obj, arrays):
+    """Move numeric lists in obj to arrays, replacing them by {'__array__': [dtype, offset, length]}"""
+    if isinstance(obj, dict):
+        return {key: pack_arrays(value, arrays) for key, value in obj.items()}
+    elif isinstance(obj, range):
+        return {'__range__': [obj.start, obj.stop, obj.step]}
+    elif isinstance(obj, (list, tuple)):
+        if len(obj) >= RESULTS_ARRAY_MIN:
+            for dtype, types in (('f', (float, np.floating)), ('i', (int, np.integer))):
+                if all(isinstance(val, types) and not isinstance(val, bool) for val in obj):
+                    values = arrays[dtype]
+                    values.append(np.asarray(obj, dtype=np.float64 if dtype == 'f' else np.int64))
+                    offset = arrays[dtype + '_len']
+                    arrays[dtype + '_len'] += len(obj)
+                    return {'__array__': [dtype, offset, len(obj)]}
+        return [pack_arrays(value, arrays) for value in obj]
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    else:
+        return obj
+
+def unpack_arrays(obj, arrays):
+    if isinstance(obj, dict):
+        if '__array__' in obj:
+            dtype, offset, length = obj['__array__']
+            return arrays[dtype][offset:offset+length].tolist()
+        elif '__range__' in obj:
+            return range(*obj['__range__'])
+        return {key: unpack_arrays(value, arrays) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [unpack_arrays(value, arrays) for value in obj]
+    else:
+        return obj
+
+
+class AnalysisResults:
+    """Analysis results of project, as stored in project file
+
+        Element results are stored by page and index of element among non display
+        elements of the page. Time series and other long numeric lists are stored
+        as compressed arrays.
+    """
+
+    def __init__(self, element_results=None, node_results=None, data=None):
+        self.element_results = element_results  # {page: {element index: res_fields}}
+        self.node_results = node_results  # {gnode: res_fields}
+        self.data = data  # Encoded results, decoded on first use
+
+    def decode(self):
+        if self.element_results is None:
+            with np.load(io.BytesIO(self.data), allow_pickle=False) as npz:
+                header = json.loads(npz['header'].tobytes())
+                arrays = {'f': npz['f'], 'i': npz['i']}
+            self.element_results = dict()
+            for page, index, res_fields in header['element_results']:
+                self.element_results.setdefault(page, dict())[index] = unpack_arrays(res_fields, arrays)
+            self.node_results = {gnode: unpack_arrays(res_fields, arrays) 
+                                 for gnode, res_fields in header['node_results']}
+            log.info('AnalysisResults - decode - results decoded')
+
+    def encode(self):
+        """Return results as npz file contents"""
+        if self.data is None:
+            arrays = {'f': [], 'f_len': 0, 'i': [], 'i_len': 0}
+            element_results = [[page, index, pack_arrays(res_fields, arrays)] 
+                               for page, page_results in self.element_results.items()
+                               for index, res_fields in page_results.items()]
+            node_results = [[gnode, pack_arrays(res_fields, arrays)] 
+                            for gnode, res_fields in self.node_results.items()]
+            header = {'element_results': element_results, 'node_results': node_results}
+            buffer = io.BytesIO()
+            np.savez_compressed(buffer,
+                                header=np.frombuffer(dump_json(header).encode('utf-8'), dtype=np.uint8),
+                                f=np.concatenate(arrays['f']) if arrays['f'] else np.zeros(0, dtype=np.float64),
+                                i=np.concatenate(arrays['i']) if arrays['i'] else np.zeros(0, dtype=np.int64))
+            self.data = buffer.getvalue()
+        return self.data
+
+    def get_element_results(self, page):
+        """Return results of page as {element index: res_fields}"""
+        self.decode()
+        return self.element_results.get(page, dict())
+
+    def get_node_results(self):
+        self.decode()
+        return self.node_results
+
+def read_results(projzip, document, member_hashes):
+    """Read analysis results from project archive if valid for project content
+
+        Arguments:
+            projzip: Project archive
+            document: Document index
+            member_hashes: Hashes of json members of document index in order
+        Returns:
+            AnalysisResults or None
+    """
+    info = document.get('proj_results')
+    if (isinstance(info, dict) and info.get('version') == RESULTS_VER
+            and info.get('file') in projzip.NameToInfo
+            and info.get('hash') == get_content_hash(document, member_hashes)):
+        return AnalysisResults(data=projzip.read(info['file']))
+    return None
+
+def read_snapshot(file):
+    """Read project archive as project snapshot without the program window
+
+        Arguments:
+            file: Filename or file object of project archive
+        Returns:
+            Dict with keys 'fields', 'loadprofiles' and 'pages' in the format of
+            ProjectModel.get_analysis_snapshot, for use with export.get_snapshot_project
+        Raises:
+            ValueError if file is not a project archive of supported version
+    """
+    with ZipFile(file, 'r') as projzip:
+        document = json.loads(projzip.read('document.json'))
+        if document.get('_file_version') != misc.PROJECT_FILE_VER:
+            raise ValueError('Wrong file type, project file version not supported')
+        pages = [parse_page(read_page(projzip, name)) for name in document['_files']
+                 if name.startswith('proj_drawing_page_')]
+        loadprofiles = json.loads(projzip.read('proj_loadprofiles.json'))
+    return {'fields': document['proj_fields'],
+            'loadprofiles': loadprofiles,
+            'pages': pages}
+
+
+class ProjectWriter:
+    """Write project files incrementally on a background thread
+
+        Each member of the project archive is tracked by a state key. On save,
+        members whose state key is unchanged since the last save are copied
+        byte-for-byte from the existing archive and only modified members are
+        serialised. The archive is written to a temporary file and moved over
+        the project file once complete.
+    """
+
+    def __init__(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # State of file on disk: (filename, file signature, {member: state key}), set by worker
+        self.saved = None
+        # State expected once queued saves complete: (filename, {member: state key})
+        self.pending = None
+
+    def set_saved_state(self, filename, entries):
+        """Record state of project file read from disk"""
+        self.wait()
+        self.saved = (filename, get_file_signature(filename), dict(entries))
+        self.pending = (filename, dict(entries))
+
+    def reset(self):
+        """Force next save to write all members"""
+        self.pending = None
+
+    def is_current(self, filename, name, key):
+        """Check if member of project file will be up to date with state key"""
+        return (self.pending is not None and self.pending[0] == filename
+                and name in self.pending[1] and self.pending[1][name] == key)
+
+    def save(self, filename, document, pages, callback=None):
+        """Queue project for saving
+
+            Arguments:
+                filename: Project filename
+                document: Document index, '_files' is filled in on write
+                pages: List of (member name, state key, data) where data is either a
+                    json serialisable snapshot, serialised json text, a callable returning
+                    binary member contents, or None for members to be copied from the 
+                    existing project file. Only json members are listed in '_files'.
+                callback: Called as callback(exception) from the worker thread on
+                    completion, exception is None on success
+        """
+        self.pending = (filename, {name: key for name, key, data in pages})
+        future = self.executor.submit(self.write, filename, document, pages)
+        if callback:
+            future.add_done_callback(lambda future: callback(future.exception()))
+        return future
+
+    def wait(self):
+        """Wait for queued saves to complete"""
+        self.executor.submit(lambda: None).result()
+
+    def write(self, filename, document, pages):
+        copy_names = [name for name, key, data in pages if data is None]
+        if copy_names:
+            if self.saved is None or self.saved[0] != filename or self.saved[1] != get_file_signature(filename):
+                raise RuntimeError('Project file modified since last save')
+            for name, key, data in pages:
+                if data is None and self.saved[2].get(name) != key:
+                    raise RuntimeError('Project file member out of date - ' + name)
+
+        temp_filename = filename + '.tmp'
+        try:
+            source = ZipFile(filename, 'r') if copy_names else None
+            try:
+                with ZipFile(temp_filename, 'w') as projzip:
+                    files = []
+                    member_hashes = []
+                    for name, key, data in pages:
+                        cache_name = get_cache_name(name)
+                        if data is None:
+                            text = source.read(name)
+                            projzip.writestr(source.getinfo(name), text)
+                            if cache_name in source.NameToInfo:
+                                projzip.writestr(source.getinfo(cache_name), source.read(cache_name))
+                        elif callable(data):
+                            text = data()
+                            projzip.writestr(name, text)
+                        elif isinstance(data, str):
+                            text = data
+                            projzip.writestr(name, text)
+                        else:
+                            text = dump_json(data)
+                            projzip.writestr(name, text)
+                            if is_drawing_page(data):
+                                self.write_cache(projzip, cache_name, text)
+                        if name.endswith('.json'):
+                            files.append(name)
+                            member_hashes.append(get_json_hash(text))
+                    document['_files'] = files
+                    # Tag analysis results with content they were produced from
+                    if 'proj_results' in document:
+                        document['proj_results']['hash'] = get_content_hash(document, member_hashes)
+                    projzip.writestr('document.json', dump_json(document))
+            finally:
+                if source:
+                    source.close()
+            os.replace(temp_filename, filename)
+        except:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        self.saved = (filename, get_file_signature(filename), {name: key for name, key, data in pages})
+        log.info('ProjectWriter - write - {} of {} members written to {}'.format(
+                    len(pages) - len(copy_names), len(pages), filename))
+
+    def write_cache(self, projzip, cache_name, text):
+        """Write binary cache of drawing page, skipped on failure since json is authoritative"""
+        try:
+            cache_data = encode_page_cache(text)
+            if cache_data is not None:
+                projzip.writestr(cache_name, cache_data)
+        except:
+            log.exception('ProjectWriter - write_cache - error writing cache ' + cache_name)
@@ -18,8 +18,10 @@
 #  
 # 
 
-import copy, logging
+import copy, logging, json, hashlib, re
+from collections import OrderedDict
 import numpy as np
+import shapely
 from shapely import Polygon, Point, LineString
 # from scipy.interpolate import interp1d
 
@@ -38,6 +40,396 @@ log = logging.getLogger(__name__)
 # Module constants
 PROT_LOWER = -1
 PROT_UPPER = 1
+# Log space limits used for containment checks
+LOG_LIM_MIN = -6
+LOG_LIM_MAX = 6
+# Tolerance used for comparing curves in log space
+LOG_TOLERANCE = 1e-9
+
+# Maximum number of evaluated curves held in cache
+CURVE_CACHE_SIZE = 1024
+
+class CurveCache:
+    """Bounded LRU cache of evaluated protection curves"""
+
+    def __init__(self, maxsize=CURVE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.store:
+            self.store.move_to_end(key)
+            self.hits += 1
+            return self.store[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.store[key] = value
+        self.store.move_to_end(key)
+        while len(self.store) > self.maxsize:
+            self.store.popitem(last=False)
+
+    def clear(self):
+        self.store.clear()
+        self.hits = 0
+        self.misses = 0
+
+curve_cache = CurveCache()
+
+# Cache for containment checks, active only during a rules check run
+_contains_cache = None
+
+def start_contains_cache():
+    """Start caching results of ProtectionModel.contains"""
+    global _contains_cache
+    _contains_cache = dict()
+
+def stop_contains_cache():
+    """Stop caching results of ProtectionModel.contains and clear cache"""
+    global _contains_cache
+    _contains_cache = None
+
+def _is_monotone(x, y):
+    """Check if curve has non decreasing x and non increasing y values"""
+    return len(x) >= 2 and np.all(np.diff(x) >= 0) and np.all(np.diff(y) <= 0) and x[-1] > x[0]
+
+def _is_function(x):
+    """Check if curve can be treated as a function of x (vertical steps allowed)"""
+    return len(x) >= 2 and np.all(np.diff(x) >= 0) and x[-1] > x[0]
+
+def _interp_limits(xp, yp, x):
+    """
+    Interpolate piecewise linear curve with possible vertical steps.
+    Returns left and right limits of curve at points x.
+    """
+    n = len(xp)
+    def interp(idx):
+        idx = np.clip(idx, 1, n-1)
+        x0 = xp[idx-1]
+        x1 = xp[idx]
+        y0 = yp[idx-1]
+        y1 = yp[idx]
+        dx = x1 - x0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(dx > 0, (x - x0)/dx, 0)
+        frac = np.clip(frac, 0, 1)
+        return y0 + frac*(y1 - y0)
+    y_left = interp(np.searchsorted(xp, x, side='left'))
+    y_right = interp(np.searchsorted(xp, x, side='right'))
+    # Handle end points explicitly
+    y_left = np.where(x <= xp[0], yp[0], y_left)
+    y_right = np.where(x >= xp[-1], yp[-1], y_right)
+    return y_left, y_right
+
+class EvaluatedCurve():
+    """
+    Evaluated protection or damage curve
+
+    Holds upper and lower curves as read only arrays of (current, time) points. 
+    Shapely geometries are built on first use and shared between derived copies.
+    """
+
+    def __init__(self, title, element_type, curve_upper, curve_lower, geometry=None):
+        self.title = title
+        self.element_type = element_type
+        self.curve_upper = curve_upper
+        self.curve_lower = curve_lower
+        self.curve_upper.setflags(write=False)
+        self.curve_lower.setflags(write=False)
+        # Lazily built geometries
+        self._geometry = geometry if geometry is not None else dict()
+
+    def derive(self, title, element_type):
+        """Return copy with given title sharing curve data and geometries"""
+        return EvaluatedCurve(title, element_type, self.curve_upper, self.curve_lower, self._geometry)
+
+    def _get_geometry(self, code):
+        if code not in self._geometry:
+            if code == 'linestring_upper':
+                geometry = LineString(self.curve_upper)
+            elif code == 'linestring_lower':
+                geometry = LineString(self.curve_lower)
+            elif code == 'linestring_upper_log':
+                geometry = LineString(np.log10(self.curve_upper))
+            elif code == 'linestring_lower_log':
+                geometry = LineString(np.log10(self.curve_lower))
+            elif code == 'polygon':
+                if len(self.polygon_points):
+                    geometry = Polygon(self.polygon_points)
+                else:
+                    geometry = Polygon()
+            elif code == 'polygon_log':
+                if len(self.polygon_points):
+                    geometry = Polygon(np.log10(self.polygon_points))
+                else:
+                    geometry = Polygon()
+            self._geometry[code] = geometry
+        return self._geometry[code]
+
+    @property
+    def polygon_points(self):
+        """Closed ring of points bounding the region between upper and lower curves"""
+        if 'polygon_points' not in self._geometry:
+            if len(self.curve_upper) and len(self.curve_lower):
+                points = np.vstack((self.curve_upper[::-1], self.curve_lower, self.curve_upper[-1:]))
+            else:
+                points = np.empty((0,2))
+            self._geometry['polygon_points'] = points
+        return self._geometry['polygon_points']
+
+    linestring_upper = property(lambda self: self._get_geometry('linestring_upper'))
+    linestring_lower = property(lambda self: self._get_geometry('linestring_lower'))
+    linestring_upper_log = property(lambda self: self._get_geometry('linestring_upper_log'))
+    linestring_lower_log = property(lambda self: self._get_geometry('linestring_lower_log'))
+    polygon = property(lambda self: self._get_geometry('polygon'))
+    polygon_log = property(lambda self: self._get_geometry('polygon_log'))
+
+    def get_graph_model(self):
+        """Return graph model of evaluated curves"""
+        if self.element_type == 'protection':
+            polygon_pnts = self.polygon_points
+            xval = polygon_pnts[:,0].tolist()
+            yval = polygon_pnts[:,1].tolist()
+            graph_model = [self.title, [{'mode':misc.GRAPH_DATATYPE_POLYGON, 
+                                            'title':self.title, 
+                                            'xval':xval, 
+                                            'yval': yval},]]
+            return graph_model
+        elif self.element_type == 'damage':
+            xval1 = self.curve_upper[:,0].tolist()
+            yval1 = self.curve_upper[:,1].tolist()
+            xval2 = self.curve_lower[:,0].tolist()
+            yval2 = self.curve_lower[:,1].tolist()
+            graphs = []
+            damage_flag = False
+            starting_flag = False
+
+            if xval1 and yval1:
+                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
+                                            'title': self.title + ' - Damage', 
+                                            'xval':xval1, 
+                                            'yval': yval1})
+                damage_flag = True
+            else:
+                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
+                                            'title': '', 
+                                            'xval':[], 
+                                            'yval': []})
+            if xval2 and yval2:
+                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
+                                            'title':self.title + ' - Starting', 
+                                            'xval':xval2, 
+                                            'yval': yval2})
+                starting_flag = True
+            else:
+                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
+                                            'title': '', 
+                                            'xval':[], 
+                                            'yval': []})
+
+            if damage_flag and not starting_flag:
+                title = self.title + ' - Damage curve'
+            elif starting_flag and not damage_flag:
+                title = self.title + ' - Starting curve'
+            else:
+                title = self.title
+
+            graph_model = [title, graphs]
+            return graph_model
+        return []
+
+    def get_current(self, t, mode='protection'):
+        values = tuple()
+        if mode == 'protection' and self.polygon:
+            if t > self.polygon.bounds[3]:
+                values = (min(self.linestring_lower.xy[0]), min(self.linestring_upper.xy[0]))
+            elif t < self.polygon.bounds[1]:
+                values = (max(self.linestring_lower.xy[0]), max(self.linestring_upper.xy[0]))
+            else:
+                hor_line = LineString(np.log10([[self.polygon.bounds[0]-0.0001, t],
+                                                [self.polygon.bounds[2]+0.0001, t]]))
+                bounds = self.polygon_log.intersection(hor_line).bounds
+                values = (10**bounds[0], 10**bounds[2])
+        elif mode == 'damage' and self.linestring_upper:
+            if t > self.linestring_upper.bounds[3] or t < self.linestring_upper.bounds[1]:
+                values = tuple()
+            else:
+                hor_line = LineString(np.log10([[self.linestring_upper.bounds[0]-0.0001, t],
+                                                [self.linestring_upper.bounds[2]+0.0001, t]]))
+                bounds = (self.linestring_upper_log.intersection(hor_line)).bounds
+                values = (10**bounds[0], 10**bounds[2])
+        elif mode == 'starting' and self.linestring_lower:
+            if t > self.linestring_lower.bounds[3] or t < self.linestring_lower.bounds[1]:
+                values = tuple()
+            else:
+                hor_line = LineString(np.log10([[self.linestring_lower.bounds[0]-0.0001, t],
+                                                [self.linestring_lower.bounds[2]+0.0001, t]]))
+                bounds = (self.linestring_lower_log.intersection(hor_line)).bounds
+                values = (10**bounds[0], 10**bounds[2])
+        else:
+            values = tuple()
+        return tuple(sorted(set(values)))
+
+    def get_time(self, I, mode='protection'):
+        values = tuple()
+        if mode == 'protection' and self.polygon:
+            if I > self.polygon.bounds[2]:
+                values = (self.polygon.bounds[1],)
+            elif I < self.polygon.bounds[0]:
+                values = (1000000,)
+            else:
+                vert_line = LineString(np.log10([[I, self.polygon.bounds[1]-0.0001],
+                                                 [I, self.polygon.bounds[3]+0.0001]]))
+                bounds = self.polygon_log.intersection(vert_line).bounds
+                values = (10**bounds[1], 10**bounds[3])
+        elif mode == 'damage' and self.linestring_upper:
+            if I > self.linestring_upper.bounds[2] or I < self.linestring_upper.bounds[0]:
+                values = tuple()
+            else:
+                vert_line = LineString(np.log10([[I, self.linestring_upper.bounds[1]-0.0001],
+                                                 [I, self.linestring_upper.bounds[3]+0.0001]]))
+                bounds = (self.linestring_upper_log.intersection(vert_line)).bounds
+                values = (10**bounds[1], 10**bounds[3])
+        elif mode == 'starting' and self.linestring_lower:
+            if I > self.linestring_lower.bounds[2] or I < self.linestring_lower.bounds[0]:
+                values = tuple()
+            else:
+                vert_line = LineString(np.log10([[I, self.linestring_lower.bounds[1]-0.0001],
+                                                 [I, self.linestring_lower.bounds[3]+0.0001]]))
+                bounds = (self.linestring_lower_log.intersection(vert_line)).bounds
+                values = (10**bounds[1], 10**bounds[3])
+        else:
+            values = tuple()
+        return tuple(sorted(set(values)))
+    
+    def contains(self, geometry, curve='upper', direction='right', i_max=None, scale=1):
+        """
+        Check if geometry lies completely to the given direction of selected curve
+        """
+        if _contains_cache is not None:
+            key = (id(self), id(geometry), curve, direction, i_max, scale)
+            if key in _contains_cache:
+                return _contains_cache[key][2]
+            result = self._contains(geometry, curve, direction, i_max, scale)
+            # Keep references to objects so that ids remain valid for the run
+            _contains_cache[key] = (self, geometry, result)
+            return result
+        return self._contains(geometry, curve, direction, i_max, scale)
+
+    def _contains(self, geometry, curve='upper', direction='right', i_max=None, scale=1):
+        if curve == 'upper':
+            linestring = self.linestring_upper_log
+        elif curve == 'lower':
+            linestring = self.linestring_lower_log
+
+        if not linestring or not geometry:
+            return None
+
+        # Scale data
+        ls_x = np.array(linestring.xy[0]) + np.log10(scale)
+        ls_y = np.array(linestring.xy[1])
+
+        # Fast path for monotone curves
+        if isinstance(geometry, LineString):
+            g_x = np.array(geometry.xy[0])
+            g_y = np.array(geometry.xy[1])
+            if _is_monotone(ls_x, ls_y) and _is_function(g_x):
+                return self._contains_monotone(ls_x, ls_y, g_x, g_y, direction, i_max)
+
+        # Fallback to geometric check for general curves
+        linestring = LineString((np.vstack((ls_x, ls_y))).T)
+        i0 = ls_x[0]
+        t0 = ls_y[0]
+        i1 = ls_x[-1]
+        t1 = ls_y[-1]
+        if direction == 'right':
+            check_geom = Polygon(list(linestring.coords) + 
+                                    [(i1, LOG_LIM_MAX), (i0, LOG_LIM_MAX)])
+            if i_max:
+                lim_i_max = min(np.log10(i_max), i1)
+            else:
+                lim_i_max = i1
+            geom_mask = Polygon([   (LOG_LIM_MIN, LOG_LIM_MAX), 
+                                    (lim_i_max, LOG_LIM_MAX), 
+                                    (lim_i_max, LOG_LIM_MIN), 
+                                    (LOG_LIM_MIN, LOG_LIM_MIN),
+                                    (LOG_LIM_MIN, LOG_LIM_MAX)  ])
+            geometry_masked = geometry.intersection(geom_mask)
+        elif direction == 'left':
+            check_geom = Polygon(list(linestring.coords) + 
+                                    [(i1, LOG_LIM_MIN), 
+                                     (LOG_LIM_MIN, LOG_LIM_MIN), 
+                                     (LOG_LIM_MIN, LOG_LIM_MAX), 
+                                     (i0, LOG_LIM_MAX)])
+            geometry_masked = geometry
+        shapely.prepare(check_geom)
+        return check_geom.contains(geometry_masked)
+
+    @staticmethod
+    def _contains_monotone(ls_x, ls_y, g_x, g_y, direction, i_max):
+        """
+        Containment check of curve g against monotone curve ls in log space.
+        
+        Both curves are compared at the union of their break points using the left and 
+        right limits at each point along with the vertices of g. Since both curves are 
+        linear in between break points, this is equivalent to the geometric check.
+        """
+        i0 = ls_x[0]
+        i1 = ls_x[-1]
+        tol = LOG_TOLERANCE
+        if direction == 'right':
+            if i_max:
+                lim_i_max = min(np.log10(i_max), i1)
+            else:
+                lim_i_max = i1
+            # Geometry masked out completely
+            if g_x[0] > lim_i_max:
+                return False
+            if g_x[0] < i0 - tol or np.max(g_y) > LOG_LIM_MAX:
+                return False
+            x_min = g_x[0]
+            x_max = min(g_x[-1], lim_i_max)
+            # Vertices of g should lie above lowest point of curve at same abscissa
+            include = g_x <= x_max
+            c_left, c_right = _interp_limits(ls_x, ls_y, g_x[include])
+            if np.any(g_y[include] < c_right - tol):
+                return False
+            # Limits on either side of each break point
+            grid = np.union1d(ls_x, g_x)
+            grid = np.union1d(grid[(grid >= x_min) & (grid <= x_max)], [x_max])
+            c_left, c_right = _interp_limits(ls_x, ls_y, grid)
+            g_left, g_right = _interp_limits(g_x, g_y, grid)
+            check_left = grid > x_min
+            check_right = grid < x_max
+            return bool(np.all(g_left[check_left] >= c_left[check_left] - tol) 
+                        and np.all(g_right[check_right] >= c_right[check_right] - tol))
+        elif direction == 'left':
+            if g_x[-1] > i1 + tol or np.max(g_y) > LOG_LIM_MAX or np.min(g_y) < LOG_LIM_MIN:
+                return False
+            if g_x[-1] < i0:
+                return True
+            x_min = max(g_x[0], i0)
+            x_max = g_x[-1]
+            # Vertices of g should lie below highest point of curve at same abscissa
+            include = g_x > i0
+            c_left, c_right = _interp_limits(ls_x, ls_y, g_x[include])
+            if np.any(g_y[include] > c_left + tol):
+                return False
+            # Limits on either side of each break point
+            grid = np.union1d(ls_x, g_x)
+            grid = grid[(grid >= x_min) & (grid <= x_max)]
+            c_left, c_right = _interp_limits(ls_x, ls_y, grid)
+            g_left, g_right = _interp_limits(g_x, g_y, grid)
+            # Region left of curve start is bounded only by the time limits
+            check_left = (grid > g_x[0]) & (grid > i0)
+            check_right = grid < x_max
+            return bool(np.all(g_left[check_left] <= c_left[check_left] + tol) 
+                        and np.all(g_right[check_right] <= c_right[check_right] + tol))
+        
+
 
 class ProtectionModel():
     """Generic protection base element"""
@@ -99,13 +491,12 @@ class ProtectionModel():
                             'parameters'    : parameters,
                             'data'          : curves,
                             'graph_model'   : []}
-        # Generated variables
-        self.polygon = None
-        self.linestring_upper = None
-        self.linestring_lower = None
-        self.polygon_log = None
-        self.linestring_upper_log = None
-        self.linestring_lower_log = None
+        # Evaluated curves
+        self._evaluated = None
+        self._evaluate_args = None  # Arguments for deferred evaluation
+        # Cache key variables
+        self._data_key = None
+        self._field_refs = None
 
     @classmethod
     def new_from_data(cls, data_struct):
@@ -122,80 +513,82 @@ class ProtectionModel():
             raise ValueError('Wrong data structure passed')
 
     def copy(self):
-        new_obj = self.new_from_data(self.data_struct)
-        # Copy generated data
-        new_obj.title = self.title
-        new_obj.polygon = Polygon(self.polygon)
-        new_obj.linestring_upper = LineString(self.linestring_upper)
-        new_obj.linestring_lower = LineString(self.linestring_lower)
-        new_obj.polygon_log = Polygon(self.polygon_log)
-        new_obj.linestring_upper_log = LineString(self.linestring_upper_log)
-        new_obj.linestring_lower_log = LineString(self.linestring_lower_log)
+        # Curve data is not modified in place and is shared between copies
+        new_obj = self.__class__(self.title, copy.deepcopy(self.data_struct['parameters']), 
+                                 self.data_struct['data'], self.data_struct['type'])
+        new_obj._evaluated = self._evaluated
+        new_obj._evaluate_args = self._evaluate_args
+        new_obj._data_key = self._data_key
+        new_obj._field_refs = self._field_refs
         return new_obj
 
-    def get_data_fields(self, modify_code=''):
-        fields = misc.get_fields_from_params(self.data_struct['parameters'], modify_code)
-        return fields
+    def get_evaluated_curves(self):
+        """Return evaluated curves, running any deferred evaluation"""
+        if self._evaluated is None and self._evaluate_args is not None:
+            fields, data_fields = self._evaluate_args
+            self._evaluated = self.get_evaluated_curve(fields, data_fields)
+        return self._evaluated
 
-    def update_graph(self):
-        if self.data_struct['type'] == 'protection':
-            polygon_pnts = np.array((self.polygon.exterior.coords))
-            xval = list(polygon_pnts[:,0])
-            yval = list(polygon_pnts[:,1])
-            graph_model = [self.title, [{'mode':misc.GRAPH_DATATYPE_POLYGON, 
-                                            'title':self.title, 
-                                            'xval':xval, 
-                                            'yval': yval},]]
-            self.data_struct['graph_model'] = graph_model
-        elif self.data_struct['type'] == 'damage':
-            xval1 = list(self.linestring_upper.xy[0])
-            yval1 = list(self.linestring_upper.xy[1])
-            xval2 = list(self.linestring_lower.xy[0])
-            yval2 = list(self.linestring_lower.xy[1])
-            graphs = []
-            damage_flag = False
-            starting_flag = False
+    def set_evaluated_curves(self, evaluated):
+        self._evaluated = evaluated
 
-            if xval1 and yval1:
-                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
-                                            'title': self.title + ' - Damage', 
-                                            'xval':xval1, 
-                                            'yval': yval1})
-                damage_flag = True
-            else:
-                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
-                                            'title': '', 
-                                            'xval':[], 
-                                            'yval': []})
-            if xval2 and yval2:
-                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
-                                            'title':self.title + ' - Starting', 
-                                            'xval':xval2, 
-                                            'yval': yval2})
-                starting_flag = True
-            else:
-                graphs.append({'mode':misc.GRAPH_DATATYPE_PROFILE, 
-                                            'title': '', 
-                                            'xval':[], 
-                                            'yval': []})
+    evaluated = property(get_evaluated_curves, set_evaluated_curves)
 
-            if damage_flag and not starting_flag:
-                title = self.title + ' - Damage curve'
-            elif starting_flag and not damage_flag:
-                title = self.title + ' - Starting curve'
-            else:
-                title = self.title
+    def invalidate(self):
+        """Discard evaluated curves. Curves are re-evaluated on next use."""
+        self._evaluated = None
+
+    # Evaluated geometries
+    linestring_upper = property(lambda self: self.evaluated.linestring_upper if self.evaluated else None)
+    linestring_lower = property(lambda self: self.evaluated.linestring_lower if self.evaluated else None)
+    linestring_upper_log = property(lambda self: self.evaluated.linestring_upper_log if self.evaluated else None)
+    linestring_lower_log = property(lambda self: self.evaluated.linestring_lower_log if self.evaluated else None)
+    polygon = property(lambda self: self.evaluated.polygon if self.evaluated else None)
+    polygon_log = property(lambda self: self.evaluated.polygon_log if self.evaluated else None)
+
+    def get_data_fields(self, modify_code=''):
+        fields = misc.get_fields_from_params(self.data_struct['parameters'], modify_code)
+        return fields
 
-            graph_model = [title, graphs]
-            self.data_struct['graph_model'] = graph_model
-            
     def update_parameters(self, parameters):
         misc.update_params_from_params(self.data_struct['parameters'], parameters)
+        self.invalidate()
 
     def update_parameters_from_fields(self, fields):
         misc.update_params_from_fields(self.data_struct['parameters'], fields)
+        self.invalidate()
+
+    def get_cache_key(self, fields, data_fields=None, scale=1):
+        """Return stable hash of all inputs affecting curve evaluation"""
+        if self._data_key is None:
+            data_str = json.dumps(self.data_struct['data'], sort_keys=True, default=str)
+            self._data_key = hashlib.sha1(data_str.encode()).hexdigest()
+            refs = re.findall(r"\bf\.(\w+)", data_str) + re.findall(r"\bf\[\W*(\w+)\W*\]", data_str)
+            self._field_refs = sorted(set(refs))
+        if data_fields:
+            param_values = {key: field['value'] for key, field in data_fields.items()}
+        else:
+            param_values = {key: values[2] for key, values in self.data_struct['parameters'].items()}
+        field_values = [fields[code]['value'] if code in fields else None for code in self._field_refs]
+        key_str = json.dumps([self._data_key, param_values, field_values, scale], sort_keys=True, default=str)
+        return hashlib.sha1(key_str.encode()).hexdigest()
+
+    def get_evaluated_curve(self, fields, data_fields=None, scale=1):
+        """Return EvaluatedCurve for passed fields without modifying model"""
+        key = self.get_cache_key(fields, data_fields, scale)
+        evaluated = curve_cache.get(key)
+        if evaluated is None:
+            curve_upper, curve_lower = self._evaluate_curves(fields, data_fields, scale)
+            evaluated = EvaluatedCurve('', None, curve_upper, curve_lower)
+            curve_cache.put(key, evaluated)
+        return evaluated.derive(self.title, self.data_struct['type'])
 
     def evaluate_curves(self, fields, data_fields=None, scale=1):
+        self.evaluated = self.get_evaluated_curve(fields, data_fields, scale)
+        if scale == 1:
+            self._evaluate_args = (fields, data_fields)
+
+    def _evaluate_curves(self, fields, data_fields=None, scale=1):
         
         # Variables for evaluation
         f = FieldDict(fields)
@@ -398,152 +791,58 @@ class ProtectionModel():
             curve_upper = eval_curve(self.data_struct['data']['curve_u'])
             curve_lower = eval_curve(self.data_struct['data']['curve_l'])
 
-        # Geometry elements
-        if curve_upper is not None:
-            # self.linestring_upper = LineString(misc.log_interpolate_piecewise(self.curve_upper))
-            self.linestring_upper = LineString(curve_upper)
-            self.linestring_upper_log = LineString(np.log10(curve_upper))
-        else:
-            self.linestring_upper = None
-            self.linestring_upper_log = None
+        return np.reshape(curve_upper, (-1,2)), np.reshape(curve_lower, (-1,2))
 
-        if curve_lower is not None:
-            # self.linestring_lower = LineString(misc.log_interpolate_piecewise(self.curve_lower))
-            self.linestring_lower = LineString(curve_lower)
-            self.linestring_lower_log = LineString(np.log10(curve_lower))
-        else:
-            self.linestring_lower = None
-            self.linestring_lower_log = None
-            
-        if self.linestring_upper and self.linestring_lower:
-            self.polygon = Polygon(list(reversed(self.linestring_upper.coords)) + list(self.linestring_lower.coords))
-            self.polygon_log = Polygon(list(reversed(self.linestring_upper_log.coords)) + list(self.linestring_lower_log.coords))
-        else:
-            self.polygon = Polygon()
-            self.polygon_log = Polygon()
+    def update_graph(self):
+        if self.evaluated:
+            self.data_struct['graph_model'] = self.evaluated.get_graph_model()
 
     def get_graph_model(self):
         return copy.deepcopy(self.data_struct['graph_model'])
 
     def get_evaluated(self, fields, data_fields=None, scale=1):
-        obj = self.copy()
-        obj.evaluate_curves(fields, data_fields, scale)  # Evaluate curves
-        obj.update_graph()  # Update graph
-        return obj
+        return self.get_evaluated_curve(fields, data_fields, scale)
 
     def get_evaluated_model(self, fields, data_fields=None):
         self.evaluate_curves(fields, data_fields)  # Evaluate curves
         self.update_graph()  # Update graph
-        return copy.deepcopy(self.data_struct)
+        return {'type'          : self.data_struct['type'],
+                'parameters'    : copy.deepcopy(self.data_struct['parameters']),
+                'data'          : copy.deepcopy(self.data_struct['data']),
+                'graph_model'   : self.evaluated.get_graph_model(),
+                'curve_key'     : self.get_cache_key(fields, data_fields)}
+
+    def get_deferred_model(self, fields, graph_model=None, curve_key=None):
+        """
+        Return data structure without evaluating curves. 
+        
+        The graph model of a previous evaluation is reused and curves are evaluated 
+        on first use if curve_key stored with it matches the cache key of the current 
+        fields, parameters and curve data. Otherwise curves are evaluated immediately.
+        """
+        key = self.get_cache_key(fields)
+        if not graph_model or curve_key != key:
+            return self.get_evaluated_model(fields)
+        self._evaluated = None
+        self._evaluate_args = (fields, None)
+        self.data_struct['graph_model'] = graph_model
+        return {'type'          : self.data_struct['type'],
+                'parameters'    : copy.deepcopy(self.data_struct['parameters']),
+                'data'          : copy.deepcopy(self.data_struct['data']),
+                'graph_model'   : graph_model,
+                'curve_key'     : key}
 
     def get_current(self, t, mode='protection'):
-        values = tuple()
-        if mode == 'protection' and self.polygon:
-            if t > self.polygon.bounds[3]:
-                values = (min(self.linestring_lower.xy[0]), min(self.linestring_upper.xy[0]))
-            elif t < self.polygon.bounds[1]:
-                values = (max(self.linestring_lower.xy[0]), max(self.linestring_upper.xy[0]))
-            else:
-                hor_line = LineString(np.log10([[self.polygon.bounds[0]-0.0001, t],
-                                                [self.polygon.bounds[2]+0.0001, t]]))
-                bounds = self.polygon_log.intersection(hor_line).bounds
-                values = (10**bounds[0], 10**bounds[2])
-        elif mode == 'damage' and self.linestring_upper:
-            if t > self.linestring_upper.bounds[3] or t < self.linestring_upper.bounds[1]:
-                values = tuple()
-            else:
-                hor_line = LineString(np.log10([[self.linestring_upper.bounds[0]-0.0001, t],
-                                                [self.linestring_upper.bounds[2]+0.0001, t]]))
-                bounds = (self.linestring_upper_log.intersection(hor_line)).bounds
-                values = (10**bounds[0], 10**bounds[2])
-        elif mode == 'starting' and self.linestring_lower:
-            if t > self.linestring_lower.bounds[3] or t < self.linestring_lower.bounds[1]:
-                values = tuple()
-            else:
-                hor_line = LineString(np.log10([[self.linestring_lower.bounds[0]-0.0001, t],
-                                                [self.linestring_lower.bounds[2]+0.0001, t]]))
-                bounds = (self.linestring_lower_log.intersection(hor_line)).bounds
-                values = (10**bounds[0], 10**bounds[2])
-        else:
-            values = tuple()
-        return tuple(sorted(set(values)))
+        return self.evaluated.get_current(t, mode)
 
     def get_time(self, I, mode='protection'):
-        values = tuple()
-        if mode == 'protection' and self.polygon:
-            if I > self.polygon.bounds[2]:
-                values = (self.polygon.bounds[1],)
-            elif I < self.polygon.bounds[0]:
-                values = (1000000,)
-            else:
-                vert_line = LineString(np.log10([[I, self.polygon.bounds[1]-0.0001],
-                                                 [I, self.polygon.bounds[3]+0.0001]]))
-                bounds = self.polygon_log.intersection(vert_line).bounds
-                values = (10**bounds[1], 10**bounds[3])
-        elif mode == 'damage' and self.linestring_upper:
-            if I > self.linestring_upper.bounds[2] or I < self.linestring_upper.bounds[0]:
-                values = tuple()
-            else:
-                vert_line = LineString(np.log10([[I, self.linestring_upper.bounds[1]-0.0001],
-                                                 [I, self.linestring_upper.bounds[3]+0.0001]]))
-                bounds = (self.linestring_upper_log.intersection(vert_line)).bounds
-                values = (10**bounds[1], 10**bounds[3])
-        elif mode == 'starting' and self.linestring_lower:
-            if I > self.linestring_lower.bounds[2] or I < self.linestring_lower.bounds[0]:
-                values = tuple()
-            else:
-                vert_line = LineString(np.log10([[I, self.linestring_lower.bounds[1]-0.0001],
-                                                 [I, self.linestring_lower.bounds[3]+0.0001]]))
-                bounds = (self.linestring_lower_log.intersection(vert_line)).bounds
-                values = (10**bounds[1], 10**bounds[3])
-        else:
-            values = tuple()
-        return tuple(sorted(set(values)))
-    
+        return self.evaluated.get_time(I, mode)
+
     def contains(self, geometry, curve='upper', direction='right', i_max=None, scale=1):
         """
         Check if geometry lies completely to the given direction of selected curve
         """
-        lim_min = -6
-        lim_max = 6
-        
-        if curve == 'upper':
-            linestring = self.linestring_upper_log
-        elif curve == 'lower':
-            linestring = self.linestring_lower_log
-
-        # Scale data
-        ls_x = np.array(linestring.xy[0])
-        ls_y = np.array(linestring.xy[1])
-        linestring = LineString((np.vstack((ls_x + np.log10(scale), ls_y))).T)
-
-        if linestring and geometry:
-            i0 = linestring.xy[0][0]
-            t0 = linestring.xy[1][0]
-            i1 = linestring.xy[0][-1]
-            t1 = linestring.xy[1][-1]
-            if direction == 'right':
-                check_geom = Polygon(list(linestring.coords) + 
-                                        [(i1, lim_max), (i0, lim_max)])
-                if i_max:
-                    lim_i_max = min(np.log10(i_max), i1)
-                else:
-                    lim_i_max = i1
-                geom_mask = Polygon([   (lim_min, lim_max), 
-                                        (lim_i_max, lim_max), 
-                                        (lim_i_max, lim_min), 
-                                        (lim_min, lim_min),
-                                        (lim_min, lim_max)  ])
-                geometry_masked = geometry.intersection(geom_mask)
-            elif direction == 'left':
-                check_geom = Polygon(list(linestring.coords) + 
-                                        [(i1, lim_min), 
-                                         (lim_min, lim_min), 
-                                         (lim_min, lim_max), 
-                                         (i0, lim_max)])
-                geometry_masked = geometry
-            return check_geom.contains(geometry_masked)
-        
+        return self.evaluated.contains(geometry, curve, direction, i_max, scale)
 
 ## Get commonly used protection models
         
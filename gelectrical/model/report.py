@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# report
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, copy, datetime, io, math, logging
+from jinja2 import Environment, FileSystemLoader
+from weasyprint import HTML
+
+# local files import
+from .. import misc
+from . import reportpdf
+from .reportgraphs import GraphRenderer
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+
+def export_pdf_report(project, foldername, settings, call_at_exit=None):
+    """Export HTML and PDF reports of project to folder
+    
+        project is expected to provide get_project_fields, loadprofiles and a
+        networkmodel with analysis results set on its elements.
+    """
+    template_path = misc.abs_path("templates")
+    env = Environment(loader=FileSystemLoader(template_path))
+
+    # General variables
+    project_settings = project.get_project_fields()
+    report_settings = project.get_project_fields(page='Reports')
+    export_graphs_flag = report_settings['export_graphs']['value']
+    export_elements_flag = report_settings['export_elements']['value']
+    export_boq_flag = report_settings['export_boq']['value']
+    export_loadprofiles_flag = report_settings['export_loadprofiles']['value']
+    export_ana_flag = report_settings['export_analysis']['value']
+    gen_variables = {'program_version'        : 'v' + misc.PROGRAM_VER,
+                     'project_name'           : project_settings['project_name']['value'],
+                     'drawing_field_approved' : project_settings['drawing_field_approved']['value'],
+                     'drawing_field_dept'     : project_settings['drawing_field_dept']['value'],
+                     'drawing_field_address'  : project_settings['drawing_field_address']['value'].replace('\n','</br>'),
+                     'doc_title': project_settings['project_name']['value'],
+                     'doc_author': project_settings['drawing_field_approved']['value'],
+                     'doc_subject': "Project Report",
+                     'doc_lang': project_settings['drawing_field_lang']['value'],
+                     'doc_creator':misc.PROGRAM_NAME + ' v' + misc.PROGRAM_VER,
+                     'doc_create_date': datetime.datetime.now().astimezone().replace(microsecond=0).isoformat(),
+                     'doc_mod_date': datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()}
+    # Graphs are collected while building tables and rendered together
+    graph_renderer = GraphRenderer()
+    # Icons referenced by tables, class name -> (base64 data, aspect ratio)
+    icon_classes = dict()
+
+    # Elements
+    element_captions = dict()
+    element_refs = dict()
+    element_tables = dict()
+    element_lines = []
+    element_loads = []
+    element_switches = []
+    element_nodes = dict()
+    loadprofile_captions_used = set()
+    project.networkmodel.setup_base_elements()
+    base_elements = project.networkmodel.base_elements
+    # First pass add all required elements
+    for key, model in base_elements.items():
+        if 'ref' in model.fields and model.code not in misc.NON_ELEMENT_CODES:
+            element_captions[key] = model.fields['ref']['value'] + ' - ' + model.name
+            element_refs[key] = model.fields['ref']['value']
+            if export_elements_flag:
+                element_tables[key] = misc.fields_to_table(model.fields, insert_graph=export_graphs_flag, 
+                                                           graph_renderer=graph_renderer, icon_classes=icon_classes)
+        # Lines
+        if model.code in misc.LINE_ELEMENT_CODES:
+            element_lines.append(model)
+        # Loads
+        if model.code in misc.LOAD_ELEMENT_CODES:
+            element_loads.append(model)
+        # Switches
+        if model.code in misc.SWITCH_ELEMENT_CODES:
+            element_switches.append(model)
+        # Nodes
+        if model.code in misc.DISPLAY_ELEMENT_CODES:
+            element_nodes[int(model.fields['ref']['value'])] = model
+        # Loads
+        if model.code in misc.LOADPROFILE_CODES and model.fields['load_profile']['value'] in project.loadprofiles:
+            loadprofile_captions_used.add(model.fields['load_profile']['value'])
+
+    # Second pass for adding assmebly details
+    for key, model in base_elements.items():
+        if model.code == 'element_assembly':
+            assembly_fields = copy.deepcopy(model.fields)
+            children_codes = model.children_codes
+            children_list = []
+            for child_code in children_codes:
+                if child_code in element_refs:
+                    child_ref = element_refs[child_code]
+                    children_list.append(child_ref)
+            children_str = ''
+            for s in children_list:
+                children_str = children_str + ', ' + s
+            children_str = children_str[2:]
+            assembly_fields['children'] = misc.get_field_dict('str', 'Sub-elements', '', children_str, status_inactivate=False)
+            # Add element
+            element_captions[key] = model.fields['ref']['value'] + ' - ' + model.name
+            element_refs[key] = model.fields['ref']['value']
+            if export_elements_flag:
+                element_tables[key] = misc.fields_to_table(assembly_fields, insert_graph=export_graphs_flag, 
+                                                           graph_renderer=graph_renderer, icon_classes=icon_classes)
+    # Sort by reference
+    element_captions = dict(sorted(element_captions.items(), key=lambda item:item[1]))
+    if export_elements_flag:
+        element_tables = {key:element_tables[key] for key in element_captions}
+
+    # BOQ
+    boq_tables = dict()
+    boq_captions = dict()
+    E = misc.ELEMENT_FIELD
+    R = misc.ELEMENT_RESULT
+    P = misc.ELEMENT_PLACEHOLDER
+    if export_boq_flag:
+        # Lines
+        if element_lines:
+            col_codes = ['ref', 'name', 'designation', 'type', 'parallel', 'length_km', 'max_i_ka', 'df', 'in_service', 'loading_percent_max', 'pl_mw_max', 'pl_perc_max']
+            col_captions = ['Reference', 'Name', 'Designation', 'Type', '# Parallel Lines',  'Length', 'Imax', 'Derating Factor', 'In Service ?', '% Loading', 'P loss', '% P loss']
+            code_sources = [E,E,E,E,E,E,E,E,E,R,R,R]
+            table = misc.elements_to_table(element_lines, col_codes, col_captions, code_sources, 'boq_lines',
+                                        show_element_class=True, sum_cols=[10])
+            boq_tables['boq_lines'] = table
+            boq_captions['boq_lines'] = 'Lines'
+        # Loads
+        if element_loads:
+
+            def modifyfunc_load(element, row):
+                scaling = element.fields['scaling']['value']
+                if element.code in ('element_load','element_async_motor_3ph'):
+                    s_kva = round(element.fields['sn_kva']['value']*scaling, 4)
+                    pf = str(round(element.fields['cos_phi']['value'], 2)) + (' lag' if element.fields['mode']['value'] else ' lead')
+                else:
+                    fields = element.get_power_model('')[0][2]
+                    p_a_kw = round(fields['p_a_mw']*1000*scaling, 4)
+                    p_b_kw = round(fields['p_b_mw']*1000*scaling, 4)
+                    p_c_kw = round(fields['p_c_mw']*1000*scaling, 4)
+                    q_a_kvar = round(fields['q_a_mvar']*1000*scaling, 4)
+                    q_b_kvar = round(fields['q_b_mvar']*1000*scaling, 4)
+                    q_c_kvar = round(fields['q_c_mvar']*1000*scaling, 4)
+                    p_kw = p_a_kw + p_b_kw + p_c_kw
+                    q_kvar = q_a_kvar + q_b_kvar + q_c_kvar
+                    row['Sa'] = str(p_a_kw) + '+j' + str(q_a_kvar)
+                    row['Sb'] = str(p_b_kw) + '+j' + str(q_b_kvar)
+                    row['Sc'] = str(p_c_kw) + '+j' + str(q_c_kvar)
+                    s_kva = round(math.sqrt(p_kw**2 + q_kvar**2), 4)
+                    pf = str(round((p_kw/s_kva),2)) + (' lag' if q_kvar > 0 else ' lead')
+                row['Rated power'] = str(s_kva)
+                row['PF'] = pf
+
+            col_codes = ['ref', 'name', 'sn_kva', 'cos_phi', 'sa', 'sb', 'sc', 'in_service', 'load_profile']
+            col_captions = ['Reference', 'Name', 'Rated power', 'PF', 'Sa', 'Sb', 'Sc', 'In Service ?', 'Load Profile']
+            code_sources = [E,E,P,P,P,P,P,E,E]
+            col_units = ['', '', 'kVA', '', 'kVA', 'kVA', 'kVA', '', '']
+            table = misc.elements_to_table(element_loads, col_codes, col_captions, code_sources, 'boq_loads',
+                                        show_element_class=True, modifyfunc=modifyfunc_load, sum_cols=[2],
+                                        col_units=col_units)
+            boq_tables['element_loads'] = table
+            boq_captions['element_loads'] = 'Loads'
+        # Switches
+        if element_switches:
+
+            def modifyfunc_switch(element, row):
+                if row['Line protection curve'] == 'None':
+                    row['Line protection curve'] = ''
+                if row['Ground protection curve'] == 'None':
+                    row['Ground protection curve'] = ''
+
+            col_codes = ['ref', 'name', 'type', 'subtype', 'poles', 'Un', 'In', 
+                        'prot_curve_type', 'prot_0_curve_type', 'closed']
+            col_captions = ['Reference', 'Name', 'Type', 'Sub type', 'Poles', 'Un', 'In',
+                            'Line protection curve', 'Ground protection curve', 'Closed']
+            code_sources = [E,E,E,E,E,E,E,E,E,E]
+            table = misc.elements_to_table(element_switches, col_codes, col_captions, code_sources, 'boq_switches',
+                                        show_element_class=False, modifyfunc=modifyfunc_switch)
+            boq_tables['element_switches'] = table
+            boq_captions['element_switches'] = 'Switches'
+        # Nodes
+        if element_nodes:
+            nodes_sorted_by_name = [element_nodes[x] for x in sorted(element_nodes.keys())]
+            col_codes = ['ref', 'vn_kv', 'delv_perc_max', 'ikss_ka_3ph_max', 'ikss_ka_3ph_min', 'ipss_ka_3ph_max', 'ikss_ka_1ph_max', 'ikss_ka_1ph_min']
+            col_captions = ['Node ID', 'Vn', 'ΔV', 'Isc (sym, max)', 'Isc (sym, min)', 'Isc (pk, max)', 'Isc (L-G, max)', 'Isc (L-G, min)']
+            code_sources = [E,R,R,R,R,R,R,R]
+            table = misc.elements_to_table(nodes_sorted_by_name, col_codes, col_captions, code_sources, 'boq_nodes',
+                                        show_slno=False, show_element_class=False)
+            boq_tables['element_nodes'] = table
+            boq_captions['element_nodes'] = 'Nodes'
+
+    # Load profiles
+    loadprofile_captions = dict()
+    loadprofile_images = dict()
+    if export_loadprofiles_flag:
+        loadprofile_captions = {key:project.loadprofiles[key][0] for key in loadprofile_captions_used}
+        # Sort
+        loadprofile_captions = dict(sorted(loadprofile_captions.items(), key=lambda item:item[1]))
+        # Add images
+        xlim = misc.GRAPH_LOAD_TIME_LIMITS
+        ylim = misc.GRAPH_LOAD_CURRENT_LIMITS
+        xlabel = 'Time (Hr)'
+        ylabel = 'Diversity Factor'
+        params = {}
+        for loadprofile_caption in loadprofile_captions:
+            title, graph_model = project.loadprofiles[loadprofile_caption]
+            loadprofile_images[loadprofile_caption] = graph_renderer.add(xlim, ylim, '', xlabel, ylabel, 
+                                                                         params, graph_model, figsize=(500, 175))
+
+    # Analysis options
+    if (settings['powerflow'] or settings['sc_sym'] or settings['sc_gf']) and export_ana_flag:
+        analysis_flag = True
+    else: 
+        analysis_flag = False
+    ana_opt_table = misc.fields_to_table(project.get_project_fields(page='Simulation'), icon_classes=icon_classes)
+
+    # Analysis results
+    ana_res_captions = dict()
+    ana_res_tables = dict()
+    if analysis_flag: 
+        base_elements = project.networkmodel.base_elements
+        # First pass add all required elements
+        for key, model in base_elements.items():
+            if 'ref' in model.fields and (model.code not in misc.REFERENCE_CODES) and (model.code != 'element_assembly'):
+                if model.res_fields:
+                    table = misc.fields_to_table(model.res_fields, insert_graph=export_graphs_flag, 
+                                                 graph_renderer=graph_renderer, icon_classes=icon_classes)
+                    ana_res_captions[str(key)+'_res'] = model.fields['ref']['value'] + ' - ' + model.name
+                    ana_res_tables[str(key)+'_res'] = table
+        # Sort by reference
+        ana_res_captions = dict(sorted(ana_res_captions.items(), key=lambda item:item[1]))
+        ana_res_tables = {key:ana_res_tables[key] for key in ana_res_captions}
+
+    # Load HTML file    
+    template = env.get_template("report.html")
+    template_vars = {'gen_variables': gen_variables,
+                     'element_captions': element_captions,
+                     'element_tables': element_tables,
+                     'boq_tables': boq_tables,
+                     'boq_captions': boq_captions,
+                     'loadprofile_captions': loadprofile_captions,
+                     'loadprofile_images': loadprofile_images,
+                     'analysis_flag': analysis_flag,
+                     'export_elements_flag': export_elements_flag,
+                     'export_boq_flag': export_boq_flag,
+                     'export_loadprofiles_flag': export_loadprofiles_flag,
+                     'ana_opt_table': ana_opt_table,
+                     'ana_res_tables': ana_res_tables,
+                     'ana_res_captions': ana_res_captions
+                    }
+    # Stream HTML to file, table rows are generated and graphs and icons are
+    # collected while the template is rendered
+    filename_html = misc.posix_path(foldername, 'report.html')
+    filename_html_part = filename_html + '.part'
+    with open(filename_html_part, 'w', encoding='utf-8') as fp:
+        fp.writelines(template.generate(template_vars))
+    # Render graphs and insert in report
+    graph_renderer.render()
+    graph_renderer.substitute_file(filename_html_part, filename_html)
+    os.remove(filename_html_part)
+
+    # Load CSS file
+    template_css = env.get_template("report.css")
+    icon_css = misc.get_icon_css(icon_classes)
+
+    def get_css(report_section=None, page_offset=1):
+        template_vars_css = {'report_font': misc.REPORT_FONT_FACE,
+                             'report_font_size': misc.REPORT_FONT_SIZE,
+                             'report_section': report_section,
+                             'page_offset': page_offset}
+        # Icons used in tables are embedded once as CSS classes
+        return template_css.render(template_vars_css) + '\n' + icon_css + '\n'
+
+    css_out = get_css()
+
+    # Render HTML, PDF
+    filename_pdf = misc.posix_path(foldername, 'report.pdf')
+    filename_css = misc.posix_path(foldername, 'report.css')
+    with open(filename_css, 'w') as fp:
+        fp.write(css_out)
+    if reportpdf.can_render_sections(filename_html):
+        # Large reports are rendered section wise in worker processes
+        reportpdf.render_report_sections(filename_html, filename_pdf, foldername, get_css)
+    else:
+        css_obj = io.BytesIO(bytes(css_out, 'utf-8'))
+        HTML(filename=filename_html, base_url=foldername).write_pdf(filename_pdf, stylesheets=[css_obj])
+
+    if call_at_exit:
+        call_at_exit()
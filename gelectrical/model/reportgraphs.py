@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# reportgraphs
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, re, json, base64, hashlib, logging, multiprocessing
+import concurrent.futures
+import numpy as np
+
+# local files import
+from .. import misc
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Version of rendered graph format, part of cache key
+GRAPH_CACHE_VER = 1
+# Maximum number of files retained in graph cache directory
+GRAPH_CACHE_MAX_FILES = 5000
+# Minimum number of graphs to be rendered for using worker processes
+GRAPH_PARALLEL_MIN = 4
+# Maximum number of worker processes used for rendering graphs
+GRAPH_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Placeholder inserted in report for graph images
+GRAPH_PLACEHOLDER = '<!--graph:{}-->'
+GRAPH_PLACEHOLDER_REGEX = re.compile(r'<!--graph:([0-9a-f]{40})-->')
+
+
+def json_default(obj):
+    if isinstance(obj, range):
+        return list(obj)
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError('Object of type {} is not serialisable'.format(type(obj).__name__))
+
+def get_graph_key(job):
+    """Hash of graph job"""
+    text = json.dumps(job, sort_keys=True, default=json_default)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def render_graph(job):
+    """Render graph job to SVG
+
+        Runs in worker processes, so report fonts are taken from job.
+    """
+    from .graphimage import GraphImage
+    misc.REPORT_GRAPH_FONT_FACE, misc.REPORT_GRAPH_FONT_SIZE = job['font']
+    graph_image = GraphImage(job['xlim'], job['ylim'], job['title'], job['xlabel'], job['ylabel'], 
+                             graph_params=job['graph_params'])
+    graph_image.add_plots(job['graph_models'])
+    return graph_image.get_image_data(figsize=tuple(job['figsize']))
+
+
+class GraphRenderer:
+    """Collect graphs of a report and render them together
+
+        Graphs added are replaced by placeholders in the report, which are
+        substituted once all graphs are rendered. Identical graphs are rendered
+        once. Rendered graphs are cached on disk keyed by hash of graph model,
+        limits, labels, figure size and fonts.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = misc.GRAPH_CACHE_DIR if cache_dir is None else cache_dir
+        self.jobs = dict()  # key -> job
+        self.images = dict()  # key -> html image tag
+
+    def add(self, xlim, ylim, title, xlabel, ylabel, graph_params, graph_models, figsize=(200, 200)):
+        """Add graph and return placeholder for it"""
+        job = {'version': GRAPH_CACHE_VER,
+               'xlim': xlim,
+               'ylim': ylim,
+               'title': title,
+               'xlabel': xlabel,
+               'ylabel': ylabel,
+               'graph_params': graph_params,
+               'graph_models': graph_models,
+               'figsize': figsize,
+               'font': (misc.REPORT_GRAPH_FONT_FACE, misc.REPORT_GRAPH_FONT_SIZE)}
+        key = get_graph_key(job)
+        if key not in self.jobs:
+            self.jobs[key] = job
+        return GRAPH_PLACEHOLDER.format(key)
+
+    def get_cache_path(self, key):
+        return misc.posix_path(self.cache_dir, key + '.svg')
+
+    def read_cache(self, key):
+        if self.cache_dir:
+            path = self.get_cache_path(key)
+            try:
+                with open(path, 'rb') as fp:
+                    data = fp.read()
+                os.utime(path)  # Mark as recently used
+                return data
+            except OSError:
+                pass
+        return None
+
+    def write_cache(self, key, data):
+        if self.cache_dir:
+            path = self.get_cache_path(key)
+            temp_path = path + '.' + str(os.getpid()) + '.tmp'
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(temp_path, 'wb') as fp:
+                    fp.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                log.warning('GraphRenderer - write_cache - error writing ' + path)
+
+    def prune_cache(self):
+        """Remove least recently used graphs exceeding GRAPH_CACHE_MAX_FILES"""
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            entries = []
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith('.svg'):
+                    path = misc.posix_path(self.cache_dir, filename)
+                    try:
+                        entries.append((os.stat(path).st_mtime, path))
+                    except OSError:
+                        pass
+            if len(entries) > GRAPH_CACHE_MAX_FILES:
+                entries.sort()
+                for mtime, path in entries[:len(entries) - GRAPH_CACHE_MAX_FILES]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def render(self):
+        """Render graphs not available in cache"""
+        rendered = dict()
+        pending = dict()
+        for key, job in self.jobs.items():
+            if key not in self.images:
+                data = self.read_cache(key)
+                if data is None:
+                    pending[key] = job
+                else:
+                    rendered[key] = data
+        log.info('GraphRenderer - render - {} graphs, {} from cache'.format(len(self.jobs), len(rendered)))
+        
+        if len(pending) >= GRAPH_PARALLEL_MIN:
+            try:
+                # Use spawned workers since forking a process running Gtk is unsafe
+                mp_context = multiprocessing.get_context('spawn')
+                with concurrent.futures.ProcessPoolExecutor(max_workers=GRAPH_MAX_WORKERS, mp_context=mp_context) as executor:
+                    futures = {executor.submit(render_graph, job): key for key, job in pending.items()}
+                    for future in concurrent.futures.as_completed(futures):
+                        key = futures[future]
+                        rendered[key] = future.result()
+                        self.write_cache(key, rendered[key])
+            except Exception:
+                log.exception('GraphRenderer - render - error rendering in worker processes, rendering serially')
+        for key, job in pending.items():
+            if key not in rendered:
+                rendered[key] = render_graph(job)
+                self.write_cache(key, rendered[key])
+        
+        for key, data in rendered.items():
+            data_uri = base64.b64encode(data).decode('ascii')
+            self.images[key] = "<img src='data:image/svg+xml;base64,{}'/>".format(data_uri)
+        if pending:
+            self.prune_cache()
+
+    def substitute(self, text):
+        """Replace graph placeholders in text by rendered images"""
+        return GRAPH_PLACEHOLDER_REGEX.sub(lambda match: self.images.get(match.group(1), ''), text)
+
+    def substitute_file(self, filename_in, filename_out):
+        """Copy text file replacing graph placeholders line by line"""
+        with open(filename_in, 'r', encoding='utf-8') as fp_in, open(filename_out, 'w', encoding='utf-8') as fp_out:
+            for line in fp_in:
+                fp_out.write(self.substitute(line))
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# reportpdf
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import os, re, html, logging, tempfile, shutil, multiprocessing
+import concurrent.futures
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+# local files import
+from .. import misc
+from .export import EXPORT_MAX_WORKERS
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Minimum size of report html in bytes for rendering sections in parallel
+REPORT_PARALLEL_MIN_SIZE = 2*1024*1024
+# Articles of report rendered together as front matter
+REPORT_FRONT_ARTICLES = ('cover', 'contents')
+# Name of front matter section
+REPORT_FRONT_SECTION = 'front'
+# Regular expressions for article boundaries in report.html
+REPORT_ARTICLE_START_REGEX = re.compile(r'^\s*<article id="([\w-]+)">\s*$')
+REPORT_ARTICLE_END_REGEX = re.compile(r'^\s*</article>\s*$')
+REPORT_STYLESHEET_REGEX = re.compile(r'^\s*<link rel="stylesheet"')
+# Regular expression for table of contents links
+REPORT_TOC_LINK_REGEX = re.compile(r'<a href="#([^"]*)">')
+
+
+def split_report(filename_html, temp_dir):
+    """Split report html into section files
+
+        Each article of the report is written as a separate html document sharing
+        the head of the report. Cover and contents are written together as the
+        front section. The linked stylesheet is left out since sections are
+        rendered with their own stylesheet.
+
+        Returns list of (section name, filename) in document order.
+    """
+    head = []
+    sections = []
+    files = dict()
+    fp_out = None
+    with open(filename_html, 'r', encoding='utf-8') as fp:
+        for line in fp:
+            if fp_out is None:
+                match = REPORT_ARTICLE_START_REGEX.match(line)
+                if match:
+                    article = match.group(1)
+                    name = REPORT_FRONT_SECTION if article in REPORT_FRONT_ARTICLES else article
+                    if name in files:
+                        fp_out = files[name]
+                    else:
+                        filename = misc.posix_path(temp_dir, 'section_{}.html'.format(len(sections)))
+                        fp_out = open(filename, 'w', encoding='utf-8')
+                        fp_out.writelines(head)
+                        files[name] = fp_out
+                        sections.append((name, filename))
+                    fp_out.write(line)
+                elif not sections and not REPORT_STYLESHEET_REGEX.match(line):
+                    head.append(line)
+            else:
+                fp_out.write(line)
+                if REPORT_ARTICLE_END_REGEX.match(line):
+                    fp_out = None
+    for fp_out in files.values():
+        fp_out.write('  </body>\n</html>\n')
+        fp_out.close()
+    return sections
+
+def render_section(filename_html, filename_pdf, base_url, css):
+    """Render html section to PDF
+
+        Runs in a worker process.
+
+        Returns dict with page sizes as 'pages' and page index of anchors as 'anchors'.
+    """
+    from weasyprint import HTML, CSS
+    document = HTML(filename=filename_html, base_url=base_url).render(stylesheets=[CSS(string=css)])
+    pages = [(page.width, page.height) for page in document.pages]
+    anchors = dict()
+    for index, page in enumerate(document.pages):
+        for anchor in page.anchors:
+            anchors.setdefault(anchor, index)
+    document.write_pdf(filename_pdf)
+    return {'pages': pages, 'anchors': anchors}
+
+def set_toc_pages(filename_in, filename_out, page_numbers):
+    """Copy front section adding page numbers of contents links as data-page"""
+    def add_page(match):
+        anchor = html.unescape(match.group(1))
+        if anchor in page_numbers:
+            return '<a href="#{}" data-page="{}">'.format(match.group(1), page_numbers[anchor])
+        return match.group(0)
+
+    with open(filename_in, 'r', encoding='utf-8') as fp_in, open(filename_out, 'w', encoding='utf-8') as fp_out:
+        for line in fp_in:
+            fp_out.write(REPORT_TOC_LINK_REGEX.sub(add_page, line))
+
+def write_page_numbers(filename_html, pages):
+    """Write html document with one empty page per body page for numbering"""
+    with open(filename_html, 'w', encoding='utf-8') as fp:
+        fp.write('<html>\n  <head>\n    <meta charset="utf-8">\n  </head>\n  <body>\n')
+        for index, (width, height) in enumerate(pages):
+            page = 'landscape' if width > height else 'portrait'
+            page_break = ' page-break-before: always;' if index else ''
+            fp.write('    <div style="page: {};{}"></div>\n'.format(page, page_break))
+        fp.write('  </body>\n</html>\n')
+
+def merge_sections(filename_pdf, front_pdf, body_pdfs, numbers_pdf):
+    """Merge section PDFs and overlay page numbers on body pages"""
+    writer = pypdf.PdfWriter()
+    front_reader = pypdf.PdfReader(front_pdf)
+    num_front = len(front_reader.pages)
+    writer.append(front_reader)
+    front_dests = set(str(name) for name in writer.get_named_dest_root()[::2])
+    for filename in body_pdfs:
+        writer.append(filename)
+    # Links of contents to other sections are dropped by append since their
+    # destinations are not known at that point, add them back
+    named_dests = set(str(name) for name in writer.get_named_dest_root()[::2])
+    for index, page in enumerate(front_reader.pages):
+        for annot in page.get('/Annots', []):
+            annot = annot.get_object()
+            dest = annot.get('/Dest')
+            if isinstance(dest, str) and dest in named_dests and dest not in front_dests:
+                writer_page = writer.pages[index]
+                link = annot.clone(writer, ignore_fields=('/P',))
+                link[pypdf.generic.NameObject('/P')] = writer_page.indirect_reference
+                if '/Annots' not in writer_page:
+                    writer_page[pypdf.generic.NameObject('/Annots')] = pypdf.generic.ArrayObject()
+                writer_page['/Annots'].append(link.indirect_reference)
+    if numbers_pdf:
+        numbers_reader = pypdf.PdfReader(numbers_pdf)
+        for index, numbers_page in enumerate(numbers_reader.pages):
+            if num_front + index < len(writer.pages):
+                writer.pages[num_front + index].merge_page(numbers_page)
+    if front_reader.metadata:
+        writer.add_metadata(front_reader.metadata)
+    with open(filename_pdf, 'wb') as fp:
+        writer.write(fp)
+
+def can_render_sections(filename_html):
+    """Return True if report is large enough to be rendered in sections"""
+    return pypdf is not None and os.path.getsize(filename_html) >= REPORT_PARALLEL_MIN_SIZE
+
+def render_report_sections(filename_html, filename_pdf, base_url, get_css):
+    """Render report sections to PDF in worker processes and merge them
+
+        Sections are rendered without page numbers. Page numbers of body pages
+        are rendered as a separate overlay once page counts of all sections
+        are known, and the front section is rendered again with page numbers of
+        contents. Bookmarks and links are carried over while merging.
+
+        Arguments:
+            filename_html: Report html file
+            filename_pdf: Output PDF filename
+            base_url: Base url for resolving resources
+            get_css: Called as get_css(report_section, page_offset) to get report stylesheet
+    """
+    temp_dir = tempfile.mkdtemp(prefix='gelectrical_report_')
+    try:
+        sections = split_report(filename_html, temp_dir)
+        front = [filename for name, filename in sections if name == REPORT_FRONT_SECTION]
+        body = [(name, filename) for name, filename in sections if name != REPORT_FRONT_SECTION]
+        if not front:
+            raise ValueError('Report front section not found')
+        front_html = front[0]
+        front_pdf = misc.posix_path(temp_dir, 'front.pdf')
+        body_pdfs = [filename[:-len('.html')] + '.pdf' for name, filename in body]
+        body_css = get_css('body', 1)
+        # Use spawned workers since forking a process running Gtk is unsafe
+        mp_context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=EXPORT_MAX_WORKERS, mp_context=mp_context) as executor:
+            front_future = executor.submit(render_section, front_html, front_pdf, base_url, get_css('front', 1))
+            body_futures = [executor.submit(render_section, filename, filename_pdf_part, base_url, body_css)
+                            for (name, filename), filename_pdf_part in zip(body, body_pdfs)]
+            num_front = len(front_future.result()['pages'])
+            body_results = [future.result() for future in body_futures]
+
+        # Page numbers of body pages and contents links
+        page_numbers = dict()
+        body_pages = []
+        for result in body_results:
+            for anchor, index in result['anchors'].items():
+                page_numbers.setdefault(anchor, num_front + len(body_pages) + index + 1)
+            body_pages += result['pages']
+        numbers_pdf = None
+        if body_pages:
+            numbers_html = misc.posix_path(temp_dir, 'numbers.html')
+            numbers_pdf = misc.posix_path(temp_dir, 'numbers.pdf')
+            write_page_numbers(numbers_html, body_pages)
+            render_section(numbers_html, numbers_pdf, base_url, get_css('numbers', num_front + 1))
+
+        # Render front with contents page numbers
+        front_toc_html = misc.posix_path(temp_dir, 'front_toc.html')
+        set_toc_pages(front_html, front_toc_html, page_numbers)
+        result = render_section(front_toc_html, front_pdf, base_url, get_css('front', 1))
+        if len(result['pages']) != num_front:
+            log.warning('render_report_sections - Contents page count changed, page numbers may be offset')
+
+        merge_sections(filename_pdf, front_pdf, body_pdfs, numbers_pdf)
+        log.info('render_report_sections - {} sections exported to {}'.format(len(sections), filename_pdf))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
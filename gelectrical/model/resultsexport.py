@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# resultsexport
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+
+import os, csv, numbers, logging
+import openpyxl
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# local files import
+from .. import misc
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Maximum number of rows and columns of a worksheet
+RESULTS_XLSX_MAX_ROWS = 1048576
+RESULTS_XLSX_MAX_COLUMNS = 16384
+# Number of rows per batch written to Parquet files
+RESULTS_PARQUET_BATCH_ROWS = 65536
+# Column captions of result tables
+RESULTS_ELEMENT_CAPTIONS = ['PAGE', 'REF', 'ELEMENT', 'KIND', 'CODE', 'DESCRIPTION', 'VALUE', 'UNIT']
+RESULTS_NODE_CAPTIONS = ['NODE', 'CODE', 'DESCRIPTION', 'VALUE', 'UNIT']
+RESULTS_SERIES_CAPTIONS = ['REF', 'CODE', 'SERIES', 'UNIT', 'TIME', 'VALUE']
+# Table names used for sheets and file name suffixes
+RESULTS_TABLES = ('elements', 'nodes', 'time_series')
+
+
+## Row generators
+#
+# Rows are generated from the fields and results held by elements, so no
+# intermediate copy of the results is made while writing.
+
+def get_cell_value(value):
+    """Return value if it fits in a table cell, else None"""
+    if isinstance(value, (str, bool, numbers.Number)):
+        return value
+    return None
+
+def get_ref(element):
+    return element.fields['ref']['value'] if 'ref' in element.fields else ''
+
+def iter_elements(project):
+    """Yield (page name, element) for elements of project in page order"""
+    for drawing_model in project.drawing_models:
+        page = drawing_model.get_sheet_name()
+        for element in drawing_model.elements:
+            yield page, element
+
+def iter_field_rows(fields):
+    """Yield (code, caption, value, unit) of fields with scalar values"""
+    for code, field in fields.items():
+        if field['type'] != 'heading' and field.get('status_enable', True):
+            value = get_cell_value(field['value'])
+            if value is not None:
+                yield code, field['caption'], value, field['unit']
+
+def iter_result_sources(project):
+    """Yield (ref, res_fields) of elements followed by network nodes
+
+        Nodes are shown on each page they appear in, results of a node are
+        yielded once.
+    """
+    nodes = []
+    node_refs = set()
+    for page, element in iter_elements(project):
+        if element.res_fields:
+            if element.code in misc.DISPLAY_ELEMENT_CODES:
+                ref = get_ref(element)
+                if ref not in node_refs:
+                    node_refs.add(ref)
+                    nodes.append(('Node ' + ref, element.res_fields))
+            elif element.code not in misc.NON_ELEMENT_CODES:
+                yield get_ref(element), element.res_fields
+    yield from nodes
+
+def iter_element_rows(project):
+    """Yield rows of element fields and scalar results"""
+    for page, element in iter_elements(project):
+        if element.code not in misc.NON_ELEMENT_CODES:
+            ref = get_ref(element)
+            for kind, fields in (('Field', element.fields), ('Result', element.res_fields)):
+                for code, caption, value, unit in iter_field_rows(fields):
+                    yield [page, ref, element.name, kind, code, caption, value, unit]
+
+def iter_node_rows(project):
+    """Yield rows of scalar node results"""
+    node_refs = set()
+    for page, element in iter_elements(project):
+        if element.code in misc.DISPLAY_ELEMENT_CODES and element.res_fields:
+            ref = get_ref(element)
+            if ref not in node_refs:
+                node_refs.add(ref)
+                for code, caption, value, unit in iter_field_rows(element.res_fields):
+                    yield [ref, code, caption, value, unit]
+
+def iter_series(project):
+    """Yield (ref, code, title, unit, xval, yval) of time series results"""
+    for ref, res_fields in iter_result_sources(project):
+        for code, field in res_fields.items():
+            if field['type'] == 'graph' and isinstance(field['value'], (list, tuple)):
+                title, models = field['value']
+                for model in models:
+                    if 'xval' in model and 'yval' in model:
+                        yield ref, code, model['title'], field['unit'], model['xval'], model['yval']
+
+def iter_series_rows(project):
+    """Yield rows of time series with one row per series and time step"""
+    for ref, code, title, unit, xval, yval in iter_series(project):
+        for x, y in zip(xval, yval):
+            yield [ref, code, title, unit, x, y]
+
+def get_series_captions(series):
+    """Column captions of time series with one column per series"""
+    captions = ['TIME']
+    for ref, code, title, unit, xval, yval in series:
+        caption = '{} | {}'.format(ref, title)
+        if unit:
+            caption += ' (' + unit + ')'
+        captions.append(caption)
+    return captions
+
+def iter_series_columns(series):
+    """Yield rows of time series with one row per time step and one column per series"""
+    xval = max((item[4] for item in series), key=len, default=[])
+    for index, x in enumerate(xval):
+        yield [x] + [item[5][index] if index < len(item[5]) else None for item in series]
+
+
+## Writers
+
+def write_sheet(workbook, title, captions, rows):
+    """Write rows to write only workbook, continuing on new sheets if a sheet is full"""
+    sheet = None
+    num_rows = 0
+    part = 0
+    for row in rows:
+        if sheet is None or num_rows >= RESULTS_XLSX_MAX_ROWS:
+            part += 1
+            sheet = workbook.create_sheet(title if part == 1 else '{} ({})'.format(title, part))
+            sheet.append(captions)
+            num_rows = 1
+        sheet.append(row)
+        num_rows += 1
+    if sheet is None:
+        sheet = workbook.create_sheet(title)
+        sheet.append(captions)
+
+def export_results_xlsx(project, filename, progress_callback=None):
+    """Export fields and results of project to a single XLSX workbook
+
+        Workbook is written in openpyxl write only mode. Time series are written
+        with one column per series since one row per series and time step would
+        overrun the row limit of a sheet for large projects.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    write_sheet(workbook, 'Elements', RESULTS_ELEMENT_CAPTIONS, iter_element_rows(project))
+    if progress_callback:
+        progress_callback(0.2)
+    write_sheet(workbook, 'Nodes', RESULTS_NODE_CAPTIONS, iter_node_rows(project))
+    if progress_callback:
+        progress_callback(0.3)
+    series = list(iter_series(project))
+    width = RESULTS_XLSX_MAX_COLUMNS - 1
+    chunks = [series[index:index+width] for index in range(0, len(series), width)] or [[]]
+    for slno, chunk in enumerate(chunks):
+        title = 'Time Series' if slno == 0 else 'Time Series ({})'.format(slno + 1)
+        write_sheet(workbook, title, get_series_captions(chunk), iter_series_columns(chunk))
+        if progress_callback:
+            progress_callback(0.3 + 0.6*(slno + 1)/len(chunks))
+    workbook.save(filename)
+    if progress_callback:
+        progress_callback(1)
+
+def get_table_filenames(filename):
+    """Return filename of each result table for CSV and Parquet exports"""
+    base, ext = os.path.splitext(filename)
+    return [base + '_' + table + ext for table in RESULTS_TABLES]
+
+def export_results_csv(project, filename, progress_callback=None):
+    """Export fields and results of project to CSV files, one per table"""
+    tables = ((RESULTS_ELEMENT_CAPTIONS, iter_element_rows(project)),
+              (RESULTS_NODE_CAPTIONS, iter_node_rows(project)),
+              (RESULTS_SERIES_CAPTIONS, iter_series_rows(project)))
+    for slno, (table_filename, (captions, rows)) in enumerate(zip(get_table_filenames(filename), tables)):
+        with open(table_filename, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(captions)
+            writer.writerows(rows)
+        if progress_callback:
+            progress_callback((slno + 1)/len(tables))
+
+def write_parquet(filename, schema, rows):
+    """Write rows to Parquet file in batches of RESULTS_PARQUET_BATCH_ROWS"""
+
+    def write_batch(writer, batch):
+        columns = list(zip(*batch)) if batch else [[] for field in schema]
+        arrays = [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)]
+        writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+
+    with pyarrow.parquet.ParquetWriter(filename, schema) as writer:
+        batch = []
+        written = False
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= RESULTS_PARQUET_BATCH_ROWS:
+                write_batch(writer, batch)
+                batch = []
+                written = True
+        if batch or not written:
+            write_batch(writer, batch)
+
+def export_results_parquet(project, filename, progress_callback=None):
+    """Export fields and results of project to Parquet files, one per table
+
+        Values of element fields and node results are of mixed type and are
+        stored as text.
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required for exporting results to Parquet')
+
+    def get_schema(captions, float_captions=()):
+        return pyarrow.schema([(caption, pyarrow.float64() if caption in float_captions else pyarrow.string())
+                               for caption in captions])
+
+    def as_text(rows):
+        for row in rows:
+            yield [None if value is None else str(value) for value in row]
+
+    tables = ((get_schema(RESULTS_ELEMENT_CAPTIONS), as_text(iter_element_rows(project))),
+              (get_schema(RESULTS_NODE_CAPTIONS), as_text(iter_node_rows(project))),
+              (get_schema(RESULTS_SERIES_CAPTIONS, ('TIME', 'VALUE')), iter_series_rows(project)))
+    for slno, (table_filename, (schema, rows)) in enumerate(zip(get_table_filenames(filename), tables)):
+        write_parquet(table_filename, schema, rows)
+        if progress_callback:
+            progress_callback((slno + 1)/len(tables))
+
+def export_results(project, filename, progress_callback=None):
+    """Export element fields, node results and time series of project
+
+        Format is selected from the file extension. XLSX exports are written to
+        a single workbook. CSV and Parquet exports are written as one file per
+        table named <filename>_<table>.<ext>.
+
+        Arguments:
+            project: ProjectModel or export.ExportProject with analysis results set on elements
+            filename: Output filename with extension .xlsx, .csv or .parquet
+            progress_callback: Called as progress_callback(fraction)
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.xlsx':
+        export_results_xlsx(project, filename, progress_callback)
+    elif ext == '.csv':
+        export_results_csv(project, filename, progress_callback)
+    elif ext == '.parquet':
+        export_results_parquet(project, filename, progress_callback)
+    else:
+        raise ValueError('Unsupported results export format - ' + ext)
+    log.info('export_results - results exported to ' + filename)
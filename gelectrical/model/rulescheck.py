@@ -27,6 +27,7 @@ import logging, math
 # local files import
 from .. import misc
 from ..misc import FieldDict, Element
+from . import protection
 # Get logger object
 log = logging.getLogger(__name__)
 
@@ -169,6 +170,23 @@ def rules_check(network, sim_settings, rules_settings, rules):
             ex: "e.f.i_ka + e.f.i_ka_max"
     """
 
+    results_dict_pass = dict()
+    results_dict_fail = dict()
+    ss = FieldDict(sim_settings)
+    sr = FieldDict(rules_settings)
+
+    # Cache protection curve containment checks for the run
+    protection.start_contains_cache()
+    try:
+        _rules_check(network, rules, ss, sr, results_dict_pass, results_dict_fail)
+    finally:
+        protection.stop_contains_cache()
+
+    return results_dict_pass, results_dict_fail
+
+def _rules_check(network, rules, ss, sr, results_dict_pass, results_dict_fail):
+    """Evaluate rules over network elements and fill results"""
+
     def eval_(expression_, dict_file):
         """Fail safe eval function"""
         try:
@@ -176,11 +194,6 @@ def rules_check(network, sim_settings, rules_settings, rules):
         except:
             return None
 
-    results_dict_pass = dict()
-    results_dict_fail = dict()
-    ss = FieldDict(sim_settings)
-    sr = FieldDict(rules_settings)
-
     for eid, element in network.base_elements.items():
         cur_element_var = Element(element)
 
@@ -285,9 +298,6 @@ def rules_check(network, sim_settings, rules_settings, rules):
                         results_dict_pass[rule_caption] = set()
                     results_dict_pass[rule_caption].add(eid)
 
-
-    return results_dict_pass, results_dict_fail
-
 def electrical_rules_check(network, sim_settings, rules_settings):
     """Helper function to call electrical rules check"""
     results_dict_pass, results_dict_fail = rules_check(network, sim_settings, rules_settings, electrical_rules)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# spatialindex
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+import logging
+
+# local files import
+from .. import misc
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Size of grid cell in points
+SPATIAL_INDEX_CELL = 8*misc.GRID_WIDTH
+# Padding added to element bounds to cover overloaded overlap checks
+SPATIAL_INDEX_PAD = 2*misc.M
+
+
+class SpatialIndex:
+    """Uniform grid index of element bounds and ports for hit testing
+
+        Queries return candidate elements whose padded bounds or ports fall in
+        the grid cells covered by the query rectangle. Exact checks are left to
+        the element's check_overlap and check_overlap_ports.
+    """
+
+    def __init__(self, cell_size=SPATIAL_INDEX_CELL):
+        self.cell_size = cell_size
+        self.entries = dict()  # id(element) -> (element, key, bound cells, port cells)
+        self.cells = dict()  # (i,j) -> {id(element): element}
+        self.port_cells = dict()  # (i,j) -> {id(element): element}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, element):
+        return id(element) in self.entries
+
+    def get_key(self, element):
+        """Geometry signature of element"""
+        return (element.get_dimensions(), tuple(tuple(port) for port in element.get_ports_global()))
+
+    def get_cells(self, x, y, w, h):
+        """Cells covered by rectangle"""
+        cell = self.cell_size
+        x0, x1 = (x, x + w) if w >= 0 else (x + w, x)
+        y0, y1 = (y, y + h) if h >= 0 else (y + h, y)
+        cells = []
+        for i in range(int(x0 // cell), int(x1 // cell) + 1):
+            for j in range(int(y0 // cell), int(y1 // cell) + 1):
+                cells.append((i,j))
+        return cells
+
+    def add(self, element, key=None):
+        if id(element) in self.entries:
+            self.remove(element)
+        if key is None:
+            key = self.get_key(element)
+        (x, y, w, h), ports = key
+        pad = SPATIAL_INDEX_PAD
+        bound_cells = self.get_cells(x - pad, y - pad, w + 2*pad, h + 2*pad)
+        port_cells = set()
+        for port in ports:
+            port_cells.update(self.get_cells(port[0], port[1], 0, 0))
+        for cell in bound_cells:
+            self.cells.setdefault(cell, dict())[id(element)] = element
+        for cell in port_cells:
+            self.port_cells.setdefault(cell, dict())[id(element)] = element
+        self.entries[id(element)] = (element, key, bound_cells, port_cells)
+
+    def remove(self, element):
+        entry = self.entries.pop(id(element), None)
+        if entry:
+            element, key, bound_cells, port_cells = entry
+            for cells, element_cells in ((self.cells, bound_cells), (self.port_cells, port_cells)):
+                for cell in element_cells:
+                    items = cells.get(cell)
+                    if items is not None:
+                        items.pop(id(element), None)
+                        if not items:
+                            del cells[cell]
+
+    def update(self, element):
+        """Re-index element if its geometry changed"""
+        key = self.get_key(element)
+        entry = self.entries.get(id(element))
+        if entry is None or entry[1] != key:
+            self.add(element, key)
+
+    def clear(self):
+        self.entries = dict()
+        self.cells = dict()
+        self.port_cells = dict()
+
+    def rebuild(self, elements):
+        self.clear()
+        for element in elements:
+            self.add(element)
+
+    def query(self, x, y, w=0, h=0):
+        """Return elements with bounds possibly overlapping rectangle"""
+        return self._query(self.cells, x, y, w, h)
+
+    def query_ports(self, x, y, w=0, h=0):
+        """Return elements with ports possibly inside rectangle"""
+        return self._query(self.port_cells, x, y, w, h)
+
+    def _query(self, cells, x, y, w, h):
+        result = dict()
+        for cell in self.get_cells(x, y, w, h):
+            items = cells.get(cell)
+            if items:
+                result.update(items)
+        return list(result.values())
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# server
+#
+#  Copyright 2020 Manu Varkey <manuvarkey@gmail.com>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+
+# Local JSON-RPC 2.0 service running analysis for other programs
+#
+# Usage:
+#     python -m gelectrical.server --port 8765
+#
+# Requests are posted as JSON to the service, for example
+#     {"jsonrpc": "2.0", "id": 1, "method": "short_circuit",
+#      "params": {"project": "<base64 of .gepro file>", "fault": "1ph"}}
+#
+# Methods:
+#     powerflow     - params: project or network, method (normal, diversity, timeseries)
+#     short_circuit - params: project or network, fault (3ph, 1ph), case (max, min)
+#                     and lv_tol_percent for network
+#     rules_check   - params: project
+#     status        - Service and cache statistics
+#
+# project is a project archive encoded as base64 and network is a pandapower
+# network as exported by the program, as json text or object. Analysis of
+# projects accepts diagnostics (default true) and series (default false) for
+# returning time series results.
+
+import io, os, sys, json, math, base64, binascii, logging, argparse, threading, traceback, multiprocessing
+import http.server
+import concurrent.futures
+from collections import OrderedDict
+import numpy as np
+
+# local files import
+from . import misc, cli
+from .model import projectfile, export, analysisworker, exportjobs, resultsexport
+from .model.rulescheck import electrical_rules_check
+
+# Get logger object
+log = logging.getLogger(__name__)
+
+# Default address of service, only local connections are served by default
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+# Number of worker processes running analysis
+SERVER_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Maximum number of results held in cache
+SERVER_CACHE_SIZE = 64
+# Maximum size of request body in bytes
+SERVER_MAX_REQUEST_SIZE = 128*1024*1024
+# JSON-RPC error codes
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_INTERNAL_ERROR = -32603
+RPC_ANALYSIS_ERROR = -32000
+# Analysis methods
+SERVER_METHODS = ('powerflow', 'short_circuit', 'rules_check')
+# Keys of rules check results
+SERVER_RULES_FAILED = 'Electrical Rules Check - Failed'
+SERVER_RULES_PASSED = 'Electrical Rules Check - Passed'
+# Result tables of pandapower network returned for each method
+SERVER_NETWORK_TABLES = {'powerflow': ('res_bus', 'res_line', 'res_trafo', 'res_trafo3w', 'res_impedance',
+                                       'res_switch', 'res_load', 'res_sgen', 'res_gen', 'res_ext_grid',
+                                       'res_shunt', 'res_ward'),
+                         'short_circuit': ('res_bus_sc', 'res_line_sc', 'res_trafo_sc', 'res_trafo3w_sc',
+                                           'res_ext_grid_sc', 'res_gen_sc', 'res_sgen_sc')}
+
+
+class RPCError(Exception):
+    """Error returned to client as JSON-RPC error object"""
+
+    def __init__(self, code, message, data=None):
+        super().__init__(code, message, data)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def get_error(self):
+        error = {'code': self.code, 'message': self.message}
+        if self.data is not None:
+            error['data'] = self.data
+        return error
+
+
+class ResultCache:
+    """Bounded LRU cache of analysis results keyed by request hash"""
+
+    def __init__(self, maxsize=SERVER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.store)
+
+    def get(self, key):
+        if key in self.store:
+            self.store.move_to_end(key)
+            self.hits += 1
+            return self.store[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.store[key] = value
+        self.store.move_to_end(key)
+        while len(self.store) > self.maxsize:
+            self.store.popitem(last=False)
+
+    def clear(self):
+        self.store.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+## Worker process
+
+def get_json_value(value):
+    """Return value with numpy types converted and non finite numbers as None"""
+    if isinstance(value, dict):
+        return {str(key): get_json_value(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [get_json_value(item) for item in value]
+    elif isinstance(value, np.ndarray):
+        return get_json_value(value.tolist())
+    elif isinstance(value, np.generic):
+        return get_json_value(value.item())
+    elif isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def get_fields_dict(fields):
+    """Scalar fields as {code: {'caption', 'value', 'unit'}}"""
+    return {code: {'caption': caption, 'value': value, 'unit': unit}
+            for code, caption, value, unit in resultsexport.iter_field_rows(fields)}
+
+def get_diagnostics(results):
+    """Diagnostic results as list of {'type', 'message'}"""
+    messages = []
+    for caption, items in results.items():
+        for item in items:
+            if isinstance(item[0], dict):
+                messages.append({'type': item[0]['type'], 'message': item[0]['message']})
+    return messages
+
+def run_project(data, method, options):
+    """Run analysis of project archive
+
+        Arguments:
+            data: Contents of project archive
+            method: One of SERVER_METHODS
+            options: Options from AnalysisService.get_options
+        Returns:
+            Dict with keys 'diagnostics', 'elements', 'nodes' and optionally
+            'series' and 'rules_check'
+    """
+    project = export.get_snapshot_project(projectfile.read_snapshot(io.BytesIO(data)))
+    sim_settings = project.get_project_fields(page='Simulation')
+    rules = (method == 'rules_check')
+    studies = {'powerflow': method == 'powerflow' or rules,
+               'sc_sym': (method == 'short_circuit' and options['fault'] == '3ph') or rules,
+               'sc_gf': (method == 'short_circuit' and options['fault'] == '1ph') or rules,
+               'pf_method': options['pf_method'],
+               'diagnostics': options['diagnostics']}
+    settings = cli.get_analysis_settings(sim_settings, studies)
+    result = analysisworker.analyse_project(project, settings, lambda message, fraction: None)
+    diagnostics = get_diagnostics(result['diagnostics'][0]) if result['diagnostics'] else []
+    if result['diagnostics'] and result['diagnostics'][1] == misc.ERROR:
+        raise RPCError(RPC_ANALYSIS_ERROR, 'Diagnostics failed', {'diagnostics': diagnostics})
+    cli.add_node_elements(project, result['node_results'])
+
+    elements = []
+    nodes = []
+    node_refs = set()
+    for page, element in resultsexport.iter_elements(project):
+        ref = resultsexport.get_ref(element)
+        if element.code in misc.DISPLAY_ELEMENT_CODES:
+            if element.res_fields and ref not in node_refs:
+                node_refs.add(ref)
+                nodes.append({'ref': ref, 'results': get_fields_dict(element.res_fields)})
+        elif element.code not in misc.NON_ELEMENT_CODES:
+            elements.append({'page': page,
+                             'ref': ref,
+                             'name': element.name,
+                             'code': element.code,
+                             'fields': get_fields_dict(element.fields),
+                             'results': get_fields_dict(element.res_fields)})
+    reply = {'diagnostics': diagnostics, 'elements': elements, 'nodes': nodes}
+    if options['series']:
+        reply['series'] = [{'ref': ref, 'code': code, 'title': title, 'unit': unit, 'xval': xval, 'yval': yval}
+                           for ref, code, title, unit, xval, yval in resultsexport.iter_series(project)]
+    if rules:
+        rules_results = electrical_rules_check(project.networkmodel, sim_settings,
+                                               project.get_project_fields(page='Rules Check'))
+        reply['rules_check'] = {'failed': [message['message'] for message, element_list in rules_results[SERVER_RULES_FAILED]],
+                                'passed': [message for message, element_list in rules_results[SERVER_RULES_PASSED]]}
+    return get_json_value(reply)
+
+def run_network(text, method, options):
+    """Run analysis of pandapower network json
+
+        Returns:
+            Dict with key 'tables' as {table name: {'index', 'columns', 'data'}}
+    """
+    import pandapower as pp
+    import pandapower.shortcircuit as sc
+    net = pp.from_json_string(text)
+    if method == 'powerflow':
+        pp.runpp(net, calculate_voltage_angles=True)
+    elif method == 'short_circuit':
+        sc.calc_sc(net, fault=options['fault'], case=options['case'], lv_tol_percent=options['lv_tol_percent'],
+                   check_connectivity=True, ip=(options['fault'] == '3ph'))
+    tables = dict()
+    for name in SERVER_NETWORK_TABLES[method]:
+        if name in net and len(net[name]):
+            tables[name] = net[name].to_dict(orient='split')
+    return get_json_value({'tables': tables})
+
+def init_worker(misc_settings):
+    exportjobs.set_misc_settings(misc_settings)
+    try:
+        analysisworker.warm_up()
+    except Exception:
+        log.warning('init_worker - warm up failed - ' + traceback.format_exc())
+
+def is_ready():
+    return True
+
+
+## Service
+
+class AnalysisService:
+    """Dispatch JSON-RPC requests to a pool of worker processes
+
+        Worker processes are started and warmed up with the service, so that
+        pandapower imports and numba compilation are paid once. Results are held
+        in an LRU cache keyed by method, options and hash of submitted content,
+        and identical requests in progress are run once.
+
+        handle() takes and returns request and response bodies and can be used
+        without a server, for example in tests or from other programs.
+
+        Arguments:
+            max_workers: Number of worker processes, requests are run in the
+                calling thread if 0
+            cache_size: Maximum number of results held in cache
+    """
+
+    def __init__(self, max_workers=SERVER_MAX_WORKERS, cache_size=SERVER_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache = ResultCache(cache_size)
+        self.pending = dict()  # key -> future
+        self.lock = threading.RLock()
+        self.executor = None
+        # Use spawned workers for consistent behaviour across platforms
+        self.mp_context = multiprocessing.get_context('spawn')
+
+    def start(self):
+        """Start and warm up worker processes"""
+        with self.lock:
+            if self.max_workers > 0 and self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                                       mp_context=self.mp_context,
+                                                                       initializer=init_worker,
+                                                                       initargs=(exportjobs.get_misc_settings(),))
+                # Workers are started on demand, submit a task for each of them
+                for slno in range(self.max_workers):
+                    self.executor.submit(is_ready)
+                log.info('AnalysisService - start - {} worker processes started'.format(self.max_workers))
+
+    def stop(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+                log.info('AnalysisService - stop - worker processes stopped')
+
+    def submit(self, func, *args):
+        if self.max_workers > 0:
+            self.start()
+            return self.executor.submit(func, *args)
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def finish(self, key, future):
+        with self.lock:
+            self.pending.pop(key, None)
+            if not future.cancelled() and future.exception() is None:
+                self.cache.put(key, future.result())
+
+    def get_options(self, method, params):
+        """Validate and normalise options of request"""
+        pf_method = params.get('method')
+        if pf_method is not None and pf_method not in cli.CLI_PF_METHODS:
+            raise RPCError(RPC_INVALID_PARAMS, 'method should be one of ' + ', '.join(sorted(cli.CLI_PF_METHODS)))
+        options = {'pf_method': cli.CLI_PF_METHODS[pf_method] if pf_method else None,
+                   'fault': params.get('fault', '3ph'),
+                   'case': params.get('case', 'max'),
+                   'lv_tol_percent': params.get('lv_tol_percent', 10),
+                   'diagnostics': bool(params.get('diagnostics', True)),
+                   'series': bool(params.get('series', False))}
+        if options['fault'] not in ('3ph', '1ph'):
+            raise RPCError(RPC_INVALID_PARAMS, 'fault should be one of 3ph, 1ph')
+        if options['case'] not in ('max', 'min'):
+            raise RPCError(RPC_INVALID_PARAMS, 'case should be one of max, min')
+        # bool is a subclass of int
+        if (not isinstance(options['lv_tol_percent'], (int, float)) 
+                or isinstance(options['lv_tol_percent'], bool)):
+            raise RPCError(RPC_INVALID_PARAMS, 'lv_tol_percent should be a number')
+        return options
+
+    def get_content(self, method, params):
+        """Return (worker function, content) of request"""
+        if 'project' in params:
+            try:
+                return run_project, base64.b64decode(params['project'], validate=True)
+            except (TypeError, ValueError, binascii.Error):
+                raise RPCError(RPC_INVALID_PARAMS, 'project should be a base64 encoded project archive')
+        elif 'network' in params:
+            if method == 'rules_check':
+                raise RPCError(RPC_INVALID_PARAMS, 'rules_check requires a project archive')
+            network = params['network']
+            if isinstance(network, dict):
+                network = projectfile.dump_json(network)
+            elif not isinstance(network, str):
+                raise RPCError(RPC_INVALID_PARAMS, 'network should be pandapower json')
+            return run_network, network
+        raise RPCError(RPC_INVALID_PARAMS, 'project or network is required')
+
+    def call(self, method, params):
+        """Run method and return result, served from cache if available"""
+        if method == 'status':
+            with self.lock:
+                return {'program': misc.PROGRAM_NAME,
+                        'version': misc.PROGRAM_VER,
+                        'workers': self.max_workers,
+                        'running': len(self.pending),
+                        'cache': {'size': len(self.cache), 'maxsize': self.cache.maxsize,
+                                  'hits': self.cache.hits, 'misses': self.cache.misses}}
+        if method not in SERVER_METHODS:
+            raise RPCError(RPC_METHOD_NOT_FOUND, 'Method not found - ' + str(method))
+        if not isinstance(params, dict):
+            raise RPCError(RPC_INVALID_PARAMS, 'params should be an object')
+        options = self.get_options(method, params)
+        func, content = self.get_content(method, params)
+        content_hash = projectfile.get_json_hash(content)
+        key = projectfile.get_json_hash(projectfile.dump_json([method, func.__name__, content_hash, options]))
+        with self.lock:
+            result = self.cache.get(key)
+            cached = result is not None
+            if not cached:
+                future = self.pending.get(key)
+                if future is None:
+                    future = self.submit(func, content, method, options)
+                    self.pending[key] = future
+                    future.add_done_callback(lambda future, key=key: self.finish(key, future))
+        if not cached:
+            try:
+                result = future.result(timeout=misc.PROCESS_TIMEOUT)
+            except RPCError:
+                raise
+            except concurrent.futures.TimeoutError:
+                raise RPCError(RPC_ANALYSIS_ERROR, 'Analysis timed out')
+            except concurrent.futures.BrokenExecutor:
+                log.error('AnalysisService - call - worker process terminated, restarting workers')
+                self.stop()
+                raise RPCError(RPC_ANALYSIS_ERROR, 'Analysis worker exited unexpectedly')
+            except Exception as e:
+                log.error('AnalysisService - call - analysis failed - {}\n{}'.format(method, 
+                          ''.join(traceback.format_exception(type(e), e, e.__traceback__))))
+                raise RPCError(RPC_ANALYSIS_ERROR, 'Analysis failed - {}: {}'.format(type(e).__name__, e))
+        return dict(result, content_hash=content_hash, cached=cached)
+
+    def dispatch(self, request):
+        """Return JSON-RPC response object for request object, None for notifications
+
+            Notifications are valid requests without id and get no response, even on errors.
+        """
+        request_id = request.get('id') if isinstance(request, dict) else None
+        notification = False
+        try:
+            if (not isinstance(request, dict) or request.get('jsonrpc') != '2.0' 
+                    or not isinstance(request.get('method'), str)):
+                raise RPCError(RPC_INVALID_REQUEST, 'Invalid request')
+            notification = 'id' not in request
+            result = self.call(request['method'], request.get('params', dict()))
+            response = {'jsonrpc': '2.0', 'result': result, 'id': request_id}
+        except RPCError as e:
+            response = {'jsonrpc': '2.0', 'error': e.get_error(), 'id': request_id}
+        except Exception:
+            log.error('AnalysisService - dispatch - ' + traceback.format_exc())
+            response = {'jsonrpc': '2.0', 'error': {'code': RPC_INTERNAL_ERROR, 'message': 'Internal error'}, 
+                        'id': request_id}
+        if notification:
+            return None
+        return response
+
+    def handle(self, body):
+        """Return JSON-RPC response body for request body, None if there is no response"""
+        try:
+            request = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            response = {'jsonrpc': '2.0', 'error': {'code': RPC_PARSE_ERROR, 'message': 'Parse error'}, 'id': None}
+        else:
+            if isinstance(request, list):
+                if request:
+                    response = [item for item in (self.dispatch(item) for item in request) if item is not None] or None
+                else:
+                    response = self.dispatch(request)
+            else:
+                response = self.dispatch(request)
+        if response is None:
+            return None
+        return projectfile.dump_json(response).encode('utf-8')
+
+
+## Server
+
+class ServiceRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serve JSON-RPC requests posted to any path"""
+
+    server_version = misc.PROGRAM_NAME + '/' + misc.PROGRAM_VER
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411)
+            return
+        if length > SERVER_MAX_REQUEST_SIZE:
+            self.send_error(413)
+            return
+        body = self.server.service.handle(self.rfile.read(length))
+        if body is None:
+            self.send_response(204)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.info('ServiceRequestHandler - {} - {}'.format(self.address_string(), format % args))
+
+
+def serve(service, host=SERVER_HOST, port=SERVER_PORT):
+    """Serve requests until interrupted"""
+    httpd = http.server.ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    httpd.service = service
+    service.start()
+    log.warning('serve - serving on http://{}:{}/'.format(*httpd.server_address[:2]))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='gelectrical.server',
+                                     description='Serve ' + misc.PROGRAM_NAME + ' analysis as a local JSON-RPC service.')
+    parser.add_argument('--host', default=SERVER_HOST, help='Address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='Port to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=SERVER_MAX_WORKERS, 
+                        help='Number of worker processes (default: %(default)s)')
+    parser.add_argument('--cache-size', type=int, default=SERVER_CACHE_SIZE, 
+                        help='Number of results held in cache (default: %(default)s)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log requests')
+    return parser
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr, level=logging.INFO if args.verbose else logging.WARNING)
+    if args.workers < 0:
+        get_parser().error('--workers should not be negative')
+    cli.setup_directories()
+    serve(AnalysisService(args.workers, args.cache_size), args.host, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
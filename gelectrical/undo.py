@@ -299,6 +299,10 @@ class Stack:
         ''' Set the savepoint. '''
         self._savepoint = self.undocount()
 
+    def clearsavepoint(self):
+        ''' Clear the savepoint, marking the state as changed. '''
+        self._savepoint = None
+
     def haschanged(self):
         ''' Return *True* if the state has changed since the savepoint. 
         
@@ -22,13 +22,13 @@
 #  
 # 
 
-import logging, csv, json
+import logging
 from gi.repository import Gtk, Gdk, GLib
-import numpy as np
 
 # local files import
 from .. import misc
 from ..misc import undoable, group
+from ..model.library import library_cache
 
 # Get logger object
 log = logging.getLogger(__name__)
@@ -110,23 +110,10 @@ class DatabaseView:
         """
         if data_path:
             self.data_path = data_path
-            self.data = dict()
             self.button.props.sensitive = True
             
             # Load Data
-            with open(data_path) as csv_file:
-                csv_reader = csv.DictReader(csv_file, delimiter=';')
-                for row in csv_reader:
-                    item_name = row['item_name']
-                    item_category = row['item_category']
-                    if item_category in self.data:
-                        category_dict = self.data[item_category]
-                    else:
-                        category_dict = dict()
-                        self.data[item_category] = category_dict
-                    row.pop('item_category')
-                    row.pop('item_name')
-                    category_dict[item_name] = row
+            self.data = library_cache.get_library(data_path)
                     
             self.store.clear()
             # Populate data
@@ -184,31 +171,14 @@ class DatabaseView:
                                 try:
                                     dirname = misc.dir_from_path(self.data_path)
                                     valuepath = misc.posix_path(dirname, value)
-                                    with open(valuepath, 'r') as fileobj:
-                                        data = json.load(fileobj)
-                                        validated = data
+                                    validated = library_cache.get_json(valuepath)
                                 except:
                                     validated = None
                                     log.exception('run_dialog - validation failure while reading graph field')
                             elif data_type == 'data':
                                 try:
                                     if value:
-                                        (subdir, data_filename, params_filename) = eval(value)
-                                        dirname = misc.dir_from_path(self.data_path)
-                                        valuepath_params = misc.posix_path(dirname, subdir, params_filename)
-                                        with open(valuepath_params, 'r') as fp:
-                                            data_struct = json.load(fp)
-                                        validated = data_struct
-                                        if data_filename:
-                                            valuepath = misc.posix_path(dirname, subdir, data_filename)
-                                            data = np.loadtxt(valuepath, delimiter=',')
-                                            curve_u = []
-                                            curve_l = []
-                                            for row in data:
-                                                curve_u.append(('point', str(row[0])+'*f.In', str(row[1])))
-                                                curve_l.append(('point', str(row[2])+'*f.In', str(row[3])))
-                                            validated['data']['curve_u'] = curve_u
-                                            validated['data']['curve_l'] = curve_l
+                                        validated = library_cache.get_data_struct(self.data_path, value)
                                     else:
                                         validated = None
                                 except:
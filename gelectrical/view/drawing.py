@@ -22,7 +22,8 @@
 #  
 # 
 
-import logging, copy, pickle, codecs, bisect
+import logging, copy, pickle, codecs, bisect, math
+from collections import OrderedDict
 from gi.repository import Gtk, Gdk, GLib
 import cairo
 
@@ -30,10 +31,57 @@ import cairo
 from .. import misc
 from ..misc import undoable, group
 from .graph import GraphView
+from ..model.drawing import RenderCache
 
 # Get logger object
 log = logging.getLogger(__name__)
 
+# Size of background tiles in pixels
+TILE_SIZE = 256
+# Number of tiles rendered beyond visible area
+TILE_MARGIN = 1
+# Maximum number of cached tiles (~256 kB per tile)
+TILE_CACHE_SIZE = 256
+
+
+class TileCache:
+    """LRU cache of rendered background tiles keyed by (scale, column, row)"""
+    
+    def __init__(self, maxsize=TILE_CACHE_SIZE, tile_size=TILE_SIZE):
+        self.maxsize = maxsize
+        self.tile_size = tile_size
+        self.store = OrderedDict()
+        
+    def get(self, key):
+        if key in self.store:
+            self.store.move_to_end(key)
+            return self.store[key]
+        return None
+        
+    def put(self, key, value):
+        self.store[key] = value
+        self.store.move_to_end(key)
+        while len(self.store) > self.maxsize:
+            self.store.popitem(last=False)
+            
+    def get_tile_rect(self, key):
+        """Page rectangle covered by tile"""
+        (scale, i, j) = key
+        size = self.tile_size/scale
+        return (i*size, j*size, size, size)
+        
+    def invalidate(self, rects):
+        """Remove tiles of all zoom levels overlapping passed page rectangles"""
+        for key in list(self.store.keys()):
+            (x, y, w, h) = self.get_tile_rect(key)
+            for (rx, ry, rw, rh) in rects:
+                if x <= rx + rw and rx <= x + w and y <= ry + rh and ry <= y + h:
+                    del self.store[key]
+                    break
+                    
+    def clear(self):
+        self.store.clear()
+
 class MouseButtons:
     LEFT_BUTTON = 1
     MIDDLE_BUTTON = 2
@@ -71,8 +119,9 @@ class DrawingView:
         self.dirty_draw = True  # Flag to keep track of whether a drawing is to be fully redrawn
         self.highlighted_port = None  # Flag to keep track of the currently highlighted port
         self.savepoint = None  # Undo stack save point
-        self.background_surface = None
-        self.background_context = None
+        self.tile_cache = TileCache()  # Rendered background tiles
+        self.page_size = None  # Page size of cached tiles
+        self.render_cache = RenderCache()  # Cached element renders
         self.multiselect_fields = None
         
         # Setup
@@ -235,22 +284,54 @@ class DrawingView:
     def on_draw(self, widget, context):
         """Instructions drawing the model"""
         
+        def render_tile(key):
+            (scale, i, j) = key
+            surface = screen.create_similar(cairo.Content.COLOR_ALPHA, TILE_SIZE, TILE_SIZE)
+            tile_context = cairo.Context(surface)
+            tile_context.translate(-i*TILE_SIZE, -j*TILE_SIZE)
+            tile_context.scale(scale, scale)
+            rect = self.tile_cache.get_tile_rect(key)
+            tile_context.rectangle(*rect)
+            tile_context.clip()
+            self.drawing_model.draw_model_cached(tile_context, self.render_cache, [rect])
+            return surface
+        
         def draw_background():
-            if self.background_surface:
-                context.save()
-                context.scale(1/self.scale, 1/self.scale)
-                context.set_source_surface(self.background_surface)
-                context.paint()
-                context.restore()
+            # Visible region in pixels
+            (x0, y0, x1, y1) = context.clip_extents()
+            page_width = self.drawing_model.fields['page_width']['value']*self.scale
+            page_height = self.drawing_model.fields['page_height']['value']*self.scale
+            i_max = int(math.ceil(page_width/TILE_SIZE)) - 1
+            j_max = int(math.ceil(page_height/TILE_SIZE)) - 1
+            i0 = max(int(x0//TILE_SIZE) - TILE_MARGIN, 0)
+            j0 = max(int(y0//TILE_SIZE) - TILE_MARGIN, 0)
+            i1 = min(int(x1//TILE_SIZE) + TILE_MARGIN, i_max)
+            j1 = min(int(y1//TILE_SIZE) + TILE_MARGIN, j_max)
+            scale = round(self.scale, 3)
+            # Draw grid layer
+            context.save()
+            context.scale(scale, scale)
+            self.drawing_model.draw_grid(context, scale)
+            context.restore()
+            # Draw element layer
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    key = (scale, i, j)
+                    surface = self.tile_cache.get(key)
+                    if surface is None:
+                        surface = render_tile(key)
+                        self.tile_cache.put(key, surface)
+                    # Paint only tiles within visible region
+                    if i*TILE_SIZE < x1 and (i+1)*TILE_SIZE > x0 and j*TILE_SIZE < y1 and (j+1)*TILE_SIZE > y0:
+                        context.set_source_surface(surface, i*TILE_SIZE, j*TILE_SIZE)
+                        context.rectangle(i*TILE_SIZE, j*TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                        context.fill()
                 
         screen = context.get_target()
         # Setup page settings
         self.drawing_area.set_size_request(int(self.drawing_model.fields['page_width']['value'] * self.scale), 
                                            int(self.drawing_model.fields['page_height']['value'] * self.scale)) 
                                            
-        # Apply global scale
-        context.scale(self.scale, self.scale)
-
         # Check status of stack and set dirty flag
         # Handle case with stack
         if self.program_state['stack']:
@@ -266,19 +347,22 @@ class DrawingView:
 
         # Draw base layer
         if self.dirty_draw:
-            # Set background
-            self.background_surface = screen.create_similar(cairo.Content.COLOR_ALPHA, 
-                                                         int(self.drawing_model.fields['page_width']['value']*self.scale), 
-                                                         int(self.drawing_model.fields['page_height']['value']*self.scale))
-            self.background_context = cairo.Context(self.background_surface)
-            self.background_context.scale(self.scale, self.scale)
-            self.drawing_model.draw_gridlines(self.background_context)
-            self.drawing_model.draw_model(self.background_context, select=True, whitelist=self.whitelist)
+            # Re-render modified elements
+            rects = self.drawing_model.update_render_cache(self.render_cache, select=True, whitelist=self.whitelist)
+            page_size = (self.drawing_model.fields['page_width']['value'], self.drawing_model.fields['page_height']['value'])
+            if self.page_size != page_size:
+                self.tile_cache.clear()
+                self.page_size = page_size
+            elif rects:
+                self.tile_cache.invalidate(rects)
             # Reset flags
             self.dirty_draw = False
 
-        # Draw background image
+        # Draw background tiles
         draw_background()
+        
+        # Apply global scale
+        context.scale(self.scale, self.scale)
 
         if self.get_mode() == misc.MODE_DEFAULT:
             pass
@@ -26,6 +26,7 @@ import cairo
 
 # local files import
 from .. import misc
+from ..model.library import library_cache
 from .graph import GraphView, GraphViewDialog
 
 # Get logger object
@@ -223,8 +224,7 @@ class FieldView:
             if response_id == Gtk.ResponseType.ACCEPT:
                 try:
                     filename = open_dialog.get_filename()
-                    with open(filename, 'r') as fp:
-                        data_struct = json.load(fp)
+                    data_struct = library_cache.get_json(filename)
                     old_data = copy.deepcopy(self.fields[code])
                     # Rough validation
                     if misc.validate_protection_data_struct(data_struct, code):
@@ -22,7 +22,7 @@
 #  
 #  
 
-import sys, os, io, logging, appdirs
+import sys, os, io, logging, appdirs, multiprocessing
 
 import gi
 gi.require_version('Gtk', '3.0')
@@ -42,9 +42,13 @@ if sys.stdout is None:
 if sys.stderr is None:
     sys.stderr = NullWriter()
 
-from gelectrical import MainApp, misc
+from gelectrical import misc
+from gelectrical.app import MainApp
 
 if __name__ == '__main__':
+    # Support worker processes in frozen builds
+    multiprocessing.freeze_support()
+    
     # Setup logging
     
     # Setup Logging to temporary file
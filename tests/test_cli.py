@@ -0,0 +1,41 @@
+import pytest
+
+cli = pytest.importorskip('gelectrical.cli')
+misc = cli.misc
+
+
+def summary(status=None, rules_failed=None):
+    return {'filename': 'project.gepro', 'status': misc.OK if status is None else status, 'messages': [],
+            'rules_failed': rules_failed, 'outputs': [], 'time': 0}
+
+
+@pytest.mark.parametrize('summaries, code', [([], cli.EXIT_OK),
+                                             ([summary(), summary(rules_failed=[])], cli.EXIT_OK),
+                                             ([summary(), summary(misc.WARNING, ['Cable C1'])], cli.EXIT_RULES_FAILED),
+                                             ([summary(misc.ERROR), summary()], cli.EXIT_ERROR),
+                                             ([summary(misc.WARNING, ['Cable C1']), summary(misc.ERROR)],
+                                              cli.EXIT_ERROR)])
+def test_exit_code(summaries, code):
+    assert cli.get_exit_code(summaries) == code
+
+def test_parser():
+    args = cli.get_parser().parse_args(['analyze', 'a.gepro', 'b.gepro', '--rules', '--pf-method', 'diversity',
+                                        '--results', 'out', '--results-format', 'csv', '-j', '2'])
+    assert args.files == ['a.gepro', 'b.gepro']
+    assert args.rules and args.diagnostics
+    assert (args.pf_method, args.results, args.results_format, args.jobs) == ('diversity', 'out', 'csv', 2)
+    with pytest.raises(SystemExit):
+        cli.get_parser().parse_args(['analyze', 'a.gepro', '--results-format', 'pdf'])
+
+def test_analysis_settings():
+    sim_settings = {'run_powerflow': {'value': True}, 'run_sc_sym': {'value': False}, 'run_sc_gf': {'value': True},
+                    'power_flow_3ph': {'value': True}, 'pf_method': {'value': 'Time series'}}
+    options = {'powerflow': False, 'sc_sym': False, 'sc_gf': False, 'pf_method': None, 'diagnostics': True}
+    # Studies of project are used if none are selected
+    settings = cli.get_analysis_settings(sim_settings, options)
+    assert (settings['powerflow'], settings['sc_sym'], settings['sc_gf']) == (True, False, True)
+    assert settings['pf_method'] == 'Time series'
+    options.update(sc_sym=True, pf_method='Power flow')
+    settings = cli.get_analysis_settings(sim_settings, options)
+    assert (settings['powerflow'], settings['sc_sym'], settings['sc_gf']) == (False, True, False)
+    assert settings['pf_method'] == 'Power flow'
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+misc = pytest.importorskip('gelectrical.misc')
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def events():
+    return []
+
+@pytest.fixture
+def scheduler():
+    # Handlers are called in the worker thread instead of the main loop
+    return misc.JobScheduler(max_workers=1, dispatch=lambda func, *args: func(*args))
+
+def submit(scheduler, events, name, func, *args):
+    return scheduler.submit(name, func, *args,
+                            on_done=lambda result: events.append(('done', name, result)),
+                            on_error=lambda e: events.append(('error', name, type(e))),
+                            on_cancel=lambda: events.append(('cancel', name)))
+
+def wait_job(token, started, release):
+    started.set()
+    while not release.wait(0.01):
+        token.check()
+    return 'result'
+
+
+def test_submit_runs_job(scheduler, events):
+    submit(scheduler, events, 'add', lambda token, a, b: a + b, 1, 2)
+    submit(scheduler, events, 'fail', lambda token: 1/0)
+    scheduler.queue.join()
+    assert events == [('done', 'add', 3), ('error', 'fail', ZeroDivisionError)]
+    assert scheduler.get_job('add') is None
+
+def test_submit_coalesces_jobs_of_same_name(scheduler, events):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    def func(token):
+        calls.append(1)
+        return wait_job(token, started, release)
+    job = submit(scheduler, events, 'save', func)
+    assert started.wait(TIMEOUT)
+    assert submit(scheduler, events, 'save', func) is job
+    assert scheduler.get_job('save') is job
+    release.set()
+    scheduler.queue.join()
+    assert calls == [1]
+    assert events == [('done', 'save', 'result')]
+    # Job of same name is run again once finished
+    submit(scheduler, events, 'save', lambda token: 'again')
+    scheduler.queue.join()
+    assert events[-1] == ('done', 'save', 'again')
+
+def test_cancel_running_and_queued_jobs(scheduler, events):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    submit(scheduler, events, 'running', wait_job, started, release)
+    assert started.wait(TIMEOUT)
+    # Queued behind the running job on the single worker
+    submit(scheduler, events, 'queued', lambda token: calls.append(1))
+    callbacks = []
+    scheduler.get_job('running').token.add_callback(lambda: callbacks.append('running'))
+    scheduler.cancel('running')
+    scheduler.queue.join()
+    assert events[0] == ('cancel', 'running')
+    assert events[1] == ('done', 'queued', None)
+    assert callbacks == ['running']
+
+    started.clear()
+    submit(scheduler, events, 'running', wait_job, started, threading.Event())
+    assert started.wait(TIMEOUT)
+    submit(scheduler, events, 'queued', lambda token: calls.append(2))
+    scheduler.cancel()
+    scheduler.queue.join()
+    assert events[2:] == [('cancel', 'running'), ('cancel', 'queued')]
+    assert calls == [1]
+
+def test_cancel_token():
+    token = misc.CancelToken()
+    calls = []
+    callback = lambda: calls.append('removed')
+    token.add_callback(lambda: calls.append('cancel'))
+    token.add_callback(callback)
+    token.remove_callback(callback)
+    token.check()
+    token.cancel()
+    token.cancel()
+    assert token.is_cancelled()
+    assert calls == ['cancel']
+    with pytest.raises(misc.JobCancelled):
+        token.check()
+    # Callbacks added after cancel are called at once
+    token.add_callback(lambda: calls.append('late'))
+    assert calls == ['cancel', 'late']
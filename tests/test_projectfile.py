@@ -0,0 +1,112 @@
+import os
+import json
+from zipfile import ZipFile
+
+import numpy as np
+import pytest
+
+projectfile = pytest.importorskip('gelectrical.model.projectfile')
+
+
+def get_page(ref, graph_model=None):
+    element = {'code': 'element_switch', 'cordinates': [10, 20], 'orientation': 'vertical',
+               'fields': {'ref': {'value': ref, 'type': 'str'},
+                          'In': {'value': 63.0, 'type': 'float'},
+                          'pcurve_l': {'value': {'type': 'protection', 'parameters': {}, 'data': {},
+                                                 'graph_model': graph_model}, 'type': 'data'}}}
+    return ['DrawingModel', {'fields': {'title': {'value': 'Page', 'type': 'str'}},
+                             'elements': [element, dict(element, cordinates=[30, 40])]}]
+
+def read_members(filename):
+    with ZipFile(filename) as projzip:
+        return {info.filename: (info.date_time, projzip.read(info.filename)) for info in projzip.infolist()}
+
+
+def test_writer_copies_unchanged_members(tmp_path):
+    filename = str(tmp_path / 'project.gepro')
+    writer = projectfile.ProjectWriter()
+    pages = [('proj_drawing_page_0.json', 'a0', get_page('Q1')),
+             ('proj_drawing_page_1.json', 'b0', get_page('Q2')),
+             ('proj_loadprofiles.json', 'l0', '{}')]
+    writer.save(filename, {'proj_fields': {}}, pages).result()
+    first = read_members(filename)
+    assert 'proj_drawing_page_0.json.cache' in first
+    assert writer.is_current(filename, 'proj_drawing_page_0.json', 'a0')
+
+    # Save with second page modified
+    pages = [('proj_drawing_page_0.json', 'a0', None),
+             ('proj_drawing_page_1.json', 'b1', get_page('Q3')),
+             ('proj_loadprofiles.json', 'l0', None)]
+    writer.save(filename, {'proj_fields': {}}, pages).result()
+    second = read_members(filename)
+    for name in ('proj_drawing_page_0.json', 'proj_drawing_page_0.json.cache', 'proj_loadprofiles.json'):
+        assert second[name] == first[name]
+    assert json.loads(second['proj_drawing_page_1.json'][1]) == get_page('Q3')
+    document = json.loads(second['document.json'][1])
+    assert document['_files'] == ['proj_drawing_page_0.json', 'proj_drawing_page_1.json', 'proj_loadprofiles.json']
+    assert not os.path.exists(filename + '.tmp')
+
+def test_writer_rejects_out_of_date_members(tmp_path):
+    filename = str(tmp_path / 'project.gepro')
+    writer = projectfile.ProjectWriter()
+    writer.save(filename, {'proj_fields': {}}, [('proj_drawing_page_0.json', 'a0', get_page('Q1'))]).result()
+
+    # Member saved with a different state key
+    future = writer.save(filename, {'proj_fields': {}}, [('proj_drawing_page_0.json', 'a1', None)])
+    assert isinstance(future.exception(), RuntimeError)
+
+    # Project file modified by another program
+    with open(filename, 'ab') as fp:
+        fp.write(b'\0')
+    future = writer.save(filename, {'proj_fields': {}}, [('proj_drawing_page_0.json', 'a0', None)])
+    assert isinstance(future.exception(), RuntimeError)
+    assert not os.path.exists(filename + '.tmp')
+
+def test_page_cache_round_trip():
+    graph_model = ['Q1', [{'mode': 'protection', 'xval': [1.0, 10.5, 100.25], 'yval': [1000.0, 1.5, 0.01]},
+                          {'mode': 'damage', 'xval': [2.0, 20.0], 'yval': [0.5, 0.25]}]]
+    page = get_page('Q1', graph_model)
+    text = projectfile.dump_json(page)
+    data = projectfile.encode_page_cache(text)
+    assert data is not None
+    assert projectfile.decode_page_cache(data, projectfile.get_json_hash(text)) == page
+    # Cache of other json content is not used
+    assert projectfile.decode_page_cache(data, projectfile.get_json_hash(text + ' ')) is None
+    assert projectfile.CachedPage(text, data).parse() == page
+    other = projectfile.dump_json(get_page('Q2'))
+    assert projectfile.CachedPage(other, data).parse() == get_page('Q2')
+
+def test_page_cache_skips_other_members():
+    assert projectfile.encode_page_cache(projectfile.dump_json({'loadprofiles': []})) is None
+    page = get_page('Q1')
+    page[1]['elements'][0]['fields']['ref']['unit'] = 'A'
+    assert projectfile.encode_page_cache(projectfile.dump_json(page)) is None
+
+def test_pack_arrays_round_trip():
+    series = [float(val)/3 for val in range(20)]
+    counts = list(range(16))
+    obj = {'series': series, 'counts': counts, 'short': [1.5, 2.5], 'flags': [True]*20,
+           'mixed': [1]*15 + [1.5], 'range': range(0, 10, 2), 'nested': [{'y': series}, 'text', None]}
+    arrays = {'f': [], 'f_len': 0, 'i': [], 'i_len': 0}
+    packed = projectfile.pack_arrays(obj, arrays)
+    assert packed['series'] == {'__array__': ['f', 0, 20]}
+    assert packed['counts'] == {'__array__': ['i', 0, 16]}
+    assert packed['nested'][0]['y'] == {'__array__': ['f', 20, 20]}
+    assert packed['short'] == [1.5, 2.5] and packed['flags'] == [True]*20
+    json.dumps(packed)
+    arrays = {dtype: np.concatenate(arrays[dtype]) for dtype in ('f', 'i')}
+    unpacked = projectfile.unpack_arrays(packed, arrays)
+    assert unpacked == obj
+    assert all(type(val) is int for val in unpacked['counts'])
+
+def test_analysis_results_round_trip():
+    series = [float(val) for val in range(32)]
+    element_results = {'0': {0: {'loading': {'value': 12.5, 'graph_model': ['I', [{'xval': series}]]}}},
+                       '1': {2: {'loading': {'value': np.float64(3.0)}}}}
+    node_results = {'5': {'v': {'value': 0.98, 'series': series}}}
+    data = projectfile.AnalysisResults(element_results, node_results).encode()
+    results = projectfile.AnalysisResults(data=data)
+    assert results.get_element_results('0') == element_results['0']
+    assert results.get_element_results('1') == {2: {'loading': {'value': 3.0}}}
+    assert results.get_element_results('2') == {}
+    assert results.get_node_results() == node_results
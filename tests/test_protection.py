@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from shapely.geometry import LineString
+
+protection = pytest.importorskip('gelectrical.model.protection')
+
+
+def get_curve(rng, n):
+    """Random monotone curve in log space, with vertical steps"""
+    x = np.cumsum(rng.uniform(0.05, 0.5, n)) - 1
+    steps = np.flatnonzero(rng.random(n) < 0.2)
+    steps = steps[steps > 0]
+    x[steps] = x[steps - 1]
+    x = np.maximum.accumulate(x)
+    y = 3 - np.cumsum(rng.uniform(0, 0.6, n))
+    return x, y
+
+def get_evaluated(x, y):
+    curve = 10.0**np.c_[x, y]
+    return protection.EvaluatedCurve('', 'protection', curve, curve.copy())
+
+def contains_geometric(evaluated, geometry, direction, i_max, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(protection, '_is_monotone', lambda x, y: False)
+        return bool(evaluated.contains(geometry, 'upper', direction, i_max))
+
+
+def test_contains_monotone_matches_geometric_check(monkeypatch):
+    rng = np.random.default_rng(26)
+    results = set()
+    for slno in range(500):
+        x, y = get_curve(rng, rng.integers(2, 8))
+        if x[-1] <= x[0]:
+            continue
+        evaluated = get_evaluated(x, y)
+        g_x = np.sort(rng.uniform(-2, 3, rng.integers(2, 6)))
+        g_y = rng.uniform(-2, 4, len(g_x))
+        geometry = LineString(np.c_[g_x, g_y])
+        direction = rng.choice(['right', 'left'])
+        i_max = rng.choice([None, 10**rng.uniform(-1, 3)])
+        fast = evaluated.contains(geometry, 'upper', direction, i_max)
+        assert fast == contains_geometric(evaluated, geometry, direction, i_max, monkeypatch)
+        results.add(fast)
+    # Both outcomes are covered
+    assert results == {True, False}
+
+@pytest.mark.parametrize('g_y, direction, expected', [((2.5, 2.5), 'right', True),
+                                                      ((0.5, 0.5), 'right', False),
+                                                      ((-1, -1), 'left', True),
+                                                      ((0.5, 0.5), 'left', False)])
+def test_contains_monotone(g_y, direction, expected, monkeypatch):
+    # Curve from (1 A, 1000 s) to (100 A, 0.1 s) with a step at 10 A
+    evaluated = get_evaluated(np.array([0, 1, 1, 2]), np.array([3, 1, 0, -1]))
+    geometry = LineString([(0.5, g_y[0]), (1.5, g_y[1])])
+    assert evaluated.contains(geometry, 'upper', direction) is expected
+    assert contains_geometric(evaluated, geometry, direction, None, monkeypatch) is expected
+
+
+def test_curve_cache_evicts_least_recently_used():
+    cache = protection.CurveCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache.store) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.clear()
+    assert not cache.store and (cache.hits, cache.misses) == (0, 0)
+
+def get_model():
+    curves = {'curve_u': [('point', '10*f.In', '100'), ('point', '100*f.In', '0.1')],
+              'curve_l': [('point', '5*f.In', '50'), ('point', '50*f.In', '0.05')]}
+    return protection.ProtectionModel('Test', {}, curves)
+
+def test_evaluated_curves_are_memoized(monkeypatch):
+    monkeypatch.setattr(protection, 'curve_cache', protection.CurveCache(maxsize=2))
+    cache = protection.curve_cache
+    fields = {'In': {'value': 10}}
+    first = get_model().get_evaluated_curve(fields)
+    second = get_model().get_evaluated_curve(fields)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(first.curve_upper, [[100, 100], [1000, 0.1]])
+    assert second.curve_upper is first.curve_upper
+    # Changed field values referenced by curves are evaluated again
+    third = get_model().get_evaluated_curve({'In': {'value': 20}})
+    assert cache.misses == 2
+    assert np.array_equal(third.curve_upper, [[200, 100], [2000, 0.1]])
+    # Least recently used curve is evicted
+    get_model().get_evaluated_curve({'In': {'value': 30}})
+    get_model().get_evaluated_curve(fields)
+    assert cache.misses == 4
+
+def test_deferred_model_reuses_matching_graph(monkeypatch):
+    monkeypatch.setattr(protection, 'curve_cache', protection.CurveCache())
+    fields = {'In': {'value': 10}}
+    saved = get_model().get_evaluated_model(fields)
+    misses = protection.curve_cache.misses
+
+    model = get_model()
+    value = model.get_deferred_model(fields, saved['graph_model'], saved['curve_key'])
+    assert value['graph_model'] == saved['graph_model'] and value['curve_key'] == saved['curve_key']
+    assert protection.curve_cache.misses == misses and model._evaluated is None
+    # Curves are evaluated on first use
+    assert np.array_equal(model.evaluated.curve_upper, [[100, 100], [1000, 0.1]])
+
+    # Saved graph of other field values is not used
+    value = get_model().get_deferred_model({'In': {'value': 20}}, saved['graph_model'], saved['curve_key'])
+    assert value['graph_model'] != saved['graph_model']
+    # Graphs saved without curve key are evaluated again
+    model = get_model()
+    value = model.get_deferred_model(fields, saved['graph_model'])
+    assert value['curve_key'] == saved['curve_key'] and model._evaluated is not None
+
+def test_invalidate_reevaluates_from_current_fields():
+    fields = {'In': {'value': 10}}
+    model = get_model()
+    model.get_evaluated_model(fields)
+    fields['In']['value'] = 20
+    assert np.array_equal(model.evaluated.curve_upper, [[100, 100], [1000, 0.1]])
+    model.invalidate()
+    assert np.array_equal(model.evaluated.curve_upper, [[200, 100], [2000, 0.1]])
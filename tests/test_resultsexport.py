@@ -0,0 +1,84 @@
+import os
+import csv
+from types import SimpleNamespace
+
+import pytest
+
+resultsexport = pytest.importorskip('gelectrical.model.resultsexport')
+
+
+def field(caption, value, unit='', field_type='float', **kwargs):
+    return dict(caption=caption, value=value, unit=unit, type=field_type, **kwargs)
+
+def element(code, name, fields, res_fields=None):
+    return SimpleNamespace(code=code, name=name, fields=fields, res_fields=res_fields or dict())
+
+def page(name, elements):
+    return SimpleNamespace(get_sheet_name=lambda: name, elements=elements)
+
+def get_project():
+    load_curve = ['Loading', [{'mode': 'graph', 'title': 'Phase A', 'xval': [0, 1, 2], 'yval': [10.0, 20.0, 15.0]},
+                              {'mode': 'graph', 'title': 'Phase B', 'xval': [0, 1], 'yval': [5.0, 6.0]}]]
+    cable = element('element_line', 'Cable',
+                    {'ref': field('Reference', 'C1', field_type='str'),
+                     'head': field('Parameters', None, field_type='heading'),
+                     'l': field('Length', 25.0, 'm'),
+                     'hidden': field('Hidden', 1.0, status_enable=False),
+                     'curve': field('Curve', {'type': 'damage'}, field_type='data')},
+                    {'loading': field('Loading', 42.5, '%'),
+                     'loading_graph': field('Loading', load_curve, 'A', field_type='graph')})
+    node = element('element_display_node', 'Node', {'ref': field('Reference', 'N1', field_type='str')},
+                   {'v': field('Voltage', 0.98, 'pu')})
+    text = element('element_display_text', 'Text', {'ref': field('Reference', 'T1', field_type='str')})
+    return SimpleNamespace(drawing_models=[page('Sheet 1', [cable, node, text]),
+                                           page('Sheet 2', [node])])
+
+
+def test_element_rows():
+    rows = list(resultsexport.iter_element_rows(get_project()))
+    assert rows == [['Sheet 1', 'C1', 'Cable', 'Field', 'ref', 'Reference', 'C1', ''],
+                    ['Sheet 1', 'C1', 'Cable', 'Field', 'l', 'Length', 25.0, 'm'],
+                    ['Sheet 1', 'C1', 'Cable', 'Result', 'loading', 'Loading', 42.5, '%']]
+    assert all(len(row) == len(resultsexport.RESULTS_ELEMENT_CAPTIONS) for row in rows)
+
+def test_node_rows_are_written_once():
+    assert list(resultsexport.iter_node_rows(get_project())) == [['N1', 'v', 'Voltage', 0.98, 'pu']]
+
+def test_series_rows():
+    project = get_project()
+    assert list(resultsexport.iter_series_rows(project)) == [['C1', 'loading_graph', 'Phase A', 'A', 0, 10.0],
+                                                             ['C1', 'loading_graph', 'Phase A', 'A', 1, 20.0],
+                                                             ['C1', 'loading_graph', 'Phase A', 'A', 2, 15.0],
+                                                             ['C1', 'loading_graph', 'Phase B', 'A', 0, 5.0],
+                                                             ['C1', 'loading_graph', 'Phase B', 'A', 1, 6.0]]
+    series = list(resultsexport.iter_series(project))
+    assert resultsexport.get_series_captions(series) == ['TIME', 'C1 | Phase A (A)', 'C1 | Phase B (A)']
+    assert list(resultsexport.iter_series_columns(series)) == [[0, 10.0, 5.0], [1, 20.0, 6.0], [2, 15.0, None]]
+    assert list(resultsexport.iter_series_columns([])) == []
+
+def test_write_sheet_splits_full_sheets(monkeypatch, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    monkeypatch.setattr(resultsexport, 'RESULTS_XLSX_MAX_ROWS', 3)
+    workbook = openpyxl.Workbook(write_only=True)
+    resultsexport.write_sheet(workbook, 'Rows', ['A'], ([slno] for slno in range(5)))
+    resultsexport.write_sheet(workbook, 'Empty', ['A'], iter([]))
+    workbook.save(tmp_path / 'results.xlsx')
+    workbook = openpyxl.load_workbook(tmp_path / 'results.xlsx')
+    assert workbook.sheetnames == ['Rows', 'Rows (2)', 'Rows (3)', 'Empty']
+    assert [[row[0] for row in workbook[title].values] for title in workbook.sheetnames] == [['A', 0, 1],
+                                                                                             ['A', 2, 3],
+                                                                                             ['A', 4],
+                                                                                             ['A']]
+
+def test_export_results_csv(tmp_path):
+    filename = str(tmp_path / 'results.csv')
+    resultsexport.export_results(get_project(), filename)
+    filenames = resultsexport.get_table_filenames(filename)
+    assert [os.path.basename(name) for name in filenames] == ['results_elements.csv', 'results_nodes.csv',
+                                                                 'results_time_series.csv']
+    with open(filenames[2], newline='', encoding='utf-8') as fp:
+        rows = list(csv.reader(fp))
+    assert rows[0] == resultsexport.RESULTS_SERIES_CAPTIONS
+    assert len(rows) == 6
+    with pytest.raises(ValueError):
+        resultsexport.export_results(get_project(), str(tmp_path / 'results.txt'))
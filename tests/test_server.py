@@ -0,0 +1,120 @@
+import json
+import base64
+
+import pytest
+
+server = pytest.importorskip('gelectrical.server')
+
+
+@pytest.fixture
+def service():
+    return server.AnalysisService(max_workers=0)
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    def run_network(text, method, options):
+        calls.append((text, method, options))
+        return {'tables': {}}
+    monkeypatch.setattr(server, 'run_network', run_network)
+    return calls
+
+def handle(service, request):
+    body = service.handle(json.dumps(request).encode('utf-8'))
+    return None if body is None else json.loads(body)
+
+def request(method, params=None, request_id=1):
+    data = {'jsonrpc': '2.0', 'method': method}
+    if params is not None:
+        data['params'] = params
+    if request_id is not None:
+        data['id'] = request_id
+    return data
+
+
+def test_status(service):
+    response = handle(service, request('status'))
+    assert response['id'] == 1
+    assert response['result']['workers'] == 0
+    assert response['result']['cache']['size'] == 0
+
+def test_parse_error(service):
+    response = json.loads(service.handle(b'{"jsonrpc": "2.0", "method"'))
+    assert response == {'jsonrpc': '2.0', 'error': {'code': server.RPC_PARSE_ERROR, 'message': 'Parse error'},
+                        'id': None}
+
+@pytest.mark.parametrize('data', [[], 1, {'jsonrpc': '1.0', 'method': 'status', 'id': 1},
+                                  {'jsonrpc': '2.0', 'method': 1}])
+def test_invalid_request(service, data):
+    response = handle(service, data)
+    assert response['error']['code'] == server.RPC_INVALID_REQUEST
+
+def test_method_not_found(service):
+    response = handle(service, request('unknown'))
+    assert response['error']['code'] == server.RPC_METHOD_NOT_FOUND
+
+@pytest.mark.parametrize('params', [{},
+                                    {'project': 'not base64!'},
+                                    {'network': 1},
+                                    {'network': '{}', 'fault': '2ph'},
+                                    {'network': '{}', 'lv_tol_percent': True},
+                                    {'network': '{}', 'lv_tol_percent': '10'},
+                                    {'network': '{}', 'method': 'unknown'}])
+def test_invalid_params(service, calls, params):
+    response = handle(service, request('short_circuit', params))
+    assert response['error']['code'] == server.RPC_INVALID_PARAMS
+    assert not calls
+
+def test_rules_check_requires_project(service, calls):
+    response = handle(service, request('rules_check', {'network': '{}'}))
+    assert response['error']['code'] == server.RPC_INVALID_PARAMS
+
+def test_notifications_get_no_response(service, calls):
+    assert handle(service, request('status', request_id=None)) is None
+    assert handle(service, request('unknown', request_id=None)) is None
+    assert handle(service, request('short_circuit', {'network': 1}, request_id=None)) is None
+
+def test_batch(service, calls):
+    response = handle(service, [request('status', request_id=1),
+                                request('status', request_id=None),
+                                request('unknown', request_id=2)])
+    assert [item['id'] for item in response] == [1, 2]
+    assert 'result' in response[0]
+    assert response[1]['error']['code'] == server.RPC_METHOD_NOT_FOUND
+    assert handle(service, [request('status', request_id=None)]) is None
+
+def test_results_are_cached(service, calls):
+    params = {'network': {'bus': []}, 'fault': '1ph', 'lv_tol_percent': 6}
+    first = handle(service, request('short_circuit', params))['result']
+    second = handle(service, request('short_circuit', params))['result']
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert first['content_hash'] == second['content_hash']
+    assert len(calls) == 1
+    text, method, options = calls[0]
+    assert method == 'short_circuit'
+    assert options['fault'] == '1ph' and options['lv_tol_percent'] == 6
+    # Other options are analysed again
+    handle(service, request('short_circuit', dict(params, case='min')))
+    assert len(calls) == 2
+
+def test_analysis_error(service, monkeypatch):
+    def run_project(data, method, options):
+        raise ValueError('bad project')
+    monkeypatch.setattr(server, 'run_project', run_project)
+    project = base64.b64encode(b'data').decode()
+    response = handle(service, request('powerflow', {'project': project}))
+    assert response['error']['code'] == server.RPC_ANALYSIS_ERROR
+    assert 'bad project' in response['error']['message']
+    # Failed results are not cached
+    assert service.cache.store == {}
+
+def test_result_cache_eviction():
+    cache = server.ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+spatialindex = pytest.importorskip('gelectrical.model.spatialindex')
+
+
+class Element:
+    """Element stand in with bounds and ports"""
+
+    def __init__(self, x, y, w, h, ports):
+        self.rect = (x, y, w, h)
+        self.ports = ports
+
+    def get_dimensions(self):
+        return self.rect
+
+    def get_ports_global(self):
+        return self.ports
+
+    def move(self, dx, dy):
+        x, y, w, h = self.rect
+        self.rect = (x + dx, y + dy, w, h)
+        self.ports = [[port[0] + dx, port[1] + dy] for port in self.ports]
+
+
+def get_element(rnd):
+    x = rnd.randint(-500, 1500)
+    y = rnd.randint(-500, 1500)
+    w = rnd.randint(0, 120)
+    h = rnd.randint(0, 120)
+    ports = [[x + rnd.randint(0, w), y + rnd.randint(0, h)] for slno in range(rnd.randint(0, 3))]
+    return Element(x, y, w, h, ports)
+
+def overlaps(rect, x, y, w, h):
+    ex, ey, ew, eh = rect
+    return ex <= x + w and x <= ex + ew and ey <= y + h and y <= ey + eh
+
+def port_inside(ports, x, y, w, h):
+    return any(x <= px <= x + w and y <= py <= y + h for px, py in ports)
+
+def get_queries(rnd, count):
+    for slno in range(count):
+        yield (rnd.randint(-600, 1600), rnd.randint(-600, 1600), rnd.choice([0, rnd.randint(1, 300)]),
+               rnd.choice([0, rnd.randint(1, 300)]))
+
+def check_queries(index, elements, rnd):
+    for x, y, w, h in get_queries(rnd, 300):
+        found = index.query(x, y, w, h)
+        assert len(found) == len(set(map(id, found)))
+        expected = [element for element in elements if overlaps(element.rect, x, y, w, h)]
+        assert all(element in found for element in expected)
+        found_ports = index.query_ports(x, y, w, h)
+        expected_ports = [element for element in elements if port_inside(element.ports, x, y, w, h)]
+        assert all(element in found_ports for element in expected_ports)
+
+
+def test_query_matches_brute_force():
+    rnd = random.Random(31)
+    elements = [get_element(rnd) for slno in range(200)]
+    index = spatialindex.SpatialIndex()
+    index.rebuild(elements)
+    assert len(index) == 200
+    check_queries(index, elements, rnd)
+
+def test_query_after_update_and_remove():
+    rnd = random.Random(32)
+    elements = [get_element(rnd) for slno in range(100)]
+    index = spatialindex.SpatialIndex()
+    index.rebuild(elements)
+    for element in elements[:30]:
+        element.move(rnd.randint(-400, 400), rnd.randint(-400, 400))
+        index.update(element)
+    removed = elements[30:50]
+    for element in removed:
+        index.remove(element)
+    elements = elements[:30] + elements[50:]
+    assert len(index) == len(elements)
+    assert all(element not in index for element in removed)
+    check_queries(index, elements, rnd)
+    for x, y, w, h in get_queries(rnd, 100):
+        assert not any(element in removed for element in index.query(x, y, w, h))
+
+def test_query_returns_only_nearby_elements():
+    index = spatialindex.SpatialIndex()
+    near = Element(0, 0, 10, 10, [[5, 5]])
+    far = Element(100*index.cell_size, 100*index.cell_size, 10, 10, [[100*index.cell_size, 100*index.cell_size]])
+    index.rebuild([near, far])
+    assert index.query(5, 5) == [near]
+    assert index.query_ports(5, 5) == [near]
+    assert index.query(50*index.cell_size, 50*index.cell_size) == []